@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark da Bancada de Finalização (src/services/audio_processing_service.py).
+
+Gera áudio sintético (tom + ruído, com silêncio nas pontas) e mede cada etapa
+do pós-processamento, além do pipeline completo com codificação MP3/OGG, tanto em memória
+quanto em blocos a partir do arquivo (o caminho usado com o gradio_client), com o pico de memória.
+
+Uso:
+    python benchmarks/bench_audio_processing.py [--durations 30 120 300] [--repeat 5]
+"""
+
+import os
+import sys
+import time
+import argparse
+import statistics
+import tempfile
+import tracemalloc
+from pathlib import Path
+
+import numpy as np
+import soundfile as sf
+
+# Mesmo ajuste de path usado por app.py / wsgi.py
+project_root = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(project_root / "src"))
+
+from services.audio_processing_service import (  # noqa: E402
+    to_float_audio, trim_silence, normalize_loudness, apply_fades, process_track, OUTPUT_FORMATS
+)
+
+SAMPLE_RATE = 44100
+
+
+def synthetic_track(seconds: float, channels: int = 2, silence: float = 1.5) -> np.ndarray:
+    """Tom de 440 Hz com ruído, precedido e seguido de silêncio, no formato int16 que o Gradio costuma devolver."""
+    rng = np.random.default_rng(42)
+    t = np.arange(int(seconds * SAMPLE_RATE)) / SAMPLE_RATE
+    tone = 0.3 * np.sin(2 * np.pi * 440 * t) + 0.05 * rng.standard_normal(t.size)
+    pad = np.zeros(int(silence * SAMPLE_RATE))
+    mono = np.concatenate([pad, tone, pad])
+    stereo = np.repeat(mono[:, np.newaxis], channels, axis=1)
+    return (stereo * np.iinfo(np.int16).max).astype(np.int16)
+
+
+def bench(label: str, func, repeat: int, memory: bool = False):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1000)
+    line = f"  {label:<28} mediana {statistics.median(timings):9.2f} ms   min {min(timings):9.2f} ms"
+    if memory:
+        # O numpy informa suas alocações ao tracemalloc: o pico mostra quanto da faixa ficou na memória.
+        tracemalloc.start()
+        func()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        line += f"   pico {peak / 1024 / 1024:7.1f} MB"
+    print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--durations", type=float, nargs="+", default=[30, 120, 300], help="duração das faixas em segundos")
+    parser.add_argument("--repeat", type=int, default=5, help="repetições por medição")
+    args = parser.parse_args()
+
+    output_dir = tempfile.mkdtemp(prefix="bench_audio_")
+    for seconds in args.durations:
+        raw = synthetic_track(seconds)
+        audio = to_float_audio(raw)
+        print(f"\n🎵 Faixa sintética de {seconds:.0f}s ({raw.shape[0]} amostras x {raw.shape[1]} canais)")
+
+        bench("to_float_audio", lambda: to_float_audio(raw), args.repeat)
+        bench("trim_silence", lambda: trim_silence(audio, SAMPLE_RATE), args.repeat)
+        bench("normalize_loudness", lambda: normalize_loudness(audio), args.repeat)
+        bench("apply_fades", lambda: apply_fades(audio, SAMPLE_RATE), args.repeat)
+
+        source_path = os.path.join(output_dir, "source.wav")
+        sf.write(source_path, raw, SAMPLE_RATE, subtype="PCM_16")
+        for output_format in OUTPUT_FORMATS:
+            for label, source in (("memória", (SAMPLE_RATE, raw)), ("arquivo", source_path)):
+                def run_pipeline():
+                    path = process_track(source, output_format, output_dir=output_dir)
+                    os.remove(path)
+                bench(f"process_track ({label}, {output_format})", run_pipeline, args.repeat, memory=True)
+        os.remove(source_path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Benchmark de ponta a ponta da geração: rota (POST /api/music/generate) → fila → Chef → acabamento
+→ upload → MongoDB, com a Cozinha de Ensaio (src/services/fake_space_service.py) no lugar do Space.
+
+Mede vazão (jobs/s), espera na fila e latência de ponta a ponta (p50/p99) a partir dos horários
+registrados em cada comanda (GET /api/music/jobs/{id}).
+
+Precisa de um MongoDB acessível em MONGO_URI (ex.: docker run -p 27017:27017 mongo).
+Sem credenciais do Cloudinary, o upload devolve a URL de exemplo na hora.
+
+Uso:
+    MONGO_URI=mongodb://localhost:27017 python benchmarks/bench_generation_e2e.py \\
+        [--jobs 50] [--users 10] [--concurrency 10] [--workers 4] \\
+        [--space "fake://local?latency=2&failure_rate=0.05"] [--replicas 2] [--cached]
+"""
+
+import os
+import sys
+import time
+import uuid
+import asyncio
+import argparse
+import statistics
+from pathlib import Path
+
+# Mesmo ajuste de path usado por app.py / wsgi.py (mais a raiz, para o pacote 'src')
+project_root = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(project_root))
+sys.path.insert(0, str(project_root / "src"))
+
+FINISHED = ("done", "failed", "cancelled")
+
+
+def percentile(values, fraction):
+    if not values:
+        return float("nan")
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def describe(label, values):
+    if not values:
+        print(f"  {label:<24} sem amostras")
+        return
+    print(f"  {label:<24} p50 {percentile(values, 0.50):8.2f}s   p99 {percentile(values, 0.99):8.2f}s   "
+          f"média {statistics.mean(values):8.2f}s")
+
+
+async def run(args):
+    import httpx
+    from src.main import app
+    from models.mongo_models import generate_token
+
+    run_id = uuid.uuid4().hex[:6]
+    tokens = {f"bench_{run_id}_user_{index}": generate_token(f"bench_{run_id}_user_{index}") for index in range(args.users)}
+    users = list(tokens)
+
+    await app.router.startup()
+    try:
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+            semaphore = asyncio.Semaphore(args.concurrency)
+            rejected = 0
+
+            async def submit(index):
+                nonlocal rejected
+                user_id = users[index % len(users)]
+                form = {
+                    "musicName": f"bench_{run_id}_{index}",
+                    "voiceType": "instrumental",
+                    # Sem --cached, cada pedido é único (e fresh) para a vitrine/single-flight não mascarar a carga.
+                    "description": "benchmark track" if args.cached else f"benchmark track {run_id} {index}",
+                    "fresh": "false" if args.cached else "true",
+                }
+                async with semaphore:
+                    response = await client.post(
+                        "/api/music/generate", data=form, headers={"Authorization": f"Bearer {tokens[user_id]}"}
+                    )
+                if response.status_code != 202:
+                    rejected += 1
+                    return None
+                return user_id, response.json()["jobId"]
+
+            started = time.perf_counter()
+            submitted = [job for job in await asyncio.gather(*(submit(index) for index in range(args.jobs))) if job]
+            submit_seconds = time.perf_counter() - started
+            print(f"🧾 {len(submitted)} comanda(s) aceitas em {submit_seconds:.2f}s ({rejected} recusadas)")
+
+            pending = dict((job_id, user_id) for user_id, job_id in submitted)
+            results = {}
+            while pending:
+                await asyncio.sleep(args.poll)
+                for job_id, user_id in list(pending.items()):
+                    response = await client.get(
+                        f"/api/music/jobs/{job_id}", headers={"Authorization": f"Bearer {tokens[user_id]}"}
+                    )
+                    job = response.json()
+                    if job.get("status") in FINISHED:
+                        results[job_id] = job
+                        del pending[job_id]
+            wall_seconds = time.perf_counter() - started
+    finally:
+        await app.router.shutdown()
+
+    done = [job for job in results.values() if job["status"] == "done"]
+    queue_waits = [job["started_at"] - job["created_at"] for job in results.values() if job.get("started_at")]
+    end_to_end = [job["finished_at"] - job["created_at"] for job in done]
+
+    print(f"\n📊 {len(done)}/{len(results)} concluída(s) em {wall_seconds:.2f}s "
+          f"→ {len(done) / wall_seconds:.2f} jobs/s ({len(results) - len(done)} falharam)")
+    describe("espera na fila", queue_waits)
+    describe("ponta a ponta", end_to_end)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--jobs", type=int, default=50, help="quantidade de pedidos")
+    parser.add_argument("--users", type=int, default=10, help="clientes distintos (afeta o rodízio da fila)")
+    parser.add_argument("--concurrency", type=int, default=10, help="pedidos HTTP simultâneos na submissão")
+    parser.add_argument("--workers", type=int, default=4, help="cozinheiros da fila (GENERATION_WORKERS)")
+    parser.add_argument("--space", default="fake://local?latency=2", help="URL da cozinha de ensaio")
+    parser.add_argument("--replicas", type=int, default=1, help="quantas cozinhas de ensaio na escala")
+    parser.add_argument("--cached", action="store_true", help="pedidos idênticos (mede vitrine e single-flight)")
+    parser.add_argument("--poll", type=float, default=0.5, help="intervalo de consulta das comandas (s)")
+    args = parser.parse_args()
+
+    if not os.getenv("MONGO_URI"):
+        parser.error("defina MONGO_URI apontando para um MongoDB de teste")
+
+    # A configuração precisa estar no ambiente antes de importar a aplicação (os serviços leem no import).
+    os.environ["HUGGING_FACE_SPACE_URLS"] = ",".join(f"{args.space}#{index}" for index in range(args.replicas))
+    os.environ["GENERATION_WORKERS"] = str(args.workers)
+    os.environ.setdefault("GENERATION_QUEUE_SIZE", str(max(50, args.jobs)))
+    os.environ.setdefault("SPACE_POLL_INTERVAL", "0.2")
+    os.environ["HUGGING_FACE_SPACE_URL"] = ""  # sem keep-alive pingando o Space de verdade
+
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
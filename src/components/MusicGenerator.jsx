@@ -34,6 +34,9 @@ import {
 import { motion, AnimatePresence } from 'framer-motion';
 import io from 'socket.io-client';
 
+// A biblioteca vem em páginas (next_cursor); só os campos que a lista mostra.
+const MUSIC_LIST_FIELDS = 'id,music_name,description,voice_type,genre,music_url,timestamp';
+
 const MusicGenerator = ({ user, onLogout }) => {
   const [formData, setFormData] = useState({
     description: '',
@@ -53,6 +56,8 @@ const MusicGenerator = ({ user, onLogout }) => {
   const [progressMessage, setProgressMessage] = useState('');
   const [estimatedTime, setEstimatedTime] = useState(null);
   const [userMusics, setUserMusics] = useState([]);
+  const [musicsCursor, setMusicsCursor] = useState(null);
+  const [isLoadingMoreMusics, setIsLoadingMoreMusics] = useState(false);
   const [notifications, setNotifications] = useState([]);
   const [unreadCount, setUnreadCount] = useState(0);
   const [processHistory, setProcessHistory] = useState([]);
@@ -117,10 +122,15 @@ const MusicGenerator = ({ user, onLogout }) => {
     loadProcessHistory();
   }, [user]);
 
-  const loadUserMusics = async () => {
+  // Sem cursor, recarrega a primeira página; com cursor, acrescenta a próxima página à lista.
+  const loadUserMusics = async (cursor = null) => {
     try {
       const token = localStorage.getItem('alquimista_token');
-      const response = await fetch('/api/music/musics', {
+      const params = new URLSearchParams({ fields: MUSIC_LIST_FIELDS });
+      if (cursor) {
+        params.set('cursor', cursor);
+      }
+      const response = await fetch(`/api/music/musics?${params}`, {
         headers: {
           'Authorization': `Bearer ${token}`
         }
@@ -128,13 +138,21 @@ const MusicGenerator = ({ user, onLogout }) => {
       
       if (response.ok) {
         const data = await response.json();
-        setUserMusics(data.musics || []);
+        const page = data.musics || [];
+        setUserMusics(prev => (cursor ? [...prev, ...page] : page));
+        setMusicsCursor(data.next_cursor || null);
       }
     } catch (error) {
       console.error('Erro ao carregar músicas:', error);
     }
   };
 
+  const loadMoreMusics = async () => {
+    setIsLoadingMoreMusics(true);
+    await loadUserMusics(musicsCursor);
+    setIsLoadingMoreMusics(false);
+  };
+
   const loadNotifications = async () => {
     try {
       const token = localStorage.getItem('alquimista_token');
@@ -764,7 +782,7 @@ const MusicGenerator = ({ user, onLogout }) => {
                   Suas Músicas
                 </CardTitle>
                 <CardDescription className="text-purple-200">
-                  {userMusics.length} música{userMusics.length !== 1 ? 's' : ''} criada{userMusics.length !== 1 ? 's' : ''}
+                  {userMusics.length}{musicsCursor ? '+' : ''} música{userMusics.length !== 1 ? 's' : ''} criada{userMusics.length !== 1 ? 's' : ''}
                 </CardDescription>
               </CardHeader>
               <CardContent>
@@ -832,6 +850,16 @@ const MusicGenerator = ({ user, onLogout }) => {
                     ))
                   )}
                 </div>
+                {musicsCursor && (
+                  <Button
+                    onClick={loadMoreMusics}
+                    disabled={isLoadingMoreMusics}
+                    variant="outline"
+                    className="w-full mt-4 bg-white/10 border-white/20 text-white hover:bg-white/20"
+                  >
+                    {isLoadingMoreMusics ? 'Carregando...' : 'Carregar mais músicas'}
+                  </Button>
+                )}
               </CardContent>
             </Card>
           </TabsContent>
@@ -5,6 +5,8 @@ from motor.motor_asyncio import AsyncIOMotorClient
 from dotenv import load_dotenv
 from typing import List, Dict, Any, Optional
 
+from .indexes import bootstrap_indexes
+
 # Carrega as variáveis de ambiente para garantir que a chave do cofre (URI) esteja disponível
 load_dotenv()
 
@@ -16,6 +18,8 @@ class DatabaseConnection:
     """
     _client: Optional[AsyncIOMotorClient] = None
     db = None
+    # Resultado da conferência do fichário (índices) feita na abertura do cofre
+    index_report: Optional[Dict[str, Any]] = None
 
     async def connect(self):
         """O Gerente chega para trabalhar e abre o cofre."""
@@ -41,6 +45,13 @@ class DatabaseConnection:
             self.db = None
             raise e # Levanta o erro para parar a aplicação, pois ela não pode funcionar sem DB
 
+        try:
+            # O fichário (índices) é conferido a cada abertura; criar o que já existe não custa nada.
+            self.index_report = await bootstrap_indexes(self.db)
+        except Exception as e:
+            # Sem índices o cofre fica lento, mas continua funcionando.
+            print(f"⚠️ Gerente do Cofre: Não foi possível conferir o fichário (índices): {e}")
+
     async def disconnect(self):
         """O Gerente fecha o cofre no final do expediente."""
         if self._client:
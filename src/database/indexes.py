@@ -0,0 +1,164 @@
+# src/database/indexes.py (O Fichário do Cofre)
+
+import os
+from datetime import datetime
+from typing import Any, Dict, Iterator, List
+
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from pymongo.errors import OperationFailure
+
+# Como o Gerente cuida dos índices na abertura do cofre:
+#   apply = cria os que faltam (idempotente) | check = só relata índices faltando e varreduras completas | off = nada
+INDEX_MODES = ("apply", "check", "off")
+
+# Valor qualquer usado nas consultas de exemplo do modo check (o plano não depende do valor).
+PROBE = "__index_probe__"
+
+# =================================================================
+# REGISTRO DECLARATIVO: cada gaveta e os índices de que suas consultas precisam.
+# Quem criar uma consulta nova registra aqui o índice e a consulta de exemplo logo abaixo.
+# =================================================================
+INDEXES: Dict[str, List[IndexModel]] = {
+    "users": [
+        IndexModel([("username", ASCENDING)], name="username_unique", unique=True),
+    ],
+    "musics": [
+        # O _id no fim desempata a paginação por chave (keyset) com o próprio índice.
+        IndexModel([("userId", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)], name="userId_created_at_id"),
+        IndexModel([("created_at", DESCENDING), ("_id", DESCENDING)], name="created_at_id"),
+        # Um por filtro da busca do cardápio (ver FILTER_INDEXES em models/music_filters.py).
+        # O prefixo do nome é um intervalo: ele vem depois da ordenação (igualdade, ordenação, intervalo), senão
+        # o índice devolve as músicas em ordem de nome e o MongoDB ordena a busca inteira na memória.
+        IndexModel([("userId", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING), ("music_name", ASCENDING)],
+                   name="userId_created_at_id_music_name"),
+        IndexModel([("userId", ASCENDING), ("genre", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)],
+                   name="userId_genre_created_at_id"),
+        IndexModel([("userId", ASCENDING), ("voice_type", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)],
+                   name="userId_voice_type_created_at_id"),
+    ],
+    "notifications": [
+        IndexModel([("user_id", ASCENDING), ("timestamp", DESCENDING)], name="user_id_timestamp"),
+        IndexModel([("user_id", ASCENDING), ("read", ASCENDING), ("timestamp", DESCENDING)], name="user_id_read_timestamp"),
+    ],
+    "process_history": [
+        IndexModel([("user_id", ASCENDING), ("process_id", ASCENDING)], name="user_id_process_id"),
+        IndexModel([("user_id", ASCENDING), ("timestamp", DESCENDING)], name="user_id_timestamp"),
+    ],
+    "generation_jobs": [
+        IndexModel([("status", ASCENDING), ("lease_expires_at", ASCENDING)], name="status_lease_expires_at"),
+        IndexModel([("owner", ASCENDING), ("status", ASCENDING)], name="owner_status"),
+    ],
+    "pending_uploads": [
+        # Cada entregador só assume as entregas da despensa da sua máquina (host).
+        IndexModel([("host", ASCENDING), ("status", ASCENDING), ("next_attempt_at", ASCENDING)],
+                   name="host_status_next_attempt_at"),
+        IndexModel([("host", ASCENDING), ("status", ASCENDING), ("lease_expires_at", ASCENDING)],
+                   name="host_status_lease_expires_at"),
+    ],
+}
+
+# Consultas de exemplo, uma por forma de consulta do código, conferidas com explain() no modo check.
+# (gaveta, filtro, ordenação)
+QUERY_SHAPES = [
+    ("users", {"username": PROBE}, None),
+    ("musics", {"userId": PROBE}, [("created_at", DESCENDING), ("_id", DESCENDING)]),
+    ("musics", {}, [("created_at", DESCENDING), ("_id", DESCENDING)]),
+    ("musics", {"userId": PROBE, "music_name": {"$regex": "^probe"}}, [("created_at", DESCENDING), ("_id", DESCENDING)]),
+    ("musics", {"userId": PROBE, "genre": PROBE}, [("created_at", DESCENDING), ("_id", DESCENDING)]),
+    ("musics", {"userId": PROBE, "voice_type": {"$in": ["male", "female"]}}, [("created_at", DESCENDING), ("_id", DESCENDING)]),
+    ("notifications", {"user_id": PROBE}, [("timestamp", DESCENDING)]),
+    ("notifications", {"user_id": PROBE, "read": False}, None),
+    ("process_history", {"user_id": PROBE, "process_id": PROBE}, None),
+    ("process_history", {"user_id": PROBE}, [("timestamp", DESCENDING)]),
+    ("generation_jobs", {"status": {"$in": ["queued", "running"]}, "lease_expires_at": {"$lt": datetime(2000, 1, 1)}},
+     [("lease_expires_at", ASCENDING)]),
+    ("generation_jobs", {"owner": PROBE, "status": {"$in": ["queued", "running"]}}, None),
+    ("pending_uploads", {"host": PROBE, "status": "pending", "next_attempt_at": {"$lte": datetime(2000, 1, 1)}},
+     [("next_attempt_at", ASCENDING)]),
+]
+
+
+def index_mode() -> str:
+    mode = os.getenv("MONGO_INDEX_MODE", "apply").lower()
+    if mode not in INDEX_MODES:
+        print(f"⚠️ MONGO_INDEX_MODE '{mode}' desconhecido. Usando 'apply'.")
+        mode = "apply"
+    return mode
+
+
+async def apply_indexes(db) -> Dict[str, List[str]]:
+    """Cria os índices registrados. create_indexes é idempotente: índices que já existem iguais não mudam."""
+    created = {}
+    for collection_name, models in INDEXES.items():
+        try:
+            created[collection_name] = await db[collection_name].create_indexes(models)
+        except OperationFailure as e:
+            # Ex.: usernames duplicados impedem o índice único, ou um índice com o mesmo nome e outra definição.
+            # O cofre continua abrindo; o modo check mostra o que ficou faltando.
+            print(f"⚠️ Fichário: não foi possível criar os índices da gaveta '{collection_name}': {e}")
+    return created
+
+
+async def missing_indexes(db) -> Dict[str, List[str]]:
+    """Índices registrados que não existem no banco (comparando as chaves, não só o nome)."""
+    missing = {}
+    for collection_name, models in INDEXES.items():
+        existing = await db[collection_name].index_information()
+        existing_keys = {tuple(tuple(key) for key in info["key"]) for info in existing.values()}
+        absent = [
+            model.document["name"] for model in models
+            if tuple(model.document["key"].items()) not in existing_keys
+        ]
+        if absent:
+            missing[collection_name] = absent
+    return missing
+
+
+def _plan_stages(plan: Any) -> Iterator[str]:
+    """Todos os estágios de um plano do explain(), em qualquer profundidade (formatos clássico e SBE)."""
+    if isinstance(plan, dict):
+        if "stage" in plan:
+            yield plan["stage"]
+        for value in plan.values():
+            yield from _plan_stages(value)
+    elif isinstance(plan, list):
+        for item in plan:
+            yield from _plan_stages(item)
+
+
+async def collection_scans(db) -> List[Dict[str, Any]]:
+    """Consultas de exemplo cujo plano vencedor faz varredura completa da gaveta (COLLSCAN)."""
+    scans = []
+    for collection_name, query, sort in QUERY_SHAPES:
+        cursor = db[collection_name].find(query)
+        if sort:
+            cursor = cursor.sort(sort)
+        explanation = await cursor.explain()
+        winning_plan = explanation.get("queryPlanner", {}).get("winningPlan", {})
+        if "COLLSCAN" in set(_plan_stages(winning_plan)):
+            scans.append({"collection": collection_name, "filter": query, "sort": sort})
+    return scans
+
+
+async def check_indexes(db) -> Dict[str, Any]:
+    """Relatório do modo check: índices faltando e consultas que varrem a gaveta inteira."""
+    report = {"missing": await missing_indexes(db), "collection_scans": await collection_scans(db)}
+    for collection_name, names in report["missing"].items():
+        print(f"🔎 Fichário: gaveta '{collection_name}' sem os índices {', '.join(names)}")
+    for scan in report["collection_scans"]:
+        print(f"🐢 Fichário: varredura completa (COLLSCAN) em '{scan['collection']}' para {scan['filter']} ordenado por {scan['sort']}")
+    if not report["missing"] and not report["collection_scans"]:
+        print("✅ Fichário: todos os índices registrados existem e nenhuma consulta varre a gaveta inteira.")
+    return report
+
+
+async def bootstrap_indexes(db) -> Dict[str, Any]:
+    """Chamado pelo Gerente na abertura do cofre, conforme MONGO_INDEX_MODE."""
+    mode = index_mode()
+    if mode == "off":
+        return {"mode": mode}
+    if mode == "check":
+        return {"mode": mode, **await check_indexes(db)}
+    created = await apply_indexes(db)
+    print(f"🗂️ Fichário: índices conferidos em {len(created)} gaveta(s).")
+    return {"mode": mode, "collections": sorted(created)}
@@ -34,6 +34,16 @@ from src.services.firebase_service import FirebaseService
 from src.services.cloudinary_service import CloudinaryService
 from src.services.websocket_service import websocket_service
 from src.services.keep_alive_service import keep_alive_service
+# A fila é importada pelo mesmo caminho usado pelas rotas ('services.'), para que
+# o startup inicie exatamente a mesma instância que recebe as comandas.
+from services.generation_queue_service import generation_queue_service
+from services.generation_cache_service import generation_cache_service
+from services.music_generation_service import music_generation_service
+from services.audio_processing_service import audio_processing_service
+from services.eta_service import eta_service
+from services.upload_retry_service import upload_retry_service
+# A adega (e as métricas de envio) é a mesma instância usada pelo Chef (caminho 'services.').
+from services.storage_service import storage_service
 from src.database.database import db_manager
 
 
@@ -58,6 +68,11 @@ async def on_startup():
     FirebaseService.initialize()
     CloudinaryService.initialize()
     keep_alive_service.start()
+    # O Livro de Comandas usa o mesmo Gerente do Cofre aberto acima (contratos e retomada de comandas).
+    generation_queue_service.start(db_manager)
+    await eta_service.start(db_manager)
+    # O entregador tenta de novo os envios que a nuvem recusou (caderno de entregas no MongoDB).
+    upload_retry_service.start(db_manager)
     print("🍃  Serviços externos prontos.")
     print("🔌  WebSocket configurado para comunicação em tempo real.")
     print("🔄  Keep-alive ativo para manter a cozinha sempre pronta.")
@@ -67,6 +82,10 @@ async def on_startup():
 async def on_shutdown():
     print("🌙  Boa noite! Encerrando os serviços...")
     keep_alive_service.stop()
+    await generation_queue_service.stop()
+    await upload_retry_service.stop()
+    await eta_service.stop()
+    audio_processing_service.shutdown()
     await db_manager.disconnect()
     print("✅  Restaurante fechado com segurança.")
 
@@ -80,7 +99,7 @@ app.include_router(notifications_router, prefix="/api/notifications", tags=["Pai
 @app.get("/health")
 async def health_check():
     keep_alive_status = keep_alive_service.get_status()
-    return {"status": "healthy", "service": "Alquimista Musical", "version": "2.0.0", "websocket": "enabled", "keep_alive": keep_alive_status, "features": ["Geração de música com IA", "Feedback em tempo real via WebSocket", "Painel de notificações persistentes", "Keep-alive automático do Hugging Face", "Estúdio virtual completo"]}
+    return {"status": "healthy", "service": "Alquimista Musical", "version": "2.0.0", "websocket": "enabled", "keep_alive": keep_alive_status, "generation_queue": generation_queue_service.get_status(), "generation_cache": generation_cache_service.get_status(), "space": music_generation_service.get_status(), "eta": eta_service.get_status(), "uploads": storage_service.get_status(), "upload_retry": upload_retry_service.get_status(), "indexes": db_manager.index_report, "features": ["Geração de música com IA", "Feedback em tempo real via WebSocket", "Painel de notificações persistentes", "Keep-alive automático do Hugging Face", "Estúdio virtual completo"]}
 
 @app.get("/api/websocket-info")
 async def websocket_info():
@@ -0,0 +1,46 @@
+# src/models/eta_models.py (O Caderno de Tempos da Cozinha)
+
+from datetime import datetime
+from typing import Dict, List
+
+from pymongo import UpdateOne
+
+# Importamos a classe de conexão para usar como "type hint" (dica de tipo).
+from database.database import DatabaseConnection
+
+
+class MongoEtaStats:
+    """
+    O Caderno de Tempos. Guarda, na gaveta 'eta_stats', as últimas durações medidas de cada etapa
+    do preparo (uma página por chave: etapa, tipo de voz, amostra e período do dia).
+    """
+
+    @classmethod
+    async def load_all(cls, db_manager: DatabaseConnection) -> Dict[str, List[float]]:
+        """Lê o caderno inteiro (poucas dezenas de páginas) para a memória."""
+        if db_manager.db is None:
+            return {}
+        stats = {}
+        async for page in db_manager.db.eta_stats.find({}, {"samples": 1}):
+            stats[page["_id"]] = page.get("samples", [])
+        return stats
+
+    @classmethod
+    async def append_samples(cls, db_manager: DatabaseConnection, new_samples: Dict[str, List[float]], window: int):
+        """
+        Acrescenta as medições novas de cada página, mantendo só as últimas `window`.
+        Usar $push (em vez de sobrescrever) deixa vários workers escreverem no mesmo caderno.
+        """
+        if db_manager.db is None or not new_samples:
+            return
+        now = datetime.utcnow()
+        operations = [
+            UpdateOne(
+                {"_id": key},
+                {"$push": {"samples": {"$each": samples, "$slice": -window}}, "$set": {"updated_at": now}},
+                upsert=True,
+            )
+            for key, samples in new_samples.items() if samples
+        ]
+        if operations:
+            await db_manager.db.eta_stats.bulk_write(operations, ordered=False)
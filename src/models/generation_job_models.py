@@ -0,0 +1,209 @@
+# src/models/generation_job_models.py (O Livro de Comandas)
+
+from datetime import datetime, timedelta
+from typing import Dict, Any, List, Optional
+
+from pymongo import ReturnDocument
+
+# Importamos a classe de conexão para usar como "type hint" (dica de tipo).
+from database.database import DatabaseConnection
+
+# Estados em que a comanda ainda precisa de um cozinheiro responsável (e de um contrato válido).
+ACTIVE_STATES = ["queued", "running"]
+
+
+class MongoGenerationJob:
+    """
+    O Livro de Comandas. Cada comanda fica registrada na gaveta 'generation_jobs' com um
+    "contrato" (lease): o cozinheiro dono da comanda renova o contrato periodicamente (heartbeat).
+    Se o cozinheiro sumir (worker reciclado pelo Gunicorn), o contrato vence e outro assume a comanda.
+    """
+
+    @classmethod
+    async def create(cls, db_manager: DatabaseConnection, job: Dict[str, Any], music_data: dict,
+                     voice_sample_path: Optional[str], owner: str, lease_seconds: int):
+        """Registra uma nova comanda no livro, já sob responsabilidade de quem a recebeu."""
+        if db_manager.db is None:
+            print("⚠️ Gerente indisponível, comanda não registrada no livro.")
+            return None
+
+        now = datetime.utcnow()
+        job_doc = {
+            "_id": job["job_id"],
+            "user_id": job["user_id"],
+            "kind": job["kind"],
+            "lane": job["lane"],
+            "music_name": job.get("music_name"),
+            "music_data": music_data,
+            "voice_sample_path": voice_sample_path,
+            "status": job["status"],
+            "owner": owner,
+            "lease_expires_at": now + timedelta(seconds=lease_seconds),
+            "attempts": 0,
+            "created_at": now,
+            "updated_at": now,
+            "started_at": None,
+            "finished_at": None,
+            "result": None,
+            "error": None,
+        }
+        await db_manager.db.generation_jobs.insert_one(job_doc)
+        return job_doc
+
+    @classmethod
+    async def claim(cls, db_manager: DatabaseConnection, job_id: str, owner: str, lease_seconds: int):
+        """
+        O cozinheiro assume a comanda para começar a preparar. Só dá certo se ela ainda estiver
+        ativa e sob sua responsabilidade (outro worker pode ter assumido depois de um contrato vencido).
+        """
+        if db_manager.db is None:
+            return None
+        now = datetime.utcnow()
+        return await db_manager.db.generation_jobs.find_one_and_update(
+            {"_id": job_id, "owner": owner, "status": {"$in": ACTIVE_STATES}},
+            {
+                "$set": {
+                    "status": "running",
+                    "started_at": now,
+                    "updated_at": now,
+                    "lease_expires_at": now + timedelta(seconds=lease_seconds),
+                },
+                "$inc": {"attempts": 1},
+            },
+            return_document=ReturnDocument.AFTER,
+        )
+
+    @classmethod
+    async def heartbeat(cls, db_manager: DatabaseConnection, owner: str, lease_seconds: int) -> int:
+        """Renova o contrato de todas as comandas ativas deste cozinheiro."""
+        if db_manager.db is None:
+            return 0
+        now = datetime.utcnow()
+        result = await db_manager.db.generation_jobs.update_many(
+            {"owner": owner, "status": {"$in": ACTIVE_STATES}},
+            {"$set": {"lease_expires_at": now + timedelta(seconds=lease_seconds), "updated_at": now}},
+        )
+        return result.modified_count
+
+    @classmethod
+    async def reclaim_expired(cls, db_manager: DatabaseConnection, owner: str, lease_seconds: int,
+                              limit: int) -> List[Dict[str, Any]]:
+        """Assume, uma a uma, as comandas ativas cujo contrato venceu (o dono anterior sumiu)."""
+        if db_manager.db is None:
+            return []
+        reclaimed = []
+        while len(reclaimed) < limit:
+            now = datetime.utcnow()
+            job_doc = await db_manager.db.generation_jobs.find_one_and_update(
+                {"status": {"$in": ACTIVE_STATES}, "lease_expires_at": {"$lt": now}},
+                {
+                    "$set": {
+                        "status": "queued",
+                        "owner": owner,
+                        "lease_expires_at": now + timedelta(seconds=lease_seconds),
+                        "updated_at": now,
+                    }
+                },
+                sort=[("lease_expires_at", 1)],
+                return_document=ReturnDocument.AFTER,
+            )
+            if job_doc is None:
+                break
+            reclaimed.append(job_doc)
+        return reclaimed
+
+    @classmethod
+    async def release(cls, db_manager: DatabaseConnection, owner: str, job_id: Optional[str] = None) -> int:
+        """
+        Devolve comandas ativas ao livro com o contrato já vencido, para outro cozinheiro assumir
+        imediatamente (ex.: fim do expediente). Sem job_id, devolve todas as comandas do dono.
+        """
+        if db_manager.db is None:
+            return 0
+        query = {"owner": owner, "status": {"$in": ACTIVE_STATES}}
+        if job_id:
+            query["_id"] = job_id
+        now = datetime.utcnow()
+        result = await db_manager.db.generation_jobs.update_many(
+            query,
+            {"$set": {"status": "queued", "owner": None, "lease_expires_at": now, "updated_at": now}},
+        )
+        return result.modified_count
+
+    @classmethod
+    async def finish(cls, db_manager: DatabaseConnection, job_id: str, owner: str, status: str,
+                     result: Optional[dict] = None, error: Optional[str] = None) -> bool:
+        """
+        Fecha a comanda no livro com o estado final. Só vale para o dono atual de uma comanda ainda ativa:
+        um cozinheiro cujo contrato venceu (e a comanda foi assumida por outro) não sobrescreve o novo dono.
+        Devolve se a comanda foi fechada.
+        """
+        if db_manager.db is None:
+            return False
+        now = datetime.utcnow()
+        updated = await db_manager.db.generation_jobs.update_one(
+            {"_id": job_id, "owner": owner, "status": {"$in": ACTIVE_STATES}},
+            {"$set": {
+                "status": status,
+                "result": result,
+                "error": error,
+                "finished_at": now,
+                "updated_at": now,
+                "owner": None,
+            }},
+        )
+        return updated.modified_count > 0
+
+    @classmethod
+    async def request_cancel(cls, db_manager: DatabaseConnection, job_id: str, error: str):
+        """
+        Marca como cancelada uma comanda ativa que está com outro processo. O dono percebe no
+        próximo heartbeat e interrompe o preparo. Devolve o registro atualizado (ou None se já terminou).
+        """
+        if db_manager.db is None:
+            return None
+        now = datetime.utcnow()
+        return await db_manager.db.generation_jobs.find_one_and_update(
+            {"_id": job_id, "status": {"$in": ACTIVE_STATES}},
+            {"$set": {"status": "cancelled", "error": error, "finished_at": now, "updated_at": now}},
+            return_document=ReturnDocument.AFTER,
+        )
+
+    @classmethod
+    async def find_cancelled(cls, db_manager: DatabaseConnection, job_ids: List[str]) -> List[str]:
+        """Dentre as comandas informadas, quais foram canceladas no livro."""
+        if db_manager.db is None or not job_ids:
+            return []
+        cursor = db_manager.db.generation_jobs.find(
+            {"_id": {"$in": job_ids}, "status": "cancelled"}, {"_id": 1}
+        )
+        return [job_doc["_id"] async for job_doc in cursor]
+
+    @classmethod
+    async def find_by_id(cls, db_manager: DatabaseConnection, job_id: str):
+        """Busca uma comanda pelo ID."""
+        if db_manager.db is None:
+            return None
+        return await db_manager.db.generation_jobs.find_one({"_id": job_id})
+
+    @staticmethod
+    def to_job(job_doc: Dict[str, Any]) -> Dict[str, Any]:
+        """Converte o registro do livro para o mesmo formato das comandas em memória."""
+        def to_timestamp(value):
+            # Os horários são gravados em UTC "ingênuo" (datetime.utcnow), como no resto do cofre.
+            return (value - datetime(1970, 1, 1)).total_seconds() if value else None
+
+        return {
+            "job_id": job_doc["_id"],
+            "kind": job_doc.get("kind"),
+            "lane": job_doc.get("lane"),
+            "user_id": job_doc["user_id"],
+            "music_name": job_doc.get("music_name"),
+            "status": job_doc["status"],
+            "created_at": to_timestamp(job_doc.get("created_at")),
+            "started_at": to_timestamp(job_doc.get("started_at")),
+            "finished_at": to_timestamp(job_doc.get("finished_at")),
+            "result": job_doc.get("result"),
+            "error": job_doc.get("error"),
+            "attempts": job_doc.get("attempts", 0),
+        }
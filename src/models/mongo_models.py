@@ -1,13 +1,50 @@
 # src/models/mongo_models.py (Versão Corrigida)
 
 import os
+import json
+import base64
 from werkzeug.security import generate_password_hash, check_password_hash
 from datetime import datetime, timedelta
 import jwt
 from bson import ObjectId
+from pymongo.errors import OperationFailure
 
 # Importamos a classe de conexão para usar como "type hint" (dica de tipo).
 from database.database import DatabaseConnection
+from models.music_filters import normalize_genre
+
+# Situação da música no cardápio: pronta, ou esperando a entrega do áudio para a nuvem.
+MUSIC_READY = "ready"
+MUSIC_PENDING_UPLOAD = "pending_upload"
+MUSIC_UPLOAD_FAILED = "upload_failed"
+
+# Páginas do cardápio: tamanho padrão e teto, para nenhuma consulta carregar a biblioteca inteira.
+MUSIC_PAGE_SIZE = int(os.getenv("MUSIC_PAGE_SIZE", 20))
+MUSIC_PAGE_SIZE_MAX = int(os.getenv("MUSIC_PAGE_SIZE_MAX", 100))
+# Exportação da biblioteca: quantas músicas cada ida ao MongoDB traz (e quantas linhas cada pedaço da resposta leva).
+MUSIC_EXPORT_BATCH_SIZE = int(os.getenv("MUSIC_EXPORT_BATCH_SIZE", 200))
+
+# Campos de uma música como a API os devolve (to_dict) -> campo no documento da gaveta 'musics'
+MUSIC_FIELDS = {
+    "id": "_id",
+    "user_id": "userId",
+    "music_url": "music_url",
+    "stream_url": "stream_url",
+    "preview_url": "preview_url",
+    "music_name": "music_name",
+    "description": "description",
+    "lyrics": "lyrics",
+    "voice_type": "voice_type",
+    "genre": "genre",
+    "status": "status",
+    "created_at": "created_at",
+    "timestamp": "timestamp",
+}
+# Visões prontas: as listas usam 'summary' (sem letra e descrição); a letra só viaja quando alguém abre a faixa.
+MUSIC_VIEWS = {
+    "summary": ("id", "user_id", "music_name", "voice_type", "genre", "status", "music_url", "stream_url", "preview_url", "created_at"),
+    "full": tuple(MUSIC_FIELDS),
+}
 
 class MongoUser:
     @classmethod
@@ -70,36 +107,148 @@ class MongoMusic:
             return None
 
         musics_collection = db_manager.db.musics
-        music_doc = {
+        music_doc = cls._build_music_doc(user_id, music_data)
+        
+        result = await musics_collection.insert_one(music_doc)
+        music_doc["_id"] = result.inserted_id
+        return music_doc
+    
+    @staticmethod
+    def _build_music_doc(user_id: str, music_data: dict) -> dict:
+        """Monta o registro de uma música no formato da gaveta 'musics'."""
+        return {
             "userId": user_id,
             "music_url": music_data.get("musicUrl"),
+            "stream_url": music_data.get("streamUrl"),
+            "preview_url": music_data.get("previewUrl"),
             "music_name": music_data.get("musicName", "Música Sem Título"),
             "description": music_data.get("description", ""),
             "lyrics": music_data.get("lyrics", ""),
             "voice_type": music_data.get("voiceType", "instrumental"),
+            # Normalizado para o filtro por gênero casar sem depender de maiúsculas e espaços.
+            "genre": normalize_genre(music_data.get("genre")) or None,
+            "status": music_data.get("status", MUSIC_READY),
             "created_at": datetime.utcnow(),
             "timestamp": music_data.get("timestamp", int(datetime.utcnow().timestamp()))
         }
-        
-        result = await musics_collection.insert_one(music_doc)
-        music_doc["_id"] = result.inserted_id
-        return music_doc
     
     @classmethod
-    async def find_by_user(cls, db_manager: DatabaseConnection, user_id: str):
-        """Busca músicas de um usuário, usando o cofre fornecido pelo Gerente."""
-        if db_manager.db is None: 
-            return []
-        cursor = db_manager.db.musics.find({"userId": user_id}).sort("created_at", -1)
-        return await cursor.to_list(length=None)
+    async def find_by_id(cls, db_manager: DatabaseConnection, music_id: str, fields=None):
+        """Busca uma música pelo ID (None se o ID for inválido ou não existir)."""
+        if db_manager.db is None or not ObjectId.is_valid(music_id):
+            return None
+        return await db_manager.db.musics.find_one({"_id": ObjectId(music_id)}, cls.projection(fields))
     
     @classmethod
-    async def find_all(cls, db_manager: DatabaseConnection):
-        """Busca todas as músicas, usando o cofre fornecido pelo Gerente."""
+    async def find_by_user(cls, db_manager: DatabaseConnection, user_id: str, limit: int = MUSIC_PAGE_SIZE,
+                           cursor: str = None, fields=None):
+        """Busca uma página das músicas de um usuário. Devolve (músicas, next_cursor)."""
+        return await cls.find_page(db_manager, {"userId": user_id}, limit, cursor, fields)
+    
+    @classmethod
+    async def find_all(cls, db_manager: DatabaseConnection, limit: int = MUSIC_PAGE_SIZE, cursor: str = None,
+                       fields=None):
+        """Busca uma página de todas as músicas. Devolve (músicas, next_cursor)."""
+        return await cls.find_page(db_manager, {}, limit, cursor, fields)
+    
+    @classmethod
+    async def find_page(cls, db_manager: DatabaseConnection, query: dict, limit: int = MUSIC_PAGE_SIZE,
+                        cursor: str = None, fields=None, hint: str = None):
+        """
+        Paginação por chave (keyset) em (created_at, _id), da mais nova para a mais antiga.
+        Em vez de skip (que percorre tudo o que pula), cada página continua do ponto exato em que a
+        anterior parou: o custo é o mesmo na primeira página e na milésima. Devolve (músicas, next_cursor);
+        next_cursor é None na última página. Um cursor inválido levanta ValueError.
+        Com fields (nomes da API), só esses campos saem do MongoDB (projeção); com hint (nome de um
+        índice do registro em database/indexes.py), a consulta usa esse índice.
+        """
         if db_manager.db is None: 
-            return []
-        cursor = db_manager.db.musics.find().sort("created_at", -1)
-        return await cursor.to_list(length=None)
+            return [], None
+        limit = max(1, min(limit or MUSIC_PAGE_SIZE, MUSIC_PAGE_SIZE_MAX))
+        return await cls._keyset_page(db_manager, query, limit, cursor, fields, hint)
+    
+    @classmethod
+    async def _keyset_page(cls, db_manager: DatabaseConnection, query: dict, limit: int, cursor: str = None,
+                           fields=None, hint: str = None):
+        """Uma página de limit músicas depois do cursor, sem o teto da API (usado também pela exportação)."""
+        if cursor:
+            created_at, music_id = cls.decode_cursor(cursor)
+            after = {"$or": [
+                {"created_at": {"$lt": created_at}},
+                {"created_at": created_at, "_id": {"$lt": music_id}},
+            ]}
+            query = {"$and": [query, after]} if query else after
+        # Um a mais que o pedido: se ele vier, existe próxima página.
+        found = db_manager.db.musics.find(query, cls.projection(fields, keyset=True)).sort([("created_at", -1), ("_id", -1)]).limit(limit + 1)
+        try:
+            musics = await (found.clone().hint(hint) if hint else found).to_list(length=limit + 1)
+        except OperationFailure as e:
+            # Índice ainda não criado (MONGO_INDEX_MODE=check/off): a página sai, só que sem a dica.
+            print(f"⚠️ Índice '{hint}' indisponível para a consulta de músicas: {e}")
+            musics = await found.to_list(length=limit + 1)
+        next_cursor = cls.encode_cursor(musics[limit - 1]) if len(musics) > limit else None
+        return musics[:limit], next_cursor
+    
+    @classmethod
+    async def iter_library(cls, db_manager: DatabaseConnection, user_id: str, fields=None,
+                           batch_size: int = MUSIC_EXPORT_BATCH_SIZE):
+        """
+        Percorre a biblioteca inteira de um usuário (da mais nova para a mais antiga) sem carregá-la na memória:
+        uma página por chave (keyset) de batch_size músicas por vez, e a próxima só é pedida quando esta acabar.
+        Cada página é uma consulta curta que continua do ponto exato da anterior, então um cliente lento
+        não segura um cursor aberto no MongoDB (que expira depois de alguns minutos parado).
+        """
+        if db_manager.db is None:
+            return
+        cursor = None
+        while True:
+            musics, cursor = await cls._keyset_page(db_manager, {"userId": user_id}, batch_size, cursor, fields)
+            for music in musics:
+                yield music
+            if not cursor:
+                return
+    
+    @staticmethod
+    def resolve_fields(view: str = "summary", fields: str = None) -> tuple:
+        """
+        Campos pedidos pelo cliente: fields (lista separada por vírgulas) tem prioridade sobre view.
+        Campos ou visões desconhecidos levantam ValueError.
+        """
+        if fields:
+            requested = tuple(dict.fromkeys(field.strip() for field in fields.split(",") if field.strip()))
+            unknown = [field for field in requested if field not in MUSIC_FIELDS]
+            if unknown:
+                raise ValueError(f"Campos desconhecidos: {', '.join(unknown)}. Disponíveis: {', '.join(MUSIC_FIELDS)}.")
+            return requested
+        if view not in MUSIC_VIEWS:
+            raise ValueError(f"Visão desconhecida: '{view}'. Use uma de: {', '.join(MUSIC_VIEWS)}.")
+        return MUSIC_VIEWS[view]
+    
+    @staticmethod
+    def projection(fields=None, keyset: bool = False):
+        """Projeção do MongoDB para os campos da API pedidos (None = documento inteiro)."""
+        if not fields:
+            return None
+        projection = {MUSIC_FIELDS[field]: 1 for field in fields}
+        if keyset:
+            # A posição da página (created_at, _id) sempre vem, mesmo que o cliente não peça.
+            projection["created_at"] = 1
+        return projection
+    
+    @staticmethod
+    def encode_cursor(music) -> str:
+        """Marcador opaco da posição de uma música na ordenação (created_at, _id)."""
+        position = {"t": music["created_at"].isoformat(), "id": str(music["_id"])}
+        return base64.urlsafe_b64encode(json.dumps(position, separators=(",", ":")).encode()).decode().rstrip("=")
+    
+    @staticmethod
+    def decode_cursor(cursor: str):
+        try:
+            padded = cursor + "=" * (-len(cursor) % 4)
+            position = json.loads(base64.urlsafe_b64decode(padded.encode()))
+            return datetime.fromisoformat(position["t"]), ObjectId(position["id"])
+        except Exception:
+            raise ValueError("Cursor de paginação inválido.")
     
     # ================== INÍCIO DA CORREÇÃO ==================
     # A função do "Arquivista" foi movida para cá, seu lugar correto.
@@ -131,22 +280,69 @@ class MongoMusic:
             return None
     # =================== FIM DA CORREÇÃO ====================
 
+    @classmethod
+    async def add_generated_musics(cls, db_manager: DatabaseConnection, musics_data: list):
+        """Registra várias músicas geradas de uma vez, com um único insert_many."""
+        print(f"✍️ Arquivista: Registrando {len(musics_data)} prato(s) de uma só vez no livro de receitas.")
+        
+        if db_manager.db is None:
+            print("⚠️ Gerente indisponível, não foi possível registrar as músicas.")
+            return []
+        
+        music_docs = [
+            cls._build_music_doc(music_data["userId"], music_data)
+            for music_data in musics_data if music_data.get("userId")
+        ]
+        if not music_docs:
+            return []
+
+        try:
+            result = await db_manager.db.musics.insert_many(music_docs)
+            for music_doc, inserted_id in zip(music_docs, result.inserted_ids):
+                music_doc["_id"] = inserted_id
+            return music_docs
+        except Exception as error:
+            print(f"🚨 Arquivista: Falha crítica ao tentar registrar o lote de pratos: {error}")
+            return []
+
+    @classmethod
+    async def set_upload_result(cls, db_manager: DatabaseConnection, music_ids: list, status: str, music_url: str = None,
+                                stream_url: str = None, preview_url: str = None):
+        """Fecha a entrega pendente das músicas: grava a URL definitiva e as das versões extras (ou marca a falha)."""
+        if db_manager.db is None or not music_ids:
+            return 0
+        update = {"status": status}
+        for field, url in (("music_url", music_url), ("stream_url", stream_url), ("preview_url", preview_url)):
+            if url:
+                update[field] = url
+        result = await db_manager.db.musics.update_many(
+            {"_id": {"$in": [ObjectId(music_id) for music_id in music_ids]}}, {"$set": update}
+        )
+        return result.modified_count
+
     @staticmethod
-    def to_dict(music):
-        """Converte música para dicionário (não precisa de acesso ao DB)."""
+    def to_dict(music, fields=None):
+        """Converte música para dicionário (não precisa de acesso ao DB). Com fields, só esses campos."""
         if not music: 
             return None
-        return {
+        music_dict = {
             "id": str(music["_id"]),
             "user_id": music.get("userId"),
             "music_url": music.get("music_url"),
+            "stream_url": music.get("stream_url"),
+            "preview_url": music.get("preview_url"),
             "music_name": music.get("music_name"),
             "description": music.get("description"),
             "lyrics": music.get("lyrics"),
             "voice_type": music.get("voice_type"),
+            "genre": music.get("genre"),
+            "status": music.get("status", MUSIC_READY),
             "created_at": music["created_at"].isoformat() if music.get("created_at") else None,
             "timestamp": music.get("timestamp")
         }
+        if fields:
+            return {field: music_dict[field] for field in fields}
+        return music_dict
 
 # As funções de token não dependem do banco de dados, então podem continuar como estão.
 def generate_token(user_id):
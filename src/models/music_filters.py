@@ -0,0 +1,117 @@
+# src/models/music_filters.py (As Preferências do Cliente)
+
+import re
+from collections import namedtuple
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, Tuple
+
+VOICE_TYPES = ("instrumental", "male", "female", "both")
+NAME_PREFIX_MAX = 100
+
+# Um filtro que o Maître aceita: campo no documento, operador, conversão do valor e se aceita vários valores.
+MusicFilter = namedtuple("MusicFilter", "field operator coerce multiple")
+
+# Resultado da compilação: filtro do MongoDB, índice que o atende (hint) e os filtros já convertidos (para a resposta).
+CompiledFilters = namedtuple("CompiledFilters", "query hint applied")
+
+
+def _voice_type(value: str) -> str:
+    value = value.strip().lower()
+    if value not in VOICE_TYPES:
+        raise ValueError(f"voice_type inválido: '{value}'. Use um de: {', '.join(VOICE_TYPES)}.")
+    return value
+
+
+def _genre(value: str) -> str:
+    # Os gêneros são gravados normalizados (ver MongoMusic._build_music_doc), então a busca também é.
+    value = normalize_genre(value)
+    if not value:
+        raise ValueError("genre não pode ser vazio.")
+    return value
+
+
+def _date(value: str) -> datetime:
+    """Data (2024-05-01) ou data e hora ISO 8601; com fuso, convertida para UTC (como o created_at é gravado)."""
+    try:
+        moment = datetime.fromisoformat(value.strip().replace("Z", "+00:00"))
+    except ValueError:
+        raise ValueError(f"Data inválida: '{value}'. Use o formato ISO 8601 (ex.: 2024-05-01 ou 2024-05-01T12:00:00Z).")
+    if moment.tzinfo is not None:
+        moment = moment.astimezone(timezone.utc).replace(tzinfo=None)
+    return moment
+
+
+def _name_prefix(value: str) -> str:
+    value = value.strip()
+    if not value or len(value) > NAME_PREFIX_MAX:
+        raise ValueError(f"name_prefix deve ter entre 1 e {NAME_PREFIX_MAX} caracteres.")
+    return value
+
+
+def normalize_genre(genre: str) -> str:
+    return " ".join((genre or "").split()).lower()
+
+
+# Lista branca: qualquer outro parâmetro é recusado com 400.
+MUSIC_FILTERS = {
+    "voice_type": MusicFilter("voice_type", "$in", _voice_type, True),
+    "genre": MusicFilter("genre", "$in", _genre, True),
+    "created_after": MusicFilter("created_at", "$gte", _date, False),
+    "created_before": MusicFilter("created_at", "$lt", _date, False),
+    # Prefixo ancorado e sensível a maiúsculas: é a única forma de regex que o MongoDB resolve pelo índice.
+    "name_prefix": MusicFilter("music_name", "prefix", _name_prefix, False),
+}
+
+# Índice que atende cada filtro (todos começam por userId e trazem a ordenação da página: created_at, _id).
+# Filtros de igualdade vêm antes da ordenação; o prefixo do nome, que é um intervalo, vem depois dela: o índice
+# percorre as músicas do cliente já na ordem da página, conferindo o nome na própria chave, e para quando a página
+# enche (sem ordenar na memória). O custo é percorrer as músicas mais novas que não casam com o prefixo.
+# Em ordem de preferência: com vários filtros, o primeiro da lista escolhe o índice e os outros filtram o que ele trouxer
+# (por isso as igualdades vêm primeiro: elas já pulam direto para as músicas do gênero ou da voz).
+FILTER_INDEXES = (
+    ("genre", "userId_genre_created_at_id"),
+    ("voice_type", "userId_voice_type_created_at_id"),
+    ("name_prefix", "userId_created_at_id_music_name"),
+)
+# Só intervalo de datas (ou nenhum filtro): o índice da paginação já resolve.
+DEFAULT_FILTER_INDEX = "userId_created_at_id"
+
+
+def compile_music_filters(user_id: str, params: Iterable[Tuple[str, str]]) -> CompiledFilters:
+    """
+    Traduz os parâmetros da busca (pares chave/valor, repetidos quando há vários valores) num filtro
+    do MongoDB sempre preso ao cardápio do próprio cliente e num índice que o atende, para nenhuma
+    busca varrer a gaveta inteira. Filtros fora da lista branca ou valores inválidos levantam ValueError.
+    """
+    values: Dict[str, list] = {}
+    for key, value in params:
+        values.setdefault(key, []).append(value)
+
+    unknown = [key for key in values if key not in MUSIC_FILTERS]
+    if unknown:
+        raise ValueError(f"Filtros não suportados: {', '.join(unknown)}. Disponíveis: {', '.join(MUSIC_FILTERS)}.")
+
+    query: Dict[str, Any] = {"userId": user_id}
+    applied: Dict[str, Any] = {}
+    for name, raw_values in values.items():
+        spec = MUSIC_FILTERS[name]
+        if len(raw_values) > 1 and not spec.multiple:
+            raise ValueError(f"O filtro '{name}' aceita um único valor.")
+        coerced = [spec.coerce(value) for value in raw_values]
+
+        if spec.operator == "$in":
+            query[spec.field] = coerced[0] if len(coerced) == 1 else {"$in": sorted(set(coerced))}
+            applied[name] = coerced if spec.multiple else coerced[0]
+        elif spec.operator == "prefix":
+            query[spec.field] = {"$regex": f"^{re.escape(coerced[0])}"}
+            applied[name] = coerced[0]
+        else:
+            query.setdefault(spec.field, {})[spec.operator] = coerced[0]
+            applied[name] = coerced[0].isoformat()
+
+    created_at = query.get("created_at", {})
+    if "$gte" in created_at and "$lt" in created_at and created_at["$gte"] >= created_at["$lt"]:
+        raise ValueError("created_after deve ser anterior a created_before.")
+
+    hint = next((index for name, index in FILTER_INDEXES if name in values), DEFAULT_FILTER_INDEX)
+    return CompiledFilters(query, hint, applied)
@@ -0,0 +1,129 @@
+# src/models/upload_models.py (O Caderno de Entregas Pendentes)
+
+from datetime import datetime, timedelta
+from typing import Dict, Any, Optional
+
+from pymongo import ReturnDocument
+
+# Importamos a classe de conexão para usar como "type hint" (dica de tipo).
+from database.database import DatabaseConnection
+
+UPLOAD_PENDING = "pending"
+UPLOAD_UPLOADING = "uploading"
+UPLOAD_DONE = "done"
+UPLOAD_FAILED = "failed"
+
+
+class MongoPendingUpload:
+    """
+    O Caderno de Entregas Pendentes. Quando a nuvem recusa um prato, o áudio fica guardado na
+    despensa (diretório de staging) e a entrega é anotada na gaveta 'pending_uploads'.
+    Uma entrega por arquivo: pedidos que pegaram carona no mesmo preparo viram "destinatários"
+    (targets) da mesma entrega, e um único envio atualiza todas as músicas.
+    A despensa é o disco local de cada máquina: cada entrega guarda a máquina (host) onde o arquivo
+    ficou, e só o entregador dessa máquina a assume.
+    """
+
+    @classmethod
+    async def add_target(cls, db_manager: DatabaseConnection, upload_name: str, staged_path: str, host: str,
+                         target: Dict[str, Any], first_attempt_delay: float, cache_key: Optional[str] = None,
+                         renditions: Optional[Dict[str, str]] = None):
+        """
+        Anota a entrega (se ainda não existe) e acrescenta um destinatário.
+        Devolve a entrega como ficou: se ela já foi concluída, quem chamou usa a URL na hora.
+        """
+        if db_manager.db is None:
+            print("⚠️ Gerente indisponível, entrega pendente não registrada.")
+            return None
+
+        now = datetime.utcnow()
+        return await db_manager.db.pending_uploads.find_one_and_update(
+            {"_id": upload_name},
+            {
+                "$setOnInsert": {
+                    "staged_path": staged_path,
+                    "host": host,
+                    "cache_key": cache_key,
+                    "renditions": renditions or {},
+                    "status": UPLOAD_PENDING,
+                    "attempts": 0,
+                    "next_attempt_at": now + timedelta(seconds=first_attempt_delay),
+                    "owner": None,
+                    "lease_expires_at": None,
+                    "music_url": None,
+                    "last_error": None,
+                    "created_at": now,
+                },
+                "$push": {"targets": target},
+                "$set": {"updated_at": now},
+            },
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+
+    @classmethod
+    async def claim_due(cls, db_manager: DatabaseConnection, owner: str, host: str, lease_seconds: int):
+        """
+        Assume a próxima entrega vencida guardada na despensa desta máquina (host). Entregas presas em
+        'uploading' com o contrato vencido (o worker sumiu no meio do envio) também voltam para a fila.
+        """
+        if db_manager.db is None:
+            return None
+        now = datetime.utcnow()
+        return await db_manager.db.pending_uploads.find_one_and_update(
+            {
+                "host": host,
+                "$or": [
+                    {"status": UPLOAD_PENDING, "next_attempt_at": {"$lte": now}},
+                    {"status": UPLOAD_UPLOADING, "lease_expires_at": {"$lt": now}},
+                ]
+            },
+            {
+                "$set": {
+                    "status": UPLOAD_UPLOADING,
+                    "owner": owner,
+                    "lease_expires_at": now + timedelta(seconds=lease_seconds),
+                    "updated_at": now,
+                },
+                "$inc": {"attempts": 1},
+            },
+            sort=[("next_attempt_at", 1)],
+            return_document=ReturnDocument.AFTER,
+        )
+
+    @classmethod
+    async def complete(cls, db_manager: DatabaseConnection, upload_id: str, music_url: str):
+        """Entrega feita. Devolve o registro com todos os destinatários anotados até agora."""
+        if db_manager.db is None:
+            return None
+        now = datetime.utcnow()
+        return await db_manager.db.pending_uploads.find_one_and_update(
+            {"_id": upload_id},
+            {"$set": {"status": UPLOAD_DONE, "music_url": music_url, "owner": None,
+                      "completed_at": now, "updated_at": now}},
+            return_document=ReturnDocument.AFTER,
+        )
+
+    @classmethod
+    async def reschedule(cls, db_manager: DatabaseConnection, upload_id: str, delay: float, error: str):
+        """A nuvem recusou de novo: a entrega volta para a fila com a próxima tentativa marcada."""
+        if db_manager.db is None:
+            return None
+        now = datetime.utcnow()
+        await db_manager.db.pending_uploads.update_one(
+            {"_id": upload_id},
+            {"$set": {"status": UPLOAD_PENDING, "owner": None, "lease_expires_at": None,
+                      "next_attempt_at": now + timedelta(seconds=delay), "last_error": error, "updated_at": now}},
+        )
+
+    @classmethod
+    async def fail(cls, db_manager: DatabaseConnection, upload_id: str, error: str):
+        """Desistimos da entrega. Devolve o registro para avisar os destinatários."""
+        if db_manager.db is None:
+            return None
+        now = datetime.utcnow()
+        return await db_manager.db.pending_uploads.find_one_and_update(
+            {"_id": upload_id},
+            {"$set": {"status": UPLOAD_FAILED, "owner": None, "last_error": error, "updated_at": now}},
+            return_document=ReturnDocument.AFTER,
+        )
@@ -1,10 +1,20 @@
 # src/routes/music.py (O Garçom Anotando o Pedido)
 
-from fastapi import APIRouter, HTTPException, status, BackgroundTasks, Depends, Form, UploadFile, File
-from typing import Optional, Literal
+import os
+import re
+import asyncio
+import aiofiles
+from fastapi import APIRouter, HTTPException, status, Depends, Form, UploadFile, File, Header, Request
+from fastapi.responses import FileResponse, Response, StreamingResponse
+from typing import List, Optional, Literal, Tuple
 
 # --- CORREÇÃO DE IMPORTAÇÃO ---
-from services.music_generation_service import MusicGenerationService
+from services.music_generation_service import MusicGenerationService, MAX_VOICE_SAMPLE_BYTES
+from services.generation_queue_service import (
+    generation_queue_service, GenerationQueueService, JOB_KIND_BATCH, JOB_KIND_SINGLE, JOB_CANCELLED
+)
+from services.storage_service import storage_service, AUDIO_CONTENT_TYPES
+from models.generation_job_models import MongoGenerationJob
 from .user import get_current_user_id
 # ================== INÍCIO DA CORREÇÃO ==================
 # O Garçom precisa saber como pedir acesso ao Gerente do Cofre para entregar à Cozinha.
@@ -14,12 +24,75 @@ from database.database import get_database, DatabaseConnection
 # --- Router do FastAPI ---
 music_router = APIRouter()
 
+VOICE_SAMPLE_TOO_LARGE_DETAIL = f"Ingrediente especial (voz) muito pesado! Máximo {MAX_VOICE_SAMPLE_BYTES // (1024 * 1024)}MB (aproximadamente 5 minutos)."
+
 # Instancia o serviço de geração de música (a conexão direta com a Cozinha)
 music_generator = MusicGenerationService()
 
+MAX_BATCH_SIZE = int(os.getenv("MAX_BATCH_SIZE", 8))
+
+# Pedaço lido do disco por vez ao servir um trecho (Range) de um áudio da adega local
+AUDIO_STREAM_CHUNK_SIZE = 64 * 1024
+AUDIO_CACHE_SECONDS = int(os.getenv("AUDIO_CACHE_SECONDS", 86400))
+
+
+def _check_voice_sample(voiceSample: Optional[UploadFile], current_user_id: str):
+    """O Garçom confere o ingrediente especial (amostra de voz) antes de aceitar o pedido."""
+    if not voiceSample:
+        return
+    
+    print(f"🎤 Garçom: Cliente forneceu um ingrediente especial (amostra de voz: {voiceSample.filename}). Verificando a qualidade...")
+    # O tamanho declarado só serve para recusar cedo; o limite real é conferido enquanto o arquivo é gravado.
+    if voiceSample.size and voiceSample.size > MAX_VOICE_SAMPLE_BYTES:
+        print(f"🚫 Garçom: Ingrediente especial do cliente {current_user_id} é muito pesado ({voiceSample.size} bytes).")
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=VOICE_SAMPLE_TOO_LARGE_DETAIL
+        )
+    
+    allowed_types = ["audio/mp3", "audio/mpeg", "audio/wav", "audio/wave", "audio/m4a", "audio/mp4", "audio/ogg", "audio/flac"]
+    if voiceSample.content_type not in allowed_types:
+        print(f"🚫 Garçom: Ingrediente especial do cliente {current_user_id} tem um formato não aceito ({voiceSample.content_type}).")
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Este tipo de ingrediente especial (formato de áudio) não é aceito pela nossa cozinha. Use MP3, WAV, M4A, OGG ou FLAC."
+        )
+
+
+async def _enqueue_order(db_manager: DatabaseConnection, music_data: dict, voiceSample: Optional[UploadFile],
+                         current_user_id: str, kind: str = JOB_KIND_SINGLE) -> dict:
+    """Guarda a amostra de voz (se houver) e coloca a comanda na fila da Cozinha."""
+    voice_sample_path = None
+    if voiceSample:
+        try:
+            voice_sample_path, music_data["voiceSampleHash"] = await music_generator.save_voice_sample(voiceSample, current_user_id)
+        except ValueError:
+            print(f"🚫 Garçom: Ingrediente especial do cliente {current_user_id} passou do limite durante o recebimento.")
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=VOICE_SAMPLE_TOO_LARGE_DETAIL
+            )
+    
+    try:
+        return await generation_queue_service.submit(
+            db_manager=db_manager,
+            music_data=music_data,
+            user_id=current_user_id,
+            voice_sample_path=voice_sample_path,
+            kind=kind
+        )
+    except asyncio.QueueFull:
+        if voice_sample_path and os.path.exists(voice_sample_path):
+            os.remove(voice_sample_path)
+        print(f"🚫 Garçom: A fila da Cozinha está lotada. Pedido de \'{music_data.get('musicName')}\' recusado.")
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Nossa cozinha está lotada no momento! Tente fazer seu pedido novamente em alguns minutos."
+        )
+
+
 @music_router.post("/generate", status_code=status.HTTP_202_ACCEPTED)
 async def generate_music(
-    background_tasks: BackgroundTasks,
     current_user_id: str = Depends(get_current_user_id),
     # ================== INÍCIO DA CORREÇÃO ==================
     # O Garçom agora também pega a "chave do cofre" (db_manager) para a Cozinha usar mais tarde.
@@ -37,6 +110,7 @@ async def generate_music(
     rhythm: Optional[Literal["slow", "fast", "mixed"]] = Form(None, description="Ritmo musical"),
     instruments: Optional[str] = Form(None, description="Instrumentos específicos"),
     studio_type: Optional[Literal["studio", "live"]] = Form("studio", description="Ambiente de gravação"),
+    fresh: bool = Form(False, description="Ignora a vitrine de pratos prontos e gera uma versão nova"),
     
     # Arquivo de voz opcional
     voiceSample: Optional[UploadFile] = File(None, description="Arquivo de áudio da voz (até 5 min)")
@@ -44,8 +118,8 @@ async def generate_music(
     """
     🎵 O Garçom anota o pedido do cliente para enviar à Cozinha.
     
-    Recebe todos os parâmetros do "cardápio" e envia o pedido para a "cozinha" (Hugging Face).
-    Retorna imediatamente e processa em background com feedback em tempo real via WebSocket.
+    Recebe todos os parâmetros do "cardápio" e coloca a comanda na fila da "cozinha" (Hugging Face).
+    Retorna imediatamente com o ID da comanda; o progresso chega via WebSocket ou por GET /jobs/{job_id}.
     """
     print(f"\n👨‍🍳 Garçom: Anotando um novo pedido do cliente {current_user_id} para a música \'{musicName}\'.")
     
@@ -65,22 +139,7 @@ async def generate_music(
                 detail="O nome da música é obrigatório para fazer o pedido."
             )
         
-        if voiceSample:
-            print(f"🎤 Garçom: Cliente forneceu um ingrediente especial (amostra de voz: {voiceSample.filename}). Verificando a qualidade...")
-            if voiceSample.size > 50 * 1024 * 1024: # 50MB
-                print(f"🚫 Garçom: Ingrediente especial do cliente {current_user_id} é muito pesado ({voiceSample.size} bytes).")
-                raise HTTPException(
-                    status_code=status.HTTP_400_BAD_REQUEST,
-                    detail="Ingrediente especial (voz) muito pesado! Máximo 50MB (aproximadamente 5 minutos)."
-                )
-            
-            allowed_types = ["audio/mp3", "audio/mpeg", "audio/wav", "audio/wave", "audio/m4a", "audio/mp4", "audio/ogg", "audio/flac"]
-            if voiceSample.content_type not in allowed_types:
-                print(f"🚫 Garçom: Ingrediente especial do cliente {current_user_id} tem um formato não aceito ({voiceSample.content_type}).")
-                raise HTTPException(
-                    status_code=status.HTTP_400_BAD_REQUEST,
-                    detail="Este tipo de ingrediente especial (formato de áudio) não é aceito pela nossa cozinha. Use MP3, WAV, M4A, OGG ou FLAC."
-                )
+        _check_voice_sample(voiceSample, current_user_id)
         
         music_data = {
             "description": description.strip(),
@@ -91,27 +150,21 @@ async def generate_music(
             "rhythm": rhythm,
             "instruments": instruments.strip() if instruments else None,
             "studioType": studio_type,
+            "fresh": fresh,
             "userId": current_user_id
         }
         
-        print(f"✅ Garçom: Comanda para \'{musicName}\' pronta! Enviando para a Cozinha em segundo plano.")
+        print(f"✅ Garçom: Comanda para \'{musicName}\' pronta! Colocando na fila da Cozinha.")
         
-        # ================== INÍCIO DA CORREÇÃO ==================
-        # O Garçom agora entrega a chave do cofre (db_manager) junto com o pedido.
-        background_tasks.add_task(
-            music_generator.generate_music_async,
-            db_manager=db_manager, # <--- MUDANÇA IMPORTANTE
-            music_data=music_data,
-            voice_file=voiceSample,
-            user_id=current_user_id
-        )
-        # =================== FIM DA CORREÇÃO ====================
+        job = await _enqueue_order(db_manager, music_data, voiceSample, current_user_id)
         
-        print(f"👍 Garçom: Pedido da música \'{musicName}\' foi entregue na Cozinha. Informando o cliente.")
+        print(f"👍 Garçom: Pedido da música \'{musicName}\' está na fila (comanda {job['job_id']}). Informando o cliente.")
         
         return {
             "message": "Seu pedido foi anotado e enviado para nossa cozinha de IA! Acompanhe o progresso pelo painel de avisos.",
-            "status": "processing",
+            "status": job["status"],
+            "jobId": job["job_id"],
+            "queuePosition": generation_queue_service.get_position(job["job_id"]),
             "musicName": musicName,
             "userId": current_user_id,
             "note": "Conecte-se ao WebSocket para receber atualizações em tempo real do processo."
@@ -125,3 +178,223 @@ async def generate_music(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Ocorreu um erro inesperado em nosso sistema. Por favor, tente fazer seu pedido novamente."
         )
+
+
+@music_router.post("/generate-batch", status_code=status.HTTP_202_ACCEPTED)
+async def generate_music_batch(
+    current_user_id: str = Depends(get_current_user_id),
+    db_manager: DatabaseConnection = Depends(get_database),
+    
+    # Campos obrigatórios
+    musicName: str = Form(..., description="Nome da música (as variações recebem um sufixo)"),
+    voiceType: Literal["instrumental", "male", "female", "both"] = Form(..., description="Tipo de voz"),
+    
+    # Variações: um prompt repetido N vezes e/ou uma lista de prompts
+    description: Optional[str] = Form(None, description="Descrição/prompt da música (usada se 'prompts' não for enviado)"),
+    prompts: Optional[List[str]] = Form(None, description="Lista de prompts, um por variação"),
+    variants: int = Form(1, ge=1, description="Quantas versões preparar de cada prompt"),
+    
+    # Campos opcionais
+    lyrics: Optional[str] = Form(None, description="Letra da música"),
+    genre: Optional[str] = Form(None, description="Gênero musical"),
+    rhythm: Optional[Literal["slow", "fast", "mixed"]] = Form(None, description="Ritmo musical"),
+    instruments: Optional[str] = Form(None, description="Instrumentos específicos"),
+    studio_type: Optional[Literal["studio", "live"]] = Form("studio", description="Ambiente de gravação"),
+    
+    # Arquivo de voz opcional
+    voiceSample: Optional[UploadFile] = File(None, description="Arquivo de áudio da voz (até 5 min)")
+):
+    """
+    🎼 O Garçom anota um pedido de várias versões do mesmo prato de uma vez só.
+    
+    Uma única comanda, um único process_id para acompanhar o progresso agregado,
+    e todas as músicas prontas registradas juntas no cardápio.
+    """
+    print(f"\n👨‍🍳 Garçom: Anotando um pedido de variações do cliente {current_user_id} para a música \'{musicName}\'.")
+    
+    try:
+        prompt_list = [prompt.strip() for prompt in (prompts or []) if prompt and prompt.strip()]
+        if not prompt_list and description and description.strip():
+            prompt_list = [description.strip()]
+        
+        if not prompt_list:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Envie uma descrição ou uma lista de prompts para fazer o pedido."
+            )
+        
+        if not musicName.strip():
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="O nome da música é obrigatório para fazer o pedido."
+            )
+        
+        total = len(prompt_list) * variants
+        if total > MAX_BATCH_SIZE:
+            print(f"🚫 Garçom: Pedido de {total} variações do cliente {current_user_id} passa do limite ({MAX_BATCH_SIZE}).")
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Pedido grande demais! No máximo {MAX_BATCH_SIZE} variações por comanda."
+            )
+        
+        _check_voice_sample(voiceSample, current_user_id)
+        
+        music_data = {
+            "description": prompt_list[0],
+            "prompts": prompt_list,
+            "variants": variants,
+            "musicName": musicName.strip(),
+            "voiceType": voiceType,
+            "lyrics": lyrics.strip() if lyrics else None,
+            "genre": genre,
+            "rhythm": rhythm,
+            "instruments": instruments.strip() if instruments else None,
+            "studioType": studio_type,
+            "userId": current_user_id
+        }
+        
+        job = await _enqueue_order(db_manager, music_data, voiceSample, current_user_id, kind=JOB_KIND_BATCH)
+        
+        print(f"👍 Garçom: Pedido de {total} variações de \'{musicName}\' está na fila (comanda {job['job_id']}).")
+        
+        return {
+            "message": f"Seu pedido de {total} variações foi anotado e enviado para nossa cozinha de IA!",
+            "status": job["status"],
+            "jobId": job["job_id"],
+            "processId": job["job_id"],
+            "queuePosition": generation_queue_service.get_position(job["job_id"]),
+            "musicName": musicName,
+            "total": total,
+            "userId": current_user_id
+        }
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"🚨 Garçom: Houve um grande problema ao tentar anotar o pedido de variações: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Ocorreu um erro inesperado em nosso sistema. Por favor, tente fazer seu pedido novamente."
+        )
+
+
+@music_router.get("/jobs/{job_id}")
+async def get_generation_job(
+    job_id: str,
+    current_user_id: str = Depends(get_current_user_id),
+    db_manager: DatabaseConnection = Depends(get_database)
+):
+    """🧾 O Garçom confere em que ponto está a comanda do cliente."""
+    job = generation_queue_service.get_job(job_id)
+    if not job:
+        # A comanda pode estar com o cozinheiro de outro worker (ou já ter saído da memória): consulta o livro.
+        job_doc = await MongoGenerationJob.find_by_id(db_manager, job_id)
+        job = MongoGenerationJob.to_job(job_doc) if job_doc else None
+    if not job or job["user_id"] != current_user_id:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Não encontramos essa comanda. Ela pode ter expirado ou pertencer a outro cliente."
+        )
+    
+    response = GenerationQueueService.to_dict(job)
+    response["queue_position"] = generation_queue_service.get_position(job_id)
+    return response
+
+
+@music_router.delete("/jobs/{job_id}")
+async def cancel_generation_job(job_id: str, current_user_id: str = Depends(get_current_user_id)):
+    """🛑 O cliente desistiu do pedido: o Garçom avisa a Cozinha para parar e libera o lugar na fila."""
+    job = await generation_queue_service.cancel(job_id, current_user_id)
+    if not job:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Não encontramos essa comanda. Ela pode ter expirado ou pertencer a outro cliente."
+        )
+    if job["status"] != JOB_CANCELLED:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Essa comanda já foi finalizada (status: {job['status']}) e não pode mais ser cancelada."
+        )
+    
+    print(f"🛑 Garçom: Pedido {job_id} do cliente {current_user_id} cancelado.")
+    return GenerationQueueService.to_dict(job)
+
+
+@music_router.get("/queue")
+async def get_generation_queue_status(current_user_id: str = Depends(get_current_user_id)):
+    """📊 O Garçom mostra o movimento da cozinha: profundidade e espera de cada raia da fila."""
+    return generation_queue_service.get_status()
+
+
+def _parse_range(range_header: str, size: int) -> Optional[Tuple[int, int]]:
+    """
+    Interpreta 'bytes=início-fim' (um único intervalo, inclusive 'bytes=-N' para os últimos N bytes).
+    Cabeçalhos malformados ou com vários intervalos são ignorados (o arquivo inteiro é servido).
+    """
+    match = re.fullmatch(r"bytes=(\d*)-(\d*)", range_header.strip())
+    if not match or match.groups() == ("", ""):
+        return None
+    first, last = match.groups()
+    if first == "":
+        length = int(last)
+        start, end = max(0, size - length), size - 1
+        if length == 0:
+            start = size
+    else:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+        if last and int(last) < start:
+            return None
+    if start >= size:
+        raise HTTPException(
+            status_code=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE,
+            detail="Trecho fora do tamanho do áudio.",
+            headers={"Content-Range": f"bytes */{size}"}
+        )
+    return start, end
+
+
+async def _read_range(path: str, start: int, end: int):
+    async with aiofiles.open(path, "rb") as f:
+        await f.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = await f.read(min(AUDIO_STREAM_CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+@music_router.api_route("/audio/{key}", methods=["GET", "HEAD"])
+async def get_local_audio(key: str, request: Request, range_header: Optional[str] = Header(None, alias="Range")):
+    """
+    Serve um áudio da adega local (STORAGE_BACKEND=local), com suporte a Range/206 para o player
+    poder pular para qualquer ponto da faixa sem baixar tudo.
+    """
+    path = storage_service.local_path(key)
+    if not path:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Áudio não encontrado na adega.")
+
+    media_type = AUDIO_CONTENT_TYPES.get(os.path.splitext(key)[1].lower(), "application/octet-stream")
+    headers = {"Accept-Ranges": "bytes", "Cache-Control": f"public, max-age={AUDIO_CACHE_SECONDS}"}
+
+    if storage_service.accel_redirect_prefix:
+        # O nginx assume daqui: sendfile do kernel, Range e cache, sem o arquivo passar pelo Python.
+        headers["X-Accel-Redirect"] = f"{storage_service.accel_redirect_prefix}/{key}"
+        return Response(media_type=media_type, headers=headers)
+
+    size = os.path.getsize(path)
+    byte_range = _parse_range(range_header, size) if range_header else None
+    if byte_range is None:
+        # Arquivo inteiro: o FileResponse usa o envio direto de arquivo (pathsend) quando o servidor oferece.
+        return FileResponse(path, media_type=media_type, headers=headers)
+
+    start, end = byte_range
+    headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    headers["Content-Length"] = str(end - start + 1)
+    if request.method == "HEAD":
+        return Response(status_code=status.HTTP_206_PARTIAL_CONTENT, media_type=media_type, headers=headers)
+    return StreamingResponse(
+        _read_range(path, start, end), status_code=status.HTTP_206_PARTIAL_CONTENT, media_type=media_type, headers=headers
+    )
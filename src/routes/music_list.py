@@ -1,31 +1,55 @@
 # src/routes/music_list.py (O Maître) - Versão Corrigida
 
-from fastapi import APIRouter, HTTPException, status, Depends, Request
+import io
+import csv
+import json
+from datetime import datetime
+from typing import Optional, Literal
+from fastapi import APIRouter, HTTPException, status, Depends, Request, Query
+from fastapi.responses import StreamingResponse
 from .user import get_current_user_id 
-from models.mongo_models import MongoMusic
+from models.mongo_models import MongoMusic, MUSIC_PAGE_SIZE, MUSIC_PAGE_SIZE_MAX, MUSIC_EXPORT_BATCH_SIZE
+from models.music_filters import compile_music_filters
 # A forma correta de pedir acesso ao "Gerente do Cofre".
 from database.database import get_database, DatabaseConnection
 
 # --- Router do FastAPI ---
 music_list_router = APIRouter()
 
+# Parâmetros de paginação e de campos: não viram filtro de busca.
+LIST_PARAMS = ("limit", "cursor", "view", "fields")
+FIELDS_DESCRIPTION = "Campos separados por vírgula (ex.: id,music_name,preview_url); tem prioridade sobre view"
+
+EXPORT_MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
 # --- Rotas do Maître ---
 
 @music_list_router.get("/musics/{user_id}")
-async def get_user_musics(user_id: str, db_manager: DatabaseConnection = Depends(get_database)):
-    """Maître buscando o cardápio pessoal de um cliente específico."""
+async def get_user_musics(
+    user_id: str,
+    limit: int = Query(MUSIC_PAGE_SIZE, ge=1, le=MUSIC_PAGE_SIZE_MAX),
+    cursor: Optional[str] = Query(None, description="next_cursor devolvido pela página anterior"),
+    view: Literal["summary", "full"] = Query("summary"),
+    fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION),
+    db_manager: DatabaseConnection = Depends(get_database)
+):
+    """Maître buscando o cardápio pessoal de um cliente específico, uma página por vez."""
     print(f"🤵 Maître: Consultando o cardápio pessoal do cliente {user_id}.")
     try:
-        # Agora usamos o 'db_manager' que o FastAPI nos entregou.
-        musics = await MongoMusic.find_by_user(db_manager, user_id)
-        music_list = [MongoMusic.to_dict(music) for music in musics]
-        print(f"✅ Maître: Encontrados {len(music_list)} pratos no cardápio do cliente {user_id}.")
+        # Agora usamos o 'db_manager' que o FastAPI nos entregou; só os campos pedidos saem do cofre.
+        selected = MongoMusic.resolve_fields(view, fields)
+        musics, next_cursor = await MongoMusic.find_by_user(db_manager, user_id, limit, cursor, selected)
+        music_list = [MongoMusic.to_dict(music, selected) for music in musics]
+        print(f"✅ Maître: Encontrados {len(music_list)} pratos nesta página do cardápio do cliente {user_id}.")
         
         return {
             "status": "success",
             "musics": music_list,
             "total": len(music_list),
+            "next_cursor": next_cursor,
         }
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
     except Exception as e:
         print(f"🚨 Maître: Erro ao consultar o cardápio do cliente {user_id}: {e}")
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Houve um problema ao buscar o cardápio deste cliente.")
@@ -33,51 +57,133 @@ async def get_user_musics(user_id: str, db_manager: DatabaseConnection = Depends
 @music_list_router.get("/musics")
 async def get_my_musics(
     request: Request, 
+    limit: int = Query(MUSIC_PAGE_SIZE, ge=1, le=MUSIC_PAGE_SIZE_MAX),
+    cursor: Optional[str] = Query(None, description="next_cursor devolvido pela página anterior"),
+    view: Literal["summary", "full"] = Query("summary"),
+    fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION),
     current_user_id: str = Depends(get_current_user_id),
     # O Maître agora pede acesso ao Gerente do Cofre diretamente ao FastAPI.
     db_manager: DatabaseConnection = Depends(get_database)
 ):
-    """Maître buscando pratos no cardápio para o cliente, aplicando seus filtros e preferências."""
+    """
+    Maître buscando pratos no cardápio para o cliente, aplicando seus filtros e preferências.
+    Só os filtros da lista branca são aceitos (voice_type, genre, created_after, created_before,
+    name_prefix); voice_type e genre podem se repetir. Qualquer outro parâmetro é recusado com 400.
+    """
     try:
-        search_filter = {"userId": current_user_id}
-        
         query_params = request.query_params
         if query_params:
             print(f"🤵 Maître: Cliente {current_user_id} pediu para ver o cardápio com preferências especiais: {dict(query_params)}")
         else:
             print(f"🤵 Maître: Cliente {current_user_id} pediu para ver seu cardápio completo.")
 
-        for key, value in query_params.items():
-            values = query_params.getlist(key)
-            if len(values) > 1:
-                search_filter[key] = {"$in": values}
-            elif len(values) == 1:
-                search_filter[key] = values[0]
-        
-        print(f"🔍 Maître: Buscando no livro de receitas com os filtros: {search_filter}")
+        # Cada filtro vira uma condição com tipo certo e um índice que a atende: nada de varrer a gaveta inteira.
+        compiled = compile_music_filters(
+            current_user_id, [(key, value) for key, value in query_params.multi_items() if key not in LIST_PARAMS]
+        )
+        print(f"🔍 Maître: Buscando no livro de receitas com os filtros: {compiled.query} (índice {compiled.hint})")
 
         # Verificação corrigida para usar 'is None'
         if db_manager.db is None:
             print("🚨 Maître: O livro de receitas (banco de dados) está inacessível no momento!")
             raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Nosso livro de receitas está temporariamente indisponível.")
             
-        # Usamos o 'db_manager' fornecido pelo Depends.
-        cursor = db_manager.db.musics.find(search_filter)
-        musics = await cursor.to_list(length=None)
+        # Usamos o 'db_manager' fornecido pelo Depends; uma página por vez, nunca o cardápio inteiro,
+        # e só com os campos pedidos (a letra completa fica no cofre até alguém abrir a faixa).
+        selected = MongoMusic.resolve_fields(view, fields)
+        musics, next_cursor = await MongoMusic.find_page(db_manager, compiled.query, limit, cursor, selected, compiled.hint)
         
-        music_list = [MongoMusic.to_dict(music) for music in musics]
-        print(f"✅ Maître: Encontramos {len(music_list)} pratos que correspondem às preferências do cliente.")
+        music_list = [MongoMusic.to_dict(music, selected) for music in musics]
+        print(f"✅ Maître: Encontramos {len(music_list)} pratos nesta página que correspondem às preferências do cliente.")
         
         return {
             "status": "success",
-            "filters_applied": search_filter,
+            "filters_applied": compiled.applied,
             "musics": music_list,
             "total": len(music_list),
+            "next_cursor": next_cursor,
         }
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
     except Exception as e:
         print(f"🚨 Maître: Houve um problema ao tentar filtrar o cardápio para o cliente {current_user_id}: {e}")
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Houve um problema ao buscar os pratos em nosso cardápio.")
 
+@music_list_router.get("/tracks/{music_id}")
+async def get_track(
+    music_id: str,
+    view: Literal["summary", "full"] = Query("full"),
+    fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION),
+    db_manager: DatabaseConnection = Depends(get_database)
+):
+    """Maître trazendo a ficha completa de um prato (com letra e descrição) quando o cliente abre a faixa."""
+    try:
+        selected = MongoMusic.resolve_fields(view, fields)
+        music = await MongoMusic.find_by_id(db_manager, music_id, selected)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    if not music:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Prato não encontrado no cardápio.")
+    return {"status": "success", "music": MongoMusic.to_dict(music, selected)}
+
+async def _export_chunks(db_manager: DatabaseConnection, user_id: str, selected: tuple, export_format: str):
+    """
+    Serializa a biblioteca página a página (keyset), MUSIC_EXPORT_BATCH_SIZE linhas por pedaço.
+    O StreamingResponse só pede o próximo pedaço depois de entregar o anterior ao cliente, então um
+    cliente lento segura a leitura do cofre em vez de acumular a biblioteca na memória do servidor.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if export_format == "csv":
+        writer.writerow(selected)
+    exported = 0
+    try:
+        async for music in MongoMusic.iter_library(db_manager, user_id, selected, MUSIC_EXPORT_BATCH_SIZE):
+            music_dict = MongoMusic.to_dict(music, selected)
+            if export_format == "csv":
+                writer.writerow(["" if music_dict[field] is None else music_dict[field] for field in selected])
+            else:
+                buffer.write(json.dumps(music_dict, ensure_ascii=False) + "\n")
+            exported += 1
+            if exported % MUSIC_EXPORT_BATCH_SIZE == 0:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+        if buffer.tell():
+            yield buffer.getvalue()
+        print(f"📦 Maître: Cardápio do cliente {user_id} exportado ({exported} pratos, {export_format}).")
+    except Exception as e:
+        # O status 200 já saiu: a resposta termina interrompida e o cliente percebe o arquivo incompleto.
+        print(f"🚨 Maître: Exportação do cardápio do cliente {user_id} interrompida após {exported} pratos: {e}")
+        raise
+
+@music_list_router.get("/export")
+async def export_my_musics(
+    export_format: Literal["ndjson", "csv"] = Query("ndjson", alias="format"),
+    view: Literal["summary", "full"] = Query("full"),
+    fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION),
+    current_user_id: str = Depends(get_current_user_id),
+    db_manager: DatabaseConnection = Depends(get_database)
+):
+    """Maître entregando ao cliente o cardápio inteiro para levar para casa, em NDJSON ou CSV, pedaço por pedaço."""
+    try:
+        selected = MongoMusic.resolve_fields(view, fields)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    if db_manager.db is None:
+        print("🚨 Maître: O livro de receitas (banco de dados) está inacessível no momento!")
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Nosso livro de receitas está temporariamente indisponível.")
+
+    print(f"🤵 Maître: Cliente {current_user_id} pediu o cardápio completo para levar ({export_format}).")
+    file_name = f"musicas-{datetime.utcnow():%Y%m%d}.{export_format}"
+    return StreamingResponse(
+        _export_chunks(db_manager, current_user_id, selected, export_format),
+        media_type=EXPORT_MEDIA_TYPES[export_format],
+        headers={"Content-Disposition": f'attachment; filename="{file_name}"', "Cache-Control": "no-store"},
+    )
+
 # ================== INÍCIO DA CORREÇÃO ==================
 # A função 'add_generated_music' foi removida deste arquivo.
 # Sua responsabilidade, que é interagir com o banco de dados,
@@ -0,0 +1,327 @@
+# src/services/audio_processing_service.py (A Bancada de Finalização)
+
+import os
+import uuid
+import asyncio
+import inspect
+import tempfile
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Optional, Tuple, Union
+
+import numpy as np
+import soundfile as sf
+
+# Formatos de saída aceitos -> (formato do libsndfile, subtipo, extensão)
+OUTPUT_FORMATS = {
+    "mp3": ("MP3", "MPEG_LAYER_III", ".mp3"),
+    "ogg": ("OGG", "VORBIS", ".ogg"),
+}
+
+# Quadros de análise (de frame_ms cada) por bloco lido do disco: ~1,5s de áudio por bloco.
+# A memória de cada faixa fica constante, seja ela de 30 segundos ou de 10 minutos.
+FRAMES_PER_BLOCK = int(os.getenv("AUDIO_FRAMES_PER_BLOCK", 150))
+
+# Escada de versões: a faixa de streaming e a prévia saem com taxa constante e mais baixa que a principal.
+# compression_level do libsndfile: 0 = melhor qualidade, 1 = menor arquivo (no MP3, 0.9 ≈ 56 kbps).
+RENDITIONS = ("stream", "preview")
+PREVIEW_FADE_MS = 500
+# compression_level e bitrate_mode só existem no SoundFile a partir do soundfile 0.13. Com versões
+# anteriores as versões extras ainda saem, só que com a taxa padrão do codificador.
+ENCODER_OPTIONS_SUPPORTED = "compression_level" in inspect.signature(sf.SoundFile.__init__).parameters
+
+
+# =================================================================
+# FUNÇÕES DE PROCESSAMENTO (puras, vetorizadas e "pickláveis",
+# para poderem rodar dentro do ProcessPoolExecutor)
+# =================================================================
+
+def to_float_audio(audio: np.ndarray) -> np.ndarray:
+    """Converte o áudio para float32 no formato (amostras, canais), com valores em [-1, 1]."""
+    audio = np.asarray(audio)
+    if np.issubdtype(audio.dtype, np.integer):
+        audio = audio.astype(np.float32) / np.iinfo(audio.dtype).max
+    else:
+        audio = audio.astype(np.float32, copy=False)
+    if audio.ndim == 1:
+        audio = audio[:, np.newaxis]
+    return audio
+
+
+def normalize_loudness(audio: np.ndarray, target_dbfs: float = -14.0, peak_ceiling: float = 0.98) -> np.ndarray:
+    """Ajusta o ganho para o RMS atingir target_dbfs, sem deixar o pico passar de peak_ceiling."""
+    rms = float(np.sqrt(np.mean(np.square(audio, dtype=np.float64))))
+    if rms == 0.0:
+        return audio
+    gain = 10 ** (target_dbfs / 20) / rms
+    peak = float(np.max(np.abs(audio)))
+    if peak * gain > peak_ceiling:
+        gain = peak_ceiling / peak
+    return audio * np.float32(gain)
+
+
+def trim_silence(audio: np.ndarray, sample_rate: int, threshold_db: float = -50.0, frame_ms: int = 10) -> np.ndarray:
+    """Remove o silêncio do começo e do fim, medindo o RMS em quadros de frame_ms."""
+    frame = max(1, int(sample_rate * frame_ms / 1000))
+    frames = len(audio) // frame
+    if frames == 0:
+        return audio
+
+    mono = np.mean(audio[:frames * frame], axis=1)
+    frame_rms = np.sqrt(np.mean(np.square(mono.reshape(frames, frame)), axis=1))
+    loud = np.flatnonzero(frame_rms > 10 ** (threshold_db / 20))
+    if loud.size == 0:
+        # Tudo abaixo do limiar: melhor entregar o áudio como veio do que um arquivo vazio.
+        return audio
+    start = loud[0] * frame
+    end = min(len(audio), (loud[-1] + 1) * frame)
+    return audio[start:end]
+
+
+def apply_fades(audio: np.ndarray, sample_rate: int, fade_in_ms: int = 50, fade_out_ms: int = 1500) -> np.ndarray:
+    """Aplica fade in e fade out lineares."""
+    audio = audio.copy()
+    fade_in = min(len(audio), int(sample_rate * fade_in_ms / 1000))
+    fade_out = min(len(audio), int(sample_rate * fade_out_ms / 1000))
+    if fade_in:
+        audio[:fade_in] *= np.linspace(0.0, 1.0, fade_in, dtype=np.float32)[:, np.newaxis]
+    if fade_out:
+        audio[-fade_out:] *= np.linspace(1.0, 0.0, fade_out, dtype=np.float32)[:, np.newaxis]
+    return audio
+
+
+def loudness_gain(rms: float, peak: float, target_dbfs: float = -14.0, peak_ceiling: float = 0.98) -> float:
+    """O mesmo ganho do normalize_loudness, calculado a partir do RMS e do pico já medidos."""
+    if rms == 0.0:
+        return 1.0
+    gain = 10 ** (target_dbfs / 20) / rms
+    if peak * gain > peak_ceiling:
+        gain = peak_ceiling / peak
+    return gain
+
+
+def analyze_file(path: str, threshold_db: float = -50.0, frame_ms: int = 10):
+    """
+    Primeira passada, bloco a bloco: acha o trecho sem silêncio nas pontas (mesmo critério do trim_silence)
+    e mede RMS e pico só desse trecho. Guarda apenas estatísticas por quadro de frame_ms (alguns KB),
+    nunca o áudio. Devolve (taxa, canais, início, fim, rms, pico), com início/fim em amostras.
+    """
+    info = sf.info(path)
+    sample_rate, channels = info.samplerate, info.channels
+    frame = max(1, int(sample_rate * frame_ms / 1000))
+    threshold = 10 ** (threshold_db / 20)
+
+    loud_parts, sumsq_parts, peak_parts = [], [], []
+    tail_sumsq, tail_peak, total = 0.0, 0.0, 0
+    # Blocos múltiplos do quadro: só o último bloco pode terminar num quadro incompleto.
+    for block in sf.blocks(path, blocksize=frame * FRAMES_PER_BLOCK, dtype="float32", always_2d=True):
+        total += len(block)
+        full = len(block) // frame
+        if full:
+            frames = block[:full * frame].reshape(full, frame, channels)
+            mono = frames.mean(axis=2)
+            loud_parts.append(np.sqrt(np.mean(np.square(mono), axis=1)) > threshold)
+            sumsq_parts.append(np.sum(np.square(frames, dtype=np.float64), axis=(1, 2)))
+            peak_parts.append(np.max(np.abs(frames), axis=(1, 2)))
+        rest = block[full * frame:]
+        if len(rest):
+            tail_sumsq = float(np.sum(np.square(rest, dtype=np.float64)))
+            tail_peak = float(np.max(np.abs(rest)))
+
+    loud = np.concatenate(loud_parts) if loud_parts else np.zeros(0, dtype=bool)
+    sumsq = np.concatenate(sumsq_parts) if sumsq_parts else np.zeros(0)
+    peaks = np.concatenate(peak_parts) if peak_parts else np.zeros(0, dtype=np.float32)
+
+    loud_frames = np.flatnonzero(loud)
+    if loud_frames.size == 0:
+        # Tudo abaixo do limiar (ou curto demais): o áudio segue inteiro, como no trim_silence.
+        start, stop = 0, total
+        region_sumsq = float(sumsq.sum()) + tail_sumsq
+        region_peak = max(float(peaks.max()) if peaks.size else 0.0, tail_peak)
+    else:
+        first, last = loud_frames[0], loud_frames[-1]
+        start, stop = int(first * frame), int((last + 1) * frame)
+        region_sumsq = float(sumsq[first:last + 1].sum())
+        region_peak = float(peaks[first:last + 1].max())
+
+    samples = (stop - start) * channels
+    rms = float(np.sqrt(region_sumsq / samples)) if samples else 0.0
+    return sample_rate, channels, start, stop, rms, region_peak
+
+
+def process_file(path: str, output_format: str = "mp3", target_dbfs: float = -14.0, output_dir: str = None,
+                 fade_in_ms: int = 50, fade_out_ms: int = 1500) -> str:
+    """
+    Finalização em duas passadas com sf.blocks: a primeira mede (analyze_file), a segunda aplica ganho
+    e fades e já codifica bloco a bloco no arquivo final. A faixa nunca é carregada inteira na memória.
+    """
+    sample_rate, channels, start, stop, rms, peak = analyze_file(path)
+    gain = np.float32(loudness_gain(rms, peak, target_dbfs))
+    length = stop - start
+    fade_in = min(length, int(sample_rate * fade_in_ms / 1000))
+    fade_out = min(length, int(sample_rate * fade_out_ms / 1000))
+    frame = max(1, int(sample_rate * 10 / 1000))
+
+    file_format, subtype, extension = OUTPUT_FORMATS[output_format]
+    output_path = os.path.join(output_dir or tempfile.gettempdir(), f"track_{uuid.uuid4().hex}{extension}")
+    with sf.SoundFile(output_path, "w", sample_rate, channels, subtype=subtype, format=file_format) as out:
+        position = 0
+        for block in sf.blocks(path, blocksize=frame * FRAMES_PER_BLOCK, start=start, stop=stop,
+                               dtype="float32", always_2d=True):
+            block *= gain
+            count = len(block)
+            # Os mesmos envelopes lineares do apply_fades, calculados só para os blocos nas pontas.
+            if position < fade_in or position + count > length - fade_out:
+                index = np.arange(position, position + count)
+                envelope = np.ones(count, dtype=np.float32)
+                if fade_in:
+                    head = index < fade_in
+                    envelope[head] *= index[head] / max(1, fade_in - 1)
+                if fade_out:
+                    offset = index - (length - fade_out)
+                    tail = offset >= 0
+                    envelope[tail] *= 1.0 - offset[tail] / max(1, fade_out - 1)
+                block *= envelope[:, np.newaxis]
+            out.write(block)
+            position += count
+    return output_path
+
+
+def render_renditions(path: str, output_format: str = "mp3", quality: float = 0.9, preview_seconds: float = 15.0,
+                      preview_offset: float = 0.3, output_dir: str = None) -> Dict[str, str]:
+    """
+    Gera, numa única leitura em blocos do arquivo final, a versão de streaming (a faixa inteira em taxa baixa)
+    e a prévia (preview_seconds a partir de preview_offset da duração, com fades curtos nas pontas).
+    Devolve {"stream": caminho, "preview": caminho}.
+    """
+    info = sf.info(path)
+    sample_rate, channels, total = info.samplerate, info.channels, info.frames
+    preview_length = min(total, int(preview_seconds * sample_rate))
+    preview_start = max(0, min(int(total * preview_offset), total - preview_length))
+    fade = min(preview_length // 2, int(sample_rate * PREVIEW_FADE_MS / 1000))
+    frame = max(1, int(sample_rate * 10 / 1000))
+
+    file_format, subtype, extension = OUTPUT_FORMATS[output_format]
+    options = {}
+    if ENCODER_OPTIONS_SUPPORTED:
+        options["compression_level"] = quality
+        if output_format == "mp3":
+            options["bitrate_mode"] = "CONSTANT"
+    paths = {
+        rendition: os.path.join(output_dir or tempfile.gettempdir(), f"{rendition}_{uuid.uuid4().hex}{extension}")
+        for rendition in RENDITIONS
+    }
+    with sf.SoundFile(paths["stream"], "w", sample_rate, channels, subtype=subtype, format=file_format, **options) as stream, \
+            sf.SoundFile(paths["preview"], "w", sample_rate, channels, subtype=subtype, format=file_format, **options) as preview:
+        position = 0
+        for block in sf.blocks(path, blocksize=frame * FRAMES_PER_BLOCK, dtype="float32", always_2d=True):
+            stream.write(block)
+            first = max(position, preview_start)
+            last = min(position + len(block), preview_start + preview_length)
+            if first < last:
+                clip = block[first - position:last - position]
+                if fade:
+                    index = np.arange(first, last) - preview_start
+                    envelope = np.minimum(1.0, np.minimum(index + 1, preview_length - index) / fade).astype(np.float32)
+                    clip = clip * envelope[:, np.newaxis]
+                preview.write(clip)
+            position += len(block)
+    return paths
+
+
+def process_track(source: Union[str, Tuple[int, np.ndarray]], output_format: str = "mp3",
+                  target_dbfs: float = -14.0, output_dir: str = None) -> str:
+    """
+    Pipeline completo de finalização: lê o resultado do Space (caminho de arquivo ou (taxa, ndarray)),
+    corta silêncio, normaliza, aplica fades e codifica em MP3/OGG. Devolve o caminho do arquivo final.
+    Arquivos (o caso normal do gradio_client) são processados em blocos, direto do disco.
+    """
+    if not isinstance(source, (tuple, list)):
+        return process_file(source, output_format, target_dbfs, output_dir)
+
+    sample_rate, audio = source
+    audio = to_float_audio(audio)
+    audio = trim_silence(audio, sample_rate)
+    audio = normalize_loudness(audio, target_dbfs)
+    audio = apply_fades(audio, sample_rate)
+
+    file_format, subtype, extension = OUTPUT_FORMATS[output_format]
+    output_path = os.path.join(output_dir or tempfile.gettempdir(), f"track_{uuid.uuid4().hex}{extension}")
+    sf.write(output_path, audio, sample_rate, format=file_format, subtype=subtype)
+    return output_path
+
+
+# =================================================================
+# SERVIÇO (orquestra o pool de processos)
+# =================================================================
+
+class AudioProcessingService:
+    """
+    A Bancada de Finalização. O áudio cru que sai do Space passa por aqui antes de ir para a nuvem.
+    O trabalho pesado de CPU roda num ProcessPoolExecutor, longe do event loop.
+    """
+
+    def __init__(self):
+        self.enabled = os.getenv("AUDIO_POSTPROCESS", "true").lower() not in ("0", "false", "no")
+        self.output_format = os.getenv("AUDIO_OUTPUT_FORMAT", "mp3").lower()
+        if self.output_format not in OUTPUT_FORMATS:
+            print(f"⚠️ AUDIO_OUTPUT_FORMAT '{self.output_format}' não suportado. Usando mp3.")
+            self.output_format = "mp3"
+        self.target_dbfs = float(os.getenv("AUDIO_TARGET_DBFS", -14.0))
+        self.max_workers = int(os.getenv("AUDIO_PROCESS_WORKERS", 2))
+        # "spawn" (ou "forkserver"), nunca "fork": o worker já tem threads (executor do Space, Motor) e um filho
+        # copiado no meio de um lock segurado por outra thread trava para sempre.
+        self.start_method = os.getenv("AUDIO_PROCESS_START_METHOD", "spawn")
+        self.renditions_enabled = os.getenv("AUDIO_RENDITIONS", "true").lower() not in ("0", "false", "no")
+        self.rendition_quality = float(os.getenv("AUDIO_RENDITION_QUALITY", 0.9))
+        self.preview_seconds = float(os.getenv("AUDIO_PREVIEW_SECONDS", 15))
+        self.preview_offset = float(os.getenv("AUDIO_PREVIEW_OFFSET", 0.3))  # fração da faixa onde a prévia começa
+        self.executor: Optional[ProcessPoolExecutor] = None
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        # Criado sob demanda, já dentro do worker do Gunicorn (nunca no processo mestre do preload).
+        if self.executor is None:
+            self.executor = ProcessPoolExecutor(
+                max_workers=self.max_workers, mp_context=multiprocessing.get_context(self.start_method)
+            )
+        return self.executor
+
+    async def process(self, source) -> Optional[str]:
+        """Finaliza o áudio no pool de processos. Devolve o caminho do arquivo final, ou None se desabilitado."""
+        if not self.enabled:
+            return None
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._get_executor(), process_track, source, self.output_format, self.target_dbfs
+        )
+
+    async def renditions(self, path: str) -> Optional[Dict[str, str]]:
+        """Gera a versão de streaming e a prévia no pool de processos. Devolve None se desabilitado."""
+        if not self.renditions_enabled:
+            return None
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._get_executor(), render_renditions, path, self.output_format, self.rendition_quality,
+            self.preview_seconds, self.preview_offset
+        )
+
+    def shutdown(self):
+        """Desliga o pool de processos no fim do expediente."""
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
+
+    def get_status(self):
+        return {
+            "enabled": self.enabled,
+            "output_format": self.output_format,
+            "target_dbfs": self.target_dbfs,
+            "workers": self.max_workers,
+            "start_method": self.start_method,
+            "renditions": self.renditions_enabled,
+            "preview_seconds": self.preview_seconds,
+        }
+
+
+# Instância global da bancada de finalização
+audio_processing_service = AudioProcessingService()
@@ -1,14 +1,74 @@
 import os
+import time
+import asyncio
+import functools
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Optional
+
 import cloudinary
+import cloudinary.utils
 import cloudinary.uploader
 from io import BytesIO
 
+# URL de demonstração devolvida quando o Cloudinary não está disponível.
+PLACEHOLDER_AUDIO_URL = "https://www.soundhelix.com/examples/mp3/SoundHelix-Song-1.mp3"
+
+# Arquivos em disco sempre vão em pedaços (protocolo do upload_large): no máximo um pedaço na memória por envio.
+CHUNK_SIZE = int(os.getenv("CLOUDINARY_CHUNK_SIZE", 6 * 1024 * 1024))  # 6MB (mínimo do Cloudinary: 5MB)
+CHUNK_RETRIES = int(os.getenv("CLOUDINARY_CHUNK_RETRIES", 3))
+CHUNK_RETRY_BACKOFF = float(os.getenv("CLOUDINARY_CHUNK_RETRY_BACKOFF", 1.0))  # segundos, dobra a cada tentativa
+
+
+class UploadMetrics:
+    """Vazão e latência dos últimos envios para a nuvem."""
+
+    def __init__(self, window: int = 200):
+        self.uploads = 0
+        self.failures = 0
+        self.chunk_retries = 0
+        self.bytes_sent = 0
+        self.latencies = deque(maxlen=window)
+        self.throughputs = deque(maxlen=window)  # bytes/s de cada envio
+
+    def record(self, size: int, seconds: float):
+        self.uploads += 1
+        self.bytes_sent += size
+        self.latencies.append(seconds)
+        if seconds > 0:
+            self.throughputs.append(size / seconds)
+
+    def get_status(self) -> Dict[str, Any]:
+        latencies = sorted(self.latencies)
+
+        def percentile(fraction):
+            return round(latencies[min(len(latencies) - 1, int(len(latencies) * fraction))], 2) if latencies else None
+
+        return {
+            "uploads": self.uploads,
+            "failures": self.failures,
+            "chunk_retries": self.chunk_retries,
+            "bytes_sent": self.bytes_sent,
+            "latency_p50": percentile(0.50),
+            "latency_p95": percentile(0.95),
+            "throughput_avg_mbps": round(sum(self.throughputs) / len(self.throughputs) * 8 / 1e6, 2) if self.throughputs else None,
+        }
+
+
 class CloudinaryService:
     _initialized = False
+    _init_attempted = False
+    # Envio assíncrono: threads próprias e um limite de envios simultâneos, separados do resto da aplicação.
+    _executor: Optional[ThreadPoolExecutor] = None
+    _semaphore: Optional[asyncio.Semaphore] = None
+    upload_workers = int(os.getenv("CLOUDINARY_UPLOAD_WORKERS", 4))
+    upload_concurrency = int(os.getenv("CLOUDINARY_UPLOAD_CONCURRENCY", 3))
+    metrics = UploadMetrics()
     
     @classmethod
     def initialize(cls):
         """Inicializa o Cloudinary"""
+        cls._init_attempted = True
         if cls._initialized:
             return
             
@@ -29,12 +89,20 @@ class CloudinaryService:
         except Exception as error:
             print(f"❌ Erro ao inicializar Cloudinary: {error}")
     
+    @classmethod
+    def _ensure_initialized(cls) -> bool:
+        # A classe pode ser importada por dois caminhos ('src.services' no main, 'services' no Chef);
+        # quem envia garante a própria inicialização em vez de depender do startup.
+        if not cls._initialized and not cls._init_attempted:
+            cls.initialize()
+        return cls._initialized
+    
     @classmethod
     def upload_audio(cls, audio_buffer, file_name):
         """Faz upload de um buffer de áudio para o Cloudinary"""
-        if not cls._initialized:
+        if not cls._ensure_initialized():
             print("Cloudinary não inicializado. Retornando URL de exemplo.")
-            return "https://www.soundhelix.com/examples/mp3/SoundHelix-Song-1.mp3"
+            return PLACEHOLDER_AUDIO_URL
             
         try:
             # Converte buffer para BytesIO se necessário
@@ -46,10 +114,7 @@ class CloudinaryService:
             # Upload para o Cloudinary
             result = cloudinary.uploader.upload(
                 audio_stream,
-                resource_type="video",  # Cloudinary trata áudio como vídeo
-                public_id=f"alquimista/{file_name}",
-                format="mp3",
-                overwrite=True
+                **cls._upload_options(file_name)
             )
             
             print(f"✅ Áudio enviado para Cloudinary: {result['secure_url']}")
@@ -58,5 +123,113 @@ class CloudinaryService:
         except Exception as error:
             print(f"❌ Erro ao fazer upload do áudio: {error}")
             # Retorna URL de exemplo em caso de erro
-            return "https://www.soundhelix.com/examples/mp3/SoundHelix-Song-1.mp3"
+            return PLACEHOLDER_AUDIO_URL
+
+    @classmethod
+    async def upload_audio_async(cls, source, file_name):
+        """
+        Versão assíncrona do upload_audio: o envio roda no executor próprio, com no máximo
+        CLOUDINARY_UPLOAD_CONCURRENCY envios ao mesmo tempo, sem travar o event loop.
+        Arquivos (caminho em disco) são lidos e enviados em pedaços, com nova tentativa por pedaço:
+        a memória de cada envio fica limitada a CHUNK_SIZE, qualquer que seja o tamanho da faixa.
+        Diferente do upload_audio, uma falha no envio levanta a exceção (quem chama decide o que fazer
+        com o prato); a URL de exemplo só aparece quando o Cloudinary nem está configurado.
+        """
+        if not cls._ensure_initialized():
+            print("Cloudinary não inicializado. Retornando URL de exemplo.")
+            return PLACEHOLDER_AUDIO_URL
+
+        if cls._executor is None:
+            cls._executor = ThreadPoolExecutor(max_workers=cls.upload_workers, thread_name_prefix="cloudinary-upload")
+        if cls._semaphore is None:
+            cls._semaphore = asyncio.Semaphore(cls.upload_concurrency)
+
+        size = cls._source_size(source)
+        if isinstance(source, str) and size == 0:
+            # Sem nenhum pedaço o protocolo em pedaços não tem o que enviar (nem resposta para devolver).
+            cls.metrics.failures += 1
+            raise ValueError(f"Arquivo de áudio vazio ou inexistente: {source}")
+        loop = asyncio.get_running_loop()
+        async with cls._semaphore:
+            started = time.monotonic()
+            try:
+                if isinstance(source, str):
+                    upload = functools.partial(cls._upload_in_chunks, source, file_name, size)
+                else:
+                    upload = functools.partial(
+                        cloudinary.uploader.upload,
+                        BytesIO(source) if isinstance(source, bytes) else source,
+                        **cls._upload_options(file_name)
+                    )
+                result = await loop.run_in_executor(cls._executor, upload)
+            except Exception as error:
+                cls.metrics.failures += 1
+                print(f"❌ Erro ao fazer upload do áudio: {error}")
+                raise
 
+        seconds = time.monotonic() - started
+        cls.metrics.record(size, seconds)
+        print(f"✅ Áudio enviado para Cloudinary em {seconds:.1f}s ({size} bytes): {result['secure_url']}")
+        return result['secure_url']
+
+    @classmethod
+    def _upload_in_chunks(cls, path: str, file_name: str, size: int):
+        """
+        O mesmo protocolo do cloudinary.uploader.upload_large (Content-Range + X-Unique-Upload-Id),
+        mas cada pedaço tem as suas próprias novas tentativas: uma falha no pedaço 7 não reenvia os 6 anteriores.
+        Roda no executor de envio.
+        """
+        options = cls._upload_options(file_name)
+        upload_id = cloudinary.utils.random_public_id()
+        offset = 0
+        result = None
+        with open(path, "rb") as f:
+            while True:
+                chunk = f.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                headers = {
+                    "Content-Range": f"bytes {offset}-{offset + len(chunk) - 1}/{size}",
+                    "X-Unique-Upload-Id": upload_id,
+                }
+                for attempt in range(CHUNK_RETRIES + 1):
+                    try:
+                        result = cloudinary.uploader.upload_large_part(
+                            (os.path.basename(path), chunk), http_headers=headers, **options
+                        )
+                        break
+                    except Exception as error:
+                        if attempt == CHUNK_RETRIES:
+                            raise
+                        cls.metrics.chunk_retries += 1
+                        print(f"🔁 Pedaço {headers['Content-Range']} falhou ({error}). Tentando de novo.")
+                        time.sleep(CHUNK_RETRY_BACKOFF * 2 ** attempt)
+                offset += len(chunk)
+        if result is None:
+            raise ValueError(f"Nenhum pedaço enviado para {path}: o arquivo está vazio.")
+        return result
+
+    @staticmethod
+    def _upload_options(file_name) -> Dict[str, Any]:
+        return {
+            "resource_type": "video",  # Cloudinary trata áudio como vídeo
+            "public_id": f"alquimista/{file_name}",
+            "format": "mp3",
+            "overwrite": True,
+        }
+
+    @staticmethod
+    def _source_size(source) -> int:
+        if isinstance(source, bytes):
+            return len(source)
+        if isinstance(source, str) and os.path.exists(source):
+            return os.path.getsize(source)
+        return 0
+
+    @classmethod
+    def get_status(cls) -> Dict[str, Any]:
+        return {
+            "initialized": cls._initialized,
+            "upload_concurrency": cls.upload_concurrency,
+            **cls.metrics.get_status(),
+        }
@@ -0,0 +1,197 @@
+# src/services/eta_service.py (O Relógio da Cozinha)
+
+import os
+import time
+import asyncio
+from datetime import datetime
+from collections import deque
+from typing import Dict, List, Optional
+
+from models.eta_models import MongoEtaStats
+
+# Etapas medidas de cada preparo, na ordem em que acontecem
+STAGE_SPACE = "space"          # do pedido recebido até o áudio sair do Space (inclui a fila do Space)
+STAGE_FINALIZE = "finalize"    # acabamento do áudio
+STAGE_UPLOAD = "upload"        # envio para a nuvem
+STAGE_SAVE = "save"            # registro no cardápio (MongoDB)
+STAGES = (STAGE_SPACE, STAGE_FINALIZE, STAGE_UPLOAD, STAGE_SAVE)
+
+# Tempos padrão (segundos) enquanto o relógio ainda não tem medições suficientes
+DEFAULT_STAGE_SECONDS = {STAGE_SPACE: 180, STAGE_FINALIZE: 5, STAGE_UPLOAD: 10, STAGE_SAVE: 1}
+
+# Em que etapa o preparo está, a partir do 'step' enviado ao cliente
+STEP_STAGES = {
+    "received": STAGE_SPACE,
+    "connecting": STAGE_SPACE,
+    "retrying": STAGE_SPACE,
+    "space_unavailable": STAGE_SPACE,
+    "sending_order": STAGE_SPACE,
+    "queue_full": STAGE_SPACE,
+    "in_queue": STAGE_SPACE,
+    "sending_data": STAGE_SPACE,
+    "cooking": STAGE_SPACE,
+    "finalizing": STAGE_FINALIZE,
+    "uploading": STAGE_UPLOAD,
+    "saving": STAGE_SAVE,
+}
+
+# Passos que indicam que este preparo não reflete o tempo real da cozinha (não entram nas estatísticas)
+UNMEASURED_STEPS = ("cache_hit", "coalesced")
+
+ANY = "*"
+
+
+class EtaTracker:
+    """O cronômetro de um preparo: mede cada etapa e calcula quanto falta a cada aviso de progresso."""
+
+    def __init__(self, service: "EtaService", voice_type: str, has_sample: bool):
+        self.service = service
+        self.voice_type = voice_type
+        self.has_sample = has_sample
+        self.recording = True
+        self.stage: Optional[str] = None
+        self.stage_started: Optional[float] = None
+
+    def advance(self, step: str, space_eta: Optional[int] = None) -> Optional[int]:
+        """Registra o passo atual e devolve os segundos estimados até o fim (ou space_eta como veio)."""
+        if step in UNMEASURED_STEPS:
+            self.recording = False
+        stage = STEP_STAGES.get(step)
+        if stage is None:
+            return space_eta
+
+        now = time.monotonic()
+        if stage != self.stage:
+            self._close_stage(now)
+            self.stage = stage
+            self.stage_started = now
+
+        later = self.service.estimate(STAGES[STAGES.index(stage) + 1:], self.voice_type, self.has_sample)
+        if space_eta is not None and stage == STAGE_SPACE:
+            # O próprio Space informou quanto falta para ele; somamos só as etapas seguintes.
+            return int(space_eta + later)
+        current = self.service.estimate((stage,), self.voice_type, self.has_sample)
+        return int(max(0.0, current - (now - self.stage_started)) + later)
+
+    def finish(self):
+        """O prato ficou pronto: fecha a última etapa."""
+        self._close_stage(time.monotonic())
+        self.stage = None
+
+    def _close_stage(self, now: float):
+        if self.stage is not None and self.recording:
+            self.service.record(self.stage, now - self.stage_started, self.voice_type, self.has_sample)
+
+
+class EtaService:
+    """
+    O Relógio da Cozinha. Em vez de tempos estimados inventados, guarda as durações reais de cada etapa
+    (janela móvel por etapa, tipo de voz, presença de amostra e período do dia) e estima pelo percentil.
+    As estatísticas vivem em memória (estimar custa quase nada) e são gravadas no caderno de tempos
+    (MongoDB) de tempos em tempos, para sobreviver a reinícios e serem compartilhadas entre workers.
+    """
+
+    def __init__(self):
+        self.window = int(os.getenv("ETA_WINDOW", 200))
+        self.percentile = float(os.getenv("ETA_PERCENTILE", 0.75))
+        self.min_samples = int(os.getenv("ETA_MIN_SAMPLES", 5))
+        self.hour_bucket = int(os.getenv("ETA_HOUR_BUCKET", 6))  # horas por período do dia
+        self.persist_interval = float(os.getenv("ETA_PERSIST_INTERVAL", 300))  # segundos
+
+        self.samples: Dict[str, deque] = {}
+        self._estimates: Dict[str, Optional[float]] = {}  # percentil já calculado por chave
+        self._pending: Dict[str, List[float]] = {}  # medições ainda não gravadas no caderno
+        self.db_manager = None
+        self.persist_task: Optional[asyncio.Task] = None
+
+    def _period(self) -> str:
+        return str(datetime.utcnow().hour // self.hour_bucket)
+
+    def _keys(self, stage: str, voice_type: str, has_sample: bool) -> List[str]:
+        """Da chave mais específica para a mais geral."""
+        sample = "sample" if has_sample else "no_sample"
+        return [
+            f"{stage}|{voice_type}|{sample}|{self._period()}",
+            f"{stage}|{voice_type}|{sample}|{ANY}",
+            f"{stage}|{ANY}|{ANY}|{ANY}",
+        ]
+
+    def track(self, voice_type: str, has_sample: bool) -> EtaTracker:
+        return EtaTracker(self, voice_type or "instrumental", has_sample)
+
+    def record(self, stage: str, seconds: float, voice_type: str, has_sample: bool):
+        """Guarda a duração de uma etapa em todas as granularidades."""
+        for key in self._keys(stage, voice_type, has_sample):
+            self._add(key, seconds)
+            self._pending.setdefault(key, []).append(round(seconds, 2))
+
+    def _add(self, key: str, seconds: float):
+        samples = self.samples.get(key)
+        if samples is None:
+            samples = self.samples[key] = deque(maxlen=self.window)
+        samples.append(seconds)
+        self._estimates.pop(key, None)
+
+    def estimate(self, stages, voice_type: str, has_sample: bool) -> float:
+        """Soma dos tempos estimados (percentil) das etapas informadas."""
+        return sum(self._estimate_stage(stage, voice_type, has_sample) for stage in stages)
+
+    def _estimate_stage(self, stage: str, voice_type: str, has_sample: bool) -> float:
+        for key in self._keys(stage, voice_type, has_sample):
+            if key not in self._estimates:
+                samples = self.samples.get(key)
+                if not samples or len(samples) < self.min_samples:
+                    self._estimates[key] = None
+                else:
+                    ordered = sorted(samples)
+                    self._estimates[key] = ordered[min(len(ordered) - 1, int(len(ordered) * self.percentile))]
+            if self._estimates[key] is not None:
+                return self._estimates[key]
+        return DEFAULT_STAGE_SECONDS[stage]
+
+    async def start(self, db_manager):
+        """Carrega o caderno de tempos e agenda a gravação periódica."""
+        self.db_manager = db_manager
+        try:
+            for key, samples in (await MongoEtaStats.load_all(db_manager)).items():
+                for seconds in samples[-self.window:]:
+                    self._add(key, seconds)
+            print(f"⏱️ Relógio da cozinha: {len(self.samples)} estatística(s) de tempo carregada(s)")
+        except Exception as e:
+            print(f"⚠️ Relógio da cozinha: não foi possível carregar o caderno de tempos: {e}")
+        self.persist_task = asyncio.create_task(self._persist_loop(), name="eta-persist")
+
+    async def stop(self):
+        if self.persist_task:
+            self.persist_task.cancel()
+            await asyncio.gather(self.persist_task, return_exceptions=True)
+            self.persist_task = None
+        await self.flush()
+
+    async def flush(self):
+        """Grava no caderno as medições novas desde a última gravação."""
+        if self.db_manager is None or not self._pending:
+            return
+        pending, self._pending = self._pending, {}
+        try:
+            await MongoEtaStats.append_samples(self.db_manager, pending, self.window)
+        except Exception as e:
+            print(f"⚠️ Relógio da cozinha: erro ao gravar o caderno de tempos: {e}")
+
+    async def _persist_loop(self):
+        while True:
+            await asyncio.sleep(self.persist_interval)
+            await self.flush()
+
+    def get_status(self):
+        return {
+            "keys": len(self.samples),
+            "pending": sum(len(samples) for samples in self._pending.values()),
+            "estimates": {
+                stage: round(self._estimate_stage(stage, ANY, False), 1) for stage in STAGES
+            },
+        }
+
+
+# Instância global do relógio da cozinha
+eta_service = EtaService()
@@ -0,0 +1,232 @@
+# src/services/fake_space_service.py (A Cozinha de Ensaio)
+
+import os
+import json
+import time
+import uuid
+import random
+import shutil
+import tempfile
+import threading
+from enum import Enum
+from collections import namedtuple
+from typing import Any, Dict, List, Optional
+from urllib.parse import urlparse, parse_qs
+
+import numpy as np
+import soundfile as sf
+
+# Esquema de URL que troca o Space de verdade pela cozinha de ensaio (ex.: HUGGING_FACE_SPACE_URLS=fake://local)
+FAKE_SPACE_SCHEME = "fake://"
+
+SAMPLE_RATE = 44100
+
+
+class FakeStatus(Enum):
+    """Os mesmos nomes de Status do gradio_client que o Chef sabe interpretar."""
+    STARTING = "STARTING"
+    IN_QUEUE = "IN_QUEUE"
+    PROCESSING = "PROCESSING"
+    PROGRESS = "PROGRESS"
+    FINISHED = "FINISHED"
+    CANCELLED = "CANCELLED"
+
+
+# Formato mínimo de um StatusUpdate / ProgressUnit do gradio_client
+FakeStatusUpdate = namedtuple("FakeStatusUpdate", "code rank queue_size eta progress_data success")
+FakeProgressUnit = namedtuple("FakeProgressUnit", "index length unit progress desc")
+
+
+def is_fake_space(url: str) -> bool:
+    return url.startswith(FAKE_SPACE_SCHEME)
+
+
+class FakeSpaceClient:
+    """
+    A Cozinha de Ensaio. Imita o Client do gradio_client para o endpoint /predict (submit e predict),
+    sem gastar a cota do Space de verdade. Serve para testes de carga e para o benchmark de ponta a ponta.
+
+    Tudo é configurável pelo ambiente (FAKE_SPACE_*) ou pela própria URL, que tem prioridade:
+        fake://local?latency=20&jitter=0.3&failure_rate=0.05&seconds=30&concurrency=1
+        fake://replay?replay=/caminho/respostas.jsonl
+
+    No modo replay, cada linha do JSONL é uma resposta gravada, repetida em rodízio:
+        {"latency": 42.1, "output": "faixa.wav"}        (caminho relativo ao arquivo JSONL)
+        {"latency": 300, "error": "Connection reset"}
+    """
+
+    def __init__(self, src: str, **kwargs):
+        self.src = src
+        params = {key: values[-1] for key, values in parse_qs(urlparse(src).query).items()}
+
+        def setting(name: str, default):
+            return params.get(name, os.getenv(f"FAKE_SPACE_{name.upper()}", default))
+
+        self.latency = float(setting("latency", 20.0))  # segundos de "forno" por pedido
+        self.jitter = float(setting("jitter", 0.2))  # variação relativa da latência
+        self.failure_rate = float(setting("failure_rate", 0.0))
+        self.output_seconds = float(setting("seconds", 30.0))  # duração do áudio devolvido
+        self.concurrency = int(setting("concurrency", 1))  # pedidos no forno ao mesmo tempo (o resto espera na fila)
+        self.progress_steps = int(setting("progress_steps", 10))
+        seed = setting("seed", None)
+        self.random = random.Random(int(seed) if seed is not None else None)
+
+        self.replay = self._load_replay(setting("replay", None))
+        self._replay_index = 0
+
+        self._lock = threading.Lock()
+        self._slots = threading.Semaphore(self.concurrency)
+        self._waiting: List["FakeJob"] = []
+        self._template_path: Optional[str] = None
+        self.output_dir = tempfile.mkdtemp(prefix="fake_space_")
+        print(f"🧪 Cozinha de ensaio pronta em {src} (latência {self.latency}s, falhas {self.failure_rate:.0%})")
+
+    @staticmethod
+    def _load_replay(path: Optional[str]) -> List[Dict[str, Any]]:
+        if not path:
+            return []
+        base_dir = os.path.dirname(os.path.abspath(path))
+        responses = []
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                response = json.loads(line)
+                if response.get("output"):
+                    response["output"] = os.path.join(base_dir, response["output"])
+                responses.append(response)
+        print(f"🧪 Cozinha de ensaio: {len(responses)} resposta(s) gravada(s) carregada(s) de {path}")
+        return responses
+
+    def submit(self, *args, api_name: str = "/predict", **kwargs) -> "FakeJob":
+        """Mesma assinatura do Client.submit: devolve um Job que roda em segundo plano."""
+        if api_name != "/predict":
+            raise ValueError(f"Cozinha de ensaio só conhece o endpoint /predict (pedido: {api_name})")
+        return FakeJob(self, self._next_plan())
+
+    def predict(self, *args, api_name: str = "/predict", **kwargs):
+        """Mesma assinatura do Client.predict: bloqueia até o resultado."""
+        return self.submit(*args, api_name=api_name, **kwargs).result()
+
+    def _next_plan(self) -> Dict[str, Any]:
+        """Decide como o próximo pedido vai se comportar (latência, erro e áudio de saída)."""
+        with self._lock:
+            if self.replay:
+                response = self.replay[self._replay_index % len(self.replay)]
+                self._replay_index += 1
+                return {
+                    "latency": float(response.get("latency", self.latency)),
+                    "error": response.get("error"),
+                    "output": response.get("output"),
+                }
+            latency = max(0.0, self.random.gauss(self.latency, self.latency * self.jitter))
+            failed = self.random.random() < self.failure_rate
+        return {"latency": latency, "error": "Erro simulado da cozinha de ensaio" if failed else None, "output": None}
+
+    def _render_output(self, source: Optional[str]) -> str:
+        """Cada pedido ganha sua própria cópia do áudio, como os arquivos temporários do gradio_client."""
+        if source is None:
+            with self._lock:
+                if self._template_path is None:
+                    self._template_path = self._write_template()
+            source = self._template_path
+        extension = os.path.splitext(source)[1] or ".wav"
+        output_path = os.path.join(self.output_dir, f"fake_{uuid.uuid4().hex}{extension}")
+        shutil.copyfile(source, output_path)
+        return output_path
+
+    def _write_template(self) -> str:
+        """Tom de 440 Hz com um pouco de ruído, em int16 estéreo (o que o Space costuma devolver)."""
+        t = np.arange(int(self.output_seconds * SAMPLE_RATE)) / SAMPLE_RATE
+        mono = 0.3 * np.sin(2 * np.pi * 440 * t) + 0.02 * np.random.default_rng(0).standard_normal(t.size)
+        stereo = (np.repeat(mono[:, np.newaxis], 2, axis=1) * np.iinfo(np.int16).max).astype(np.int16)
+        path = os.path.join(self.output_dir, "template.wav")
+        sf.write(path, stereo, SAMPLE_RATE, subtype="PCM_16")
+        return path
+
+
+class FakeJob:
+    """Imita o Job do gradio_client: done(), status(), result() e cancel()."""
+
+    def __init__(self, space: FakeSpaceClient, plan: Dict[str, Any]):
+        self.space = space
+        self.plan = plan
+        self._code = FakeStatus.STARTING
+        self._fraction: Optional[float] = None
+        self._started: Optional[float] = None
+        self._output: Optional[str] = None
+        self._error: Optional[Exception] = None
+        self._cancelled = threading.Event()
+        self._done = threading.Event()
+        threading.Thread(target=self._run, daemon=True, name="fake-space-job").start()
+
+    def _run(self):
+        space = self.space
+        try:
+            with space._lock:
+                space._waiting.append(self)
+            self._code = FakeStatus.IN_QUEUE
+            # Espera uma vaga no forno, sem deixar de ouvir um cancelamento.
+            while not space._slots.acquire(timeout=0.1):
+                if self._cancelled.is_set():
+                    return
+            with space._lock:
+                space._waiting.remove(self)
+            try:
+                self._cook()
+            finally:
+                space._slots.release()
+        except Exception as e:
+            self._error = e
+        finally:
+            with space._lock:
+                if self in space._waiting:
+                    space._waiting.remove(self)
+            self._done.set()
+
+    def _cook(self):
+        steps = max(1, self.space.progress_steps)
+        self._code = FakeStatus.PROGRESS
+        self._started = time.monotonic()
+        for step in range(steps):
+            if self._cancelled.wait(self.plan["latency"] / steps):
+                return
+            self._fraction = (step + 1) / steps
+
+        if self.plan["error"]:
+            self._error = Exception(self.plan["error"])
+            return
+        self._output = self.space._render_output(self.plan["output"])
+        self._code = FakeStatus.FINISHED
+
+    def done(self) -> bool:
+        return self._done.is_set()
+
+    def status(self) -> FakeStatusUpdate:
+        rank = queue_size = None
+        eta = None
+        if self._code == FakeStatus.IN_QUEUE:
+            with self.space._lock:
+                if self in self.space._waiting:
+                    rank = self.space._waiting.index(self)
+                queue_size = len(self.space._waiting)
+        elif self._code == FakeStatus.PROGRESS and self._started is not None:
+            eta = max(0.0, self.plan["latency"] - (time.monotonic() - self._started))
+        progress_data = None
+        if self._fraction is not None:
+            progress_data = [FakeProgressUnit(None, None, "steps", self._fraction, None)]
+        return FakeStatusUpdate(self._code, rank, queue_size, eta, progress_data, self._error is None)
+
+    def result(self, timeout: Optional[float] = None):
+        if not self._done.wait(timeout):
+            raise TimeoutError("Cozinha de ensaio não terminou a tempo.")
+        if self._cancelled.is_set() and self._output is None:
+            raise Exception("Pedido cancelado na cozinha de ensaio.")
+        if self._error:
+            raise self._error
+        return self._output
+
+    def cancel(self) -> bool:
+        self._cancelled.set()
+        self._code = FakeStatus.CANCELLED
+        return True
@@ -0,0 +1,84 @@
+# src/services/generation_cache_service.py (A Vitrine de Pratos Prontos)
+
+import os
+import time
+import hashlib
+from collections import OrderedDict
+from typing import Dict, Any, Optional
+
+
+class GenerationCacheService:
+    """
+    A Vitrine de Pratos Prontos. Guarda o resultado (URL já enviada à nuvem) de cada receita
+    já preparada, indexado por uma impressão digital do pedido. Se o mesmo pedido chegar de novo,
+    o prato sai da vitrine e a cozinha (GPU do Space) não é acionada.
+    """
+
+    def __init__(self):
+        self.ttl = int(os.getenv("GENERATION_CACHE_TTL", 7 * 24 * 3600))  # segundos
+        self.max_entries = int(os.getenv("GENERATION_CACHE_SIZE", 1000))
+        self.entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def fingerprint(full_prompt: str, voice_type: str, voice_sample_hash: Optional[str] = None) -> str:
+        """Impressão digital do pedido: prompt montado, tipo de voz e conteúdo da amostra de voz."""
+        digest = hashlib.sha256()
+        for part in (full_prompt, voice_type, voice_sample_hash or ""):
+            digest.update(part.encode("utf-8"))
+            digest.update(b"\0")
+        return digest.hexdigest()
+
+    @staticmethod
+    def hash_file(path: str, chunk_size: int = 1024 * 1024) -> str:
+        """Hash SHA-256 do conteúdo de um arquivo, lido em pedaços."""
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(chunk_size), b""):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Procura o prato na vitrine. Pratos vencidos são descartados."""
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        if time.time() - entry["stored_at"] > self.ttl:
+            del self.entries[key]
+            self.misses += 1
+            return None
+
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return entry
+
+    def put(self, key: str, music_url: str, stream_url: Optional[str] = None, preview_url: Optional[str] = None):
+        """Coloca um prato novo na vitrine, tirando o menos procurado se ela estiver cheia."""
+        self.entries[key] = {
+            "music_url": music_url,
+            "stream_url": stream_url,
+            "preview_url": preview_url,
+            "stored_at": time.time(),
+        }
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def get_status(self) -> Dict[str, Any]:
+        """Retorna o estado atual da vitrine."""
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self.entries),
+            "max_entries": self.max_entries,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+        }
+
+
+# Instância global da vitrine
+generation_cache_service = GenerationCacheService()
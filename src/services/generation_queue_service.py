@@ -0,0 +1,562 @@
+# src/services/generation_queue_service.py (A Fila de Comandas da Cozinha)
+
+import os
+import time
+import uuid
+import socket
+import asyncio
+from collections import OrderedDict, deque
+from typing import Dict, Any, List, Optional
+
+from models.generation_job_models import MongoGenerationJob
+
+# Estados possíveis de uma comanda (job de geração)
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_DONE = "done"
+JOB_FAILED = "failed"
+JOB_CANCELLED = "cancelled"
+
+FINISHED_STATES = (JOB_DONE, JOB_FAILED, JOB_CANCELLED)
+CANCELLED_MESSAGE = "Pedido cancelado pelo cliente."
+
+# Tipos de comanda: uma música só, ou um lote de variações
+JOB_KIND_SINGLE = "single"
+JOB_KIND_BATCH = "batch"
+
+# Raias de prioridade: pratos rápidos (instrumental, sem amostra de voz), pratos com voz clonada
+# (bem mais demorados) e lotes de variações. O peso define quantas comandas de cada raia saem por rodada.
+LANE_FAST = "fast"
+LANE_VOICE = "voice"
+LANE_BATCH = "batch"
+DEFAULT_LANE_WEIGHTS = {LANE_FAST: 3, LANE_VOICE: 2, LANE_BATCH: 1}
+
+
+class FairScheduler:
+    """
+    O Maître da Fila. Em vez de uma fila única por ordem de chegada, cada raia guarda uma fila
+    por cliente e serve os clientes em rodízio (round-robin): quem mandou vinte pedidos não passa
+    na frente de quem mandou um. Entre as raias, a escolha é um rodízio ponderado (smooth weighted
+    round-robin), para os pratos rápidos andarem sem deixar os demorados morrerem de fome.
+    """
+
+    def __init__(self, maxsize: int, weights: Dict[str, int] = None, wait_window: int = 200):
+        self.maxsize = maxsize
+        self.weights = dict(weights or DEFAULT_LANE_WEIGHTS)
+        self.lanes: Dict[str, "OrderedDict[str, deque]"] = {lane: OrderedDict() for lane in self.weights}
+        self.depths: Dict[str, int] = {lane: 0 for lane in self.weights}
+        self.wait_times: Dict[str, deque] = {lane: deque(maxlen=wait_window) for lane in self.weights}
+        self._current_weights: Dict[str, int] = {lane: 0 for lane in self.weights}
+        self._size = 0
+        self._has_items = asyncio.Event()
+
+    def qsize(self) -> int:
+        return self._size
+
+    def put_nowait(self, entry: Dict[str, Any]):
+        """Coloca a comanda na fila do cliente, dentro da raia dela. Levanta asyncio.QueueFull se lotado."""
+        if self._size >= self.maxsize:
+            raise asyncio.QueueFull()
+        lane = entry["lane"]
+        entry["enqueued_at"] = time.monotonic()
+        self.lanes[lane].setdefault(entry["user_id"], deque()).append(entry)
+        self.depths[lane] += 1
+        self._size += 1
+        self._has_items.set()
+
+    async def get(self) -> Dict[str, Any]:
+        """Espera e devolve a próxima comanda, respeitando o rodízio entre raias e entre clientes."""
+        while self._size == 0:
+            self._has_items.clear()
+            await self._has_items.wait()
+
+        # Daqui até o return não há await: nenhum outro cozinheiro pega a mesma comanda.
+        lane = self._pick_lane()
+        users = self.lanes[lane]
+        user_id, user_queue = next(iter(users.items()))
+        entry = user_queue.popleft()
+        if user_queue:
+            users.move_to_end(user_id)  # o cliente volta para o fim do rodízio
+        else:
+            del users[user_id]
+        self.depths[lane] -= 1
+        self._size -= 1
+        self.wait_times[lane].append(time.monotonic() - entry["enqueued_at"])
+        return entry
+
+    def remove(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Tira uma comanda da fila antes de ela ser atendida."""
+        for lane, users in self.lanes.items():
+            for user_id, user_queue in list(users.items()):
+                for entry in user_queue:
+                    if entry["job_id"] == job_id:
+                        user_queue.remove(entry)
+                        if not user_queue:
+                            del users[user_id]
+                        self.depths[lane] -= 1
+                        self._size -= 1
+                        return entry
+        return None
+
+    def position(self, job_id: str) -> Optional[int]:
+        """
+        Posição da comanda na ordem em que get() vai servir a fila agora (1 = a próxima), simulando
+        o rodízio numa cópia do estado. Pedidos que chegarem depois (de clientes que ainda não estão
+        no rodízio) podem entrar na frente, então a posição pode mudar até a comanda ser atendida.
+        """
+        lanes = {lane: OrderedDict((user_id, deque(user_queue)) for user_id, user_queue in users.items())
+                 for lane, users in self.lanes.items()}
+        depths = dict(self.depths)
+        current_weights = dict(self._current_weights)
+        for position in range(1, self._size + 1):
+            lane = self._pick_lane(depths, current_weights)
+            users = lanes[lane]
+            user_id, user_queue = next(iter(users.items()))
+            entry = user_queue.popleft()
+            if entry["job_id"] == job_id:
+                return position
+            if user_queue:
+                users.move_to_end(user_id)
+            else:
+                del users[user_id]
+            depths[lane] -= 1
+        return None
+
+    def _pick_lane(self, depths: Dict[str, int] = None, current_weights: Dict[str, int] = None) -> str:
+        """Rodízio ponderado suave entre as raias que têm comandas esperando (no estado da fila, ou numa cópia)."""
+        depths = self.depths if depths is None else depths
+        current_weights = self._current_weights if current_weights is None else current_weights
+        active = [lane for lane, depth in depths.items() if depth > 0]
+        total = sum(self.weights[lane] for lane in active)
+        for lane in active:
+            current_weights[lane] += self.weights[lane]
+        chosen = max(active, key=lambda lane: current_weights[lane])
+        current_weights[chosen] -= total
+        return chosen
+
+    def get_status(self) -> Dict[str, Any]:
+        """Profundidade e tempo de espera (médio e p95, em segundos) por raia."""
+        lanes = {}
+        for lane in self.weights:
+            waits = sorted(self.wait_times[lane])
+            lanes[lane] = {
+                "weight": self.weights[lane],
+                "depth": self.depths[lane],
+                "users_waiting": len(self.lanes[lane]),
+                "wait_avg": round(sum(waits) / len(waits), 2) if waits else None,
+                "wait_p95": round(waits[min(len(waits) - 1, int(len(waits) * 0.95))], 2) if waits else None,
+            }
+        return lanes
+
+
+class GenerationQueueService:
+    """
+    A Fila de Comandas. Cada pedido de música vira uma comanda numa fila limitada, organizada
+    pelo FairScheduler (raias de prioridade + rodízio entre clientes), e um número fixo de
+    cozinheiros (workers) por processo atende as comandas.
+    Assim a cozinha (Hugging Face Space) nunca recebe mais pedidos simultâneos do que aguenta.
+
+    Cada comanda também é registrada no Livro de Comandas (MongoDB) com um contrato (lease) que
+    este processo renova periodicamente. Se o worker morrer ou for reciclado, o contrato vence e
+    outro processo assume a comanda e a prepara de novo (até GENERATION_MAX_ATTEMPTS tentativas).
+    """
+
+    def __init__(self):
+        self.max_queue_size = int(os.getenv("GENERATION_QUEUE_SIZE", 50))
+        self.worker_count = int(os.getenv("GENERATION_WORKERS", 2))
+        self.job_retention = int(os.getenv("GENERATION_JOB_RETENTION", 3600))  # segundos
+        self.lane_weights = {
+            lane: int(os.getenv(f"GENERATION_LANE_WEIGHT_{lane.upper()}", weight))
+            for lane, weight in DEFAULT_LANE_WEIGHTS.items()
+        }
+        self.lease_seconds = int(os.getenv("GENERATION_LEASE_SECONDS", 60))
+        self.heartbeat_interval = float(os.getenv("GENERATION_HEARTBEAT_INTERVAL", 15))
+        self.max_attempts = int(os.getenv("GENERATION_MAX_ATTEMPTS", 3))
+        self.queue: Optional[FairScheduler] = None
+        self.jobs: Dict[str, Dict[str, Any]] = {}
+        self.workers: List[asyncio.Task] = []
+        # Preparo em andamento de cada comanda (para poder cancelar sem dispensar o cozinheiro)
+        self.running_tasks: Dict[str, asyncio.Task] = {}
+        self.heartbeat_task: Optional[asyncio.Task] = None
+        self.db_manager = None
+        self.owner_id: Optional[str] = None
+
+    def start(self, db_manager=None):
+        """
+        Abre a fila e chama os cozinheiros para o turno. Precisa rodar dentro do event loop.
+        Com o db_manager, liga o Livro de Comandas (contratos, heartbeat e retomada de comandas órfãs).
+        """
+        if self.workers:
+            print("⚠️ Fila de comandas já está rodando")
+            return
+
+        # Identidade do dono dos contratos: definida aqui (já dentro do worker), nunca no import do preload.
+        self.owner_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self.db_manager = db_manager
+        self.queue = FairScheduler(self.max_queue_size, self.lane_weights)
+        self.workers = [
+            asyncio.create_task(self._worker(index), name=f"generation-worker-{index}")
+            for index in range(self.worker_count)
+        ]
+        if db_manager is not None:
+            self.heartbeat_task = asyncio.create_task(self._heartbeat(), name="generation-heartbeat")
+        print(f"🧾 Fila de comandas aberta: {self.worker_count} cozinheiro(s), até {self.max_queue_size} comandas em espera")
+
+    async def stop(self):
+        """Dispensa os cozinheiros no fim do expediente e devolve as comandas pendentes ao livro."""
+        tasks = self.workers + list(self.running_tasks.values()) + ([self.heartbeat_task] if self.heartbeat_task else [])
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self.workers = []
+        self.heartbeat_task = None
+
+        released = await self._store_call(MongoGenerationJob.release, self.owner_id, default=0) if self.owner_id else 0
+        if released:
+            print(f"📒 {released} comanda(s) devolvida(s) ao livro para outro cozinheiro retomar")
+        print("🛑 Fila de comandas fechada")
+
+    async def submit(self, db_manager, music_data: dict, user_id: str, voice_sample_path: str = None,
+                     kind: str = JOB_KIND_SINGLE) -> Dict[str, Any]:
+        """
+        Registra a comanda no livro e coloca na fila.
+        Levanta asyncio.QueueFull se a fila estiver lotada, para o Garçom recusar o pedido.
+        """
+        if self.queue is None:
+            raise RuntimeError("A fila de comandas não foi iniciada.")
+        if self.queue.qsize() >= self.max_queue_size:
+            raise asyncio.QueueFull()
+
+        self._cleanup_finished_jobs()
+
+        prefix = "batch" if kind == JOB_KIND_BATCH else "music"
+        job_id = f"{prefix}_{user_id}_{uuid.uuid4().hex[:12]}"
+        lane = self._classify_lane(kind, voice_sample_path)
+        job = {
+            "job_id": job_id,
+            "kind": kind,
+            "lane": lane,
+            "user_id": user_id,
+            "music_name": music_data.get("musicName"),
+            "status": JOB_QUEUED,
+            "created_at": time.time(),
+            "started_at": None,
+            "finished_at": None,
+            "result": None,
+            "error": None,
+        }
+
+        # O registro vem antes da fila: um cozinheiro só atende comandas que já estão no livro.
+        # Se o registro falhar, a comanda segue só em memória e o cozinheiro não a procura no livro.
+        stored = await self._store_call(
+            MongoGenerationJob.create, job, music_data, voice_sample_path, self.owner_id, self.lease_seconds
+        )
+        job["persisted"] = stored is not None
+        try:
+            self._enqueue(job, db_manager, music_data, voice_sample_path)
+        except asyncio.QueueFull:
+            # A fila lotou enquanto a comanda era registrada.
+            await self._store_call(MongoGenerationJob.finish, job_id, self.owner_id, JOB_FAILED, error="Fila lotada")
+            raise
+        return job
+
+    def _enqueue(self, job: Dict[str, Any], db_manager, music_data: dict, voice_sample_path: Optional[str]):
+        """Coloca a comanda (nova ou retomada do livro) na fila do maître."""
+        self.queue.put_nowait({
+            "job_id": job["job_id"],
+            "db_manager": db_manager,
+            "music_data": music_data,
+            "user_id": job["user_id"],
+            "voice_sample_path": voice_sample_path,
+            "kind": job["kind"],
+            "lane": job["lane"],
+        })
+        self.jobs[job["job_id"]] = job
+        print(f"🧾 Comanda {job['job_id']} na raia '{job['lane']}' ({self.queue.qsize()}/{self.max_queue_size})")
+
+    @staticmethod
+    def _classify_lane(kind: str, voice_sample_path: str = None) -> str:
+        """Escolhe a raia da comanda: lote, voz clonada (mais demorada) ou rápida."""
+        if kind == JOB_KIND_BATCH:
+            return LANE_BATCH
+        if voice_sample_path:
+            return LANE_VOICE
+        return LANE_FAST
+
+    async def cancel(self, job_id: str, user_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Cancela a comanda do cliente: tira da fila se ainda espera, ou interrompe o preparo
+        (e o Job no Space) se já está no forno. Devolve a comanda, ou None se não for do cliente.
+        Comandas já finalizadas são devolvidas como estão.
+        """
+        job = self.jobs.get(job_id)
+        if job is None:
+            # A comanda pode estar com outro worker: marca no livro, e o dono interrompe no próximo heartbeat.
+            job_doc = await self._store_call(MongoGenerationJob.find_by_id, job_id)
+            if not job_doc or job_doc["user_id"] != user_id:
+                return None
+            if job_doc["status"] not in FINISHED_STATES:
+                job_doc = await self._store_call(
+                    MongoGenerationJob.request_cancel, job_id, CANCELLED_MESSAGE
+                ) or await self._store_call(MongoGenerationJob.find_by_id, job_id) or job_doc
+            return MongoGenerationJob.to_job(job_doc)
+
+        if job["user_id"] != user_id:
+            return None
+        if job["status"] not in FINISHED_STATES:
+            await self._cancel_local(job)
+            await self._store_call(MongoGenerationJob.finish, job_id, self.owner_id, JOB_CANCELLED, error=CANCELLED_MESSAGE)
+        return job
+
+    async def _cancel_local(self, job: Dict[str, Any]):
+        """Cancela uma comanda atendida por este processo e avisa o cliente."""
+        # Importação tardia para evitar dependência circular com o serviço de geração.
+        from services.music_generation_service import music_generation_service, MusicGenerationService
+
+        job_id = job["job_id"]
+        if job["status"] == JOB_QUEUED:
+            entry = self.queue.remove(job_id)
+            if entry:
+                MusicGenerationService.discard_voice_sample(entry["voice_sample_path"])
+        job["status"] = JOB_CANCELLED
+        job["error"] = CANCELLED_MESSAGE
+        job["finished_at"] = time.time()
+
+        task = self.running_tasks.get(job_id)
+        if task:
+            task.cancel()
+        print(f"🛑 Comanda {job_id} cancelada pelo cliente")
+        await music_generation_service.emit_cancelled(job["user_id"], job_id, CANCELLED_MESSAGE)
+
+    def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Consulta a situação de uma comanda."""
+        return self.jobs.get(job_id)
+
+    def get_position(self, job_id: str) -> Optional[int]:
+        """Posição da comanda na ordem de atendimento do maître da fila (1 = a próxima a ser atendida)."""
+        job = self.jobs.get(job_id)
+        if not job or job["status"] != JOB_QUEUED or self.queue is None:
+            return None
+        return self.queue.position(job_id)
+
+    def get_status(self) -> Dict[str, Any]:
+        """Retorna o estado atual da fila."""
+        counts = {state: 0 for state in (JOB_QUEUED, JOB_RUNNING) + FINISHED_STATES}
+        for job in self.jobs.values():
+            counts[job["status"]] += 1
+        return {
+            "workers": len(self.workers),
+            "max_queue_size": self.max_queue_size,
+            "queue_depth": self.queue.qsize() if self.queue else 0,
+            "lanes": self.queue.get_status() if self.queue else {},
+            "jobs": counts,
+        }
+
+    async def _worker(self, index: int):
+        """Um cozinheiro: pega a próxima comanda e só pega outra quando terminar."""
+        # Importação tardia para evitar dependência circular com o serviço de geração.
+        from services.music_generation_service import music_generation_service, MusicGenerationService
+
+        while True:
+            entry = await self.queue.get()
+            job = self.jobs.get(entry["job_id"])
+            try:
+                if job is None:
+                    continue
+
+                # Assume a comanda no livro. Se outro processo a assumiu (contrato vencido), não prepara em dobro.
+                # Comandas que não chegaram ao livro não têm o que assumir: o cofre pode ter voltado depois.
+                claimed = True
+                if job.get("persisted", True):
+                    claimed = await self._store_call(
+                        MongoGenerationJob.claim, job["job_id"], self.owner_id, self.lease_seconds, default=True
+                    )
+                if claimed is None:
+                    job_doc = await self._store_call(MongoGenerationJob.find_by_id, job["job_id"])
+                    if job_doc is None or job_doc["status"] in FINISHED_STATES:
+                        # Cancelada por outro worker (ou já encerrada): ninguém mais vai usar a amostra de voz.
+                        print(f"📒 Cozinheiro {index}: comanda {job['job_id']} foi encerrada no livro antes do preparo")
+                        MusicGenerationService.discard_voice_sample(entry["voice_sample_path"])
+                    else:
+                        # O novo dono pode estar na mesma máquina e usar a mesma amostra: ela fica.
+                        print(f"📒 Cozinheiro {index}: comanda {job['job_id']} já está com outro cozinheiro")
+                    self.jobs.pop(job["job_id"], None)
+                    job = None
+                    continue
+                if job["status"] == JOB_CANCELLED:
+                    # Cancelada enquanto o cozinheiro assumia a comanda (já fora da fila, então a amostra é nossa).
+                    MusicGenerationService.discard_voice_sample(entry["voice_sample_path"])
+                    continue
+
+                job["status"] = JOB_RUNNING
+                job["started_at"] = time.time()
+                if isinstance(claimed, dict):
+                    job["attempts"] = claimed.get("attempts", 1)
+                print(f"👨‍🍳 Cozinheiro {index}: atendendo comanda {job['job_id']}")
+
+                if entry["kind"] == JOB_KIND_BATCH:
+                    handler = music_generation_service.generate_music_batch_async
+                else:
+                    handler = music_generation_service.generate_music_async
+
+                # O preparo roda numa task própria: cancelar a comanda não dispensa o cozinheiro.
+                task = asyncio.create_task(handler(
+                    db_manager=entry["db_manager"],
+                    music_data=entry["music_data"],
+                    voice_sample_path=entry["voice_sample_path"],
+                    user_id=entry["user_id"],
+                    process_id=job["job_id"],
+                ), name=f"generation-job-{job['job_id']}")
+                self.running_tasks[job["job_id"]] = task
+                try:
+                    await asyncio.wait({task})
+                except asyncio.CancelledError:
+                    # O cozinheiro foi dispensado (fim do expediente): a comanda volta para o livro.
+                    task.cancel()
+                    raise
+                finally:
+                    self.running_tasks.pop(job["job_id"], None)
+
+                if task.cancelled():
+                    # Cancelada pelo cliente: a amostra de voz não será mais usada por esta comanda, mas pode
+                    # ainda estar no forno para os caronas do mesmo preparo (só sai quando ele terminar).
+                    # (No fim do expediente ela fica no disco para quem retomar a comanda.)
+                    if job["status"] == JOB_CANCELLED:
+                        music_generation_service.release_voice_sample(entry["voice_sample_path"])
+                    continue
+
+                result = task.result()
+                job["result"] = result
+                if result and result.get("success"):
+                    job["status"] = JOB_DONE
+                else:
+                    job["status"] = JOB_FAILED
+                    job["error"] = (result or {}).get("error", "Erro desconhecido")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"❌ Cozinheiro {index}: erro inesperado na comanda {entry['job_id']}: {e}")
+                if job is not None:
+                    job["status"] = JOB_FAILED
+                    job["error"] = str(e)
+            finally:
+                if job is not None and job["status"] in FINISHED_STATES:
+                    job["finished_at"] = time.time()
+                    closed = await self._store_call(
+                        MongoGenerationJob.finish, job["job_id"], self.owner_id, job["status"],
+                        result=self._stored_result(job["result"]), error=job["error"], default=False
+                    )
+                    # (Canceladas já foram fechadas no livro por quem cancelou.)
+                    if not closed and job.get("persisted", True) and job["status"] != JOB_CANCELLED:
+                        print(f"📒 Cozinheiro {index}: comanda {job['job_id']} não está mais sob nosso contrato; o livro fica com o novo dono")
+
+    async def _heartbeat(self):
+        """Renova os contratos deste processo e retoma comandas órfãs de workers que sumiram."""
+        while True:
+            try:
+                await MongoGenerationJob.heartbeat(self.db_manager, self.owner_id, self.lease_seconds)
+                await self._apply_remote_cancellations()
+                await self._reclaim_expired()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"⚠️ Livro de Comandas: erro ao renovar contratos: {e}")
+            await asyncio.sleep(self.heartbeat_interval)
+
+    async def _apply_remote_cancellations(self):
+        """Interrompe as comandas deste processo que foram canceladas por outro worker."""
+        active = [job_id for job_id, job in self.jobs.items() if job["status"] in (JOB_QUEUED, JOB_RUNNING)]
+        for job_id in await MongoGenerationJob.find_cancelled(self.db_manager, active):
+            job = self.jobs.get(job_id)
+            if job and job["status"] not in FINISHED_STATES:
+                await self._cancel_local(job)
+
+    async def _reclaim_expired(self):
+        """Assume as comandas com contrato vencido, até o espaço livre na fila."""
+        # Importação tardia para evitar dependência circular com o serviço de geração.
+        from services.music_generation_service import MusicGenerationService
+
+        free_slots = self.max_queue_size - self.queue.qsize()
+        if free_slots <= 0:
+            return
+
+        reclaimed = await MongoGenerationJob.reclaim_expired(
+            self.db_manager, self.owner_id, self.lease_seconds, free_slots
+        )
+        for job_doc in reclaimed:
+            job = MongoGenerationJob.to_job(job_doc)
+            voice_sample_path = job_doc.get("voice_sample_path")
+
+            error = None
+            if job["attempts"] >= self.max_attempts:
+                error = f"A comanda falhou após {job['attempts']} tentativa(s)."
+            elif voice_sample_path and not os.path.exists(voice_sample_path):
+                error = "A amostra de voz desta comanda não está mais disponível."
+            if error:
+                print(f"❌ Livro de Comandas: comanda {job['job_id']} abandonada: {error}")
+                await MongoGenerationJob.finish(self.db_manager, job["job_id"], self.owner_id, JOB_FAILED, error=error)
+                MusicGenerationService.discard_voice_sample(voice_sample_path)
+                continue
+
+            print(f"♻️ Livro de Comandas: retomando comanda {job['job_id']} (tentativa {job['attempts'] + 1})")
+            try:
+                self._enqueue(job, self.db_manager, job_doc["music_data"], voice_sample_path)
+            except asyncio.QueueFull:
+                await MongoGenerationJob.release(self.db_manager, self.owner_id, job["job_id"])
+
+    async def _store_call(self, operation, *args, default=None, **kwargs):
+        """
+        Executa uma operação no Livro de Comandas sem derrubar a fila: se o cofre estiver fora
+        (ou o livro desligado), a comanda segue só em memória, como antes.
+        """
+        if self.db_manager is None or self.db_manager.db is None:
+            return default
+        try:
+            return await operation(self.db_manager, *args, **kwargs)
+        except Exception as e:
+            print(f"⚠️ Livro de Comandas: erro em {operation.__name__}: {e}")
+            return default
+
+    @staticmethod
+    def _stored_result(result: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        """Só o que a consulta de comandas precisa (o resultado completo pode ter objetos não serializáveis)."""
+        if not result:
+            return None
+        return {
+            key: result[key]
+            for key in ("success", "music_url", "stream_url", "preview_url", "music_urls", "upload_status", "pending_upload", "failed", "error")
+            if key in result
+        }
+
+    def _cleanup_finished_jobs(self):
+        """Remove da memória as comandas finalizadas há mais tempo que o período de retenção."""
+        now = time.time()
+        expired = [
+            job_id for job_id, job in self.jobs.items()
+            if job["status"] in FINISHED_STATES and job["finished_at"] and now - job["finished_at"] > self.job_retention
+        ]
+        for job_id in expired:
+            del self.jobs[job_id]
+
+    @staticmethod
+    def to_dict(job: Dict[str, Any]) -> Dict[str, Any]:
+        """Converte a comanda para o formato da resposta da API."""
+        result = job.get("result") or {}
+        return {
+            "job_id": job["job_id"],
+            "kind": job.get("kind", JOB_KIND_SINGLE),
+            "lane": job.get("lane"),
+            "status": job["status"],
+            "music_name": job.get("music_name"),
+            "created_at": job.get("created_at"),
+            "started_at": job.get("started_at"),
+            "finished_at": job.get("finished_at"),
+            "attempts": job.get("attempts", 1 if job.get("started_at") else 0),
+            "music_url": result.get("music_url"),
+            "music_urls": result.get("music_urls"),
+            "error": job.get("error"),
+        }
+
+
+# Instância global da fila de comandas
+generation_queue_service = GenerationQueueService()
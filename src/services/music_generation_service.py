@@ -4,21 +4,36 @@
 # Descrição: Serviço de orquestração para geração de música, conectando o backend com a "Cozinha" (Hugging Face).
 
 import time
+import uuid
 import asyncio
-from typing import Optional, Tuple
+import hashlib
+import tempfile
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple, Union
 import os
 
+import aiofiles
 import numpy as np
-# A importação do 'Job' foi removida do escopo global para evitar
-# erros de inicialização. Apenas o 'Client' é importado aqui.
-from gradio_client import Client
 
-from services.cloudinary_service import CloudinaryService
+from services.cloudinary_service import PLACEHOLDER_AUDIO_URL
+from services.storage_service import storage_service
+from services.generation_cache_service import generation_cache_service
+from services.audio_processing_service import audio_processing_service
+from services.space_pool_service import space_pool_service, SpaceReplica
+from services.eta_service import eta_service
+from services.upload_retry_service import upload_retry_service, StagedUpload
 # O Chef agora sabe que a função de arquivamento pertence ao Livro de Receitas (MongoMusic).
-from models.mongo_models import MongoMusic
+from models.mongo_models import MongoMusic, MUSIC_READY, MUSIC_PENDING_UPLOAD
 # A Cozinha agora precisa saber o que é um "Gerente do Cofre" para poder recebê-lo.
 from database.database import DatabaseConnection
 
+# Limite e tamanho dos pedaços da amostra de voz (gravada em disco aos poucos, nunca inteira na memória)
+MAX_VOICE_SAMPLE_BYTES = int(os.getenv("MAX_VOICE_SAMPLE_BYTES", 50 * 1024 * 1024))  # 50MB
+VOICE_SAMPLE_CHUNK_SIZE = 256 * 1024
+VOICE_SAMPLE_EXTENSIONS = (".mp3", ".wav", ".m4a", ".mp4", ".ogg", ".flac")
+
+
 class MusicGenerationService:
     _instance = None
 
@@ -33,10 +48,25 @@ class MusicGenerationService:
             return
         
         self._initialized = True
-        self.client: Optional[Client] = None
-        self.space_url = "https://lucasidcloned-cantai-api.hf.space"
+        # As cozinhas (Spaces) vivem na escala; cada uma tem seu Client, disjuntor e porteiro.
+        self.space_pool = space_pool_service
+        self.space_timeout = int(os.getenv("SPACE_TIMEOUT", 300))  # segundos
+        self.space_poll_interval = float(os.getenv("SPACE_POLL_INTERVAL", 1.0))  # segundos
+        # Com todos os disjuntores abertos, quanto tempo uma comanda aceita esperar uma cozinha voltar (0 = falha na hora).
+        self.space_breaker_wait = float(os.getenv("SPACE_BREAKER_WAIT", 0))  # segundos
+        # Quantas cozinhas diferentes uma comanda pode tentar antes de desistir.
+        self.space_max_attempts = int(os.getenv("SPACE_MAX_ATTEMPTS", len(self.space_pool.replicas)))
+        # Executor dedicado às chamadas síncronas do gradio_client, para nunca travar o event loop.
+        self.space_executor = ThreadPoolExecutor(
+            max_workers=int(os.getenv("SPACE_EXECUTOR_WORKERS", 4)),
+            thread_name_prefix="space-client"
+        )
         self.websocket_service = None
         self.notification_service = None
+        # Preparos em andamento por impressão digital: {"task": ..., "subscribers": {process_id: user_id}, "voice_sample_path": ...}
+        self._inflight: Dict[str, Dict] = {}
+        # Cronômetro de cada preparo em andamento (o tempo estimado enviado ao cliente sai daqui)
+        self._eta_trackers: Dict[str, object] = {}
         
         try:
             from services.websocket_service import websocket_service
@@ -51,6 +81,9 @@ class MusicGenerationService:
             print("⚠️ Notification service não disponível")
 
     async def _emit_progress(self, user_id: str, progress: int, message: str, step: str = "", estimated_time: int = None, process_id: str = None):
+        tracker = self._eta_trackers.get(process_id)
+        if tracker:
+            estimated_time = tracker.advance(step, estimated_time)
         if self.websocket_service:
             try:
                 await self.websocket_service.emit_progress(
@@ -58,7 +91,8 @@ class MusicGenerationService:
                     step=step,
                     progress=progress,
                     message=message,
-                    estimated_time=estimated_time
+                    estimated_time=estimated_time,
+                    process_id=process_id
                 )
                 if self.notification_service and process_id:
                     await self.notification_service.save_process_history(
@@ -97,6 +131,37 @@ class MusicGenerationService:
             except Exception as e:
                 print(f"⚠️ Erro ao emitir conclusão via WebSocket: {e}")
 
+    async def _emit_batch_completion(self, user_id: str, music_name: str, tracks: list, failed: int, process_id: str = None):
+        """Entrega cada variação pelo WebSocket, mas registra um único aviso para o lote inteiro."""
+        if self.websocket_service:
+            try:
+                for track in tracks:
+                    await self.websocket_service.emit_completion(
+                        user_id=user_id,
+                        music_name=track["musicName"],
+                        music_url=track["musicUrl"]
+                    )
+                if self.notification_service and process_id:
+                    message = f"{len(tracks)} variações de '{music_name}' criadas com sucesso"
+                    if failed:
+                        message += f" ({failed} falharam)"
+                    await self.notification_service.save_process_history(
+                        user_id=user_id,
+                        process_id=process_id,
+                        step='completed',
+                        status='success',
+                        message=message
+                    )
+                    await self.notification_service.create_notification(
+                        user_id=user_id,
+                        title="🎵 Variações Prontas!",
+                        message=f"{message}. Escolha a sua favorita!",
+                        notification_type="success",
+                        metadata={'music_urls': [track["musicUrl"] for track in tracks], 'music_name': music_name}
+                    )
+            except Exception as e:
+                print(f"⚠️ Erro ao emitir conclusão do lote via WebSocket: {e}")
+
     async def _emit_error(self, user_id: str, error_message: str, process_id: str = None):
         if self.websocket_service:
             try:
@@ -122,26 +187,170 @@ class MusicGenerationService:
             except Exception as e:
                 print(f"⚠️ Erro ao emitir erro via WebSocket: {e}")
 
-    def _connect_to_space(self):
+    async def emit_cancelled(self, user_id: str, process_id: str, message: str = "Pedido cancelado pelo cliente."):
+        """Avisa o cliente e registra no histórico que a comanda foi cancelada."""
+        await self._emit_progress(user_id, 0, f"🛑 {message}", "cancelled", None, process_id)
+        if self.notification_service:
+            try:
+                self.notification_service.complete_process(process_id, success=False, final_message=message)
+                await self.notification_service.save_process_history(
+                    user_id=user_id,
+                    process_id=process_id,
+                    step='cancelled',
+                    status='cancelled',
+                    message=message
+                )
+            except Exception as e:
+                print(f"⚠️ Erro ao registrar cancelamento no histórico: {e}")
+
+    @property
+    def space_url(self) -> str:
+        """URL da cozinha principal (a primeira da escala)."""
+        return self.space_pool.replicas[0].url
+
+    @property
+    def client(self):
+        """Client da cozinha principal, mantido para o caminho síncrono legado."""
+        return self.space_pool.replicas[0].client
+
+    async def _submit_to_space(self, replica: SpaceReplica, full_prompt: str, voice_sample_path: str = None):
+        """Envia o pedido à cozinha escolhida no executor dedicado; devolve o Job do gradio_client."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self.space_executor,
+            functools.partial(replica.client.submit, full_prompt, voice_sample_path, api_name="/predict")
+        )
+
+    async def _wait_for_space_job(self, job, timeout: int, on_status=None):
+        """
+        Espera o Job do Space terminar consultando job.done() de tempos em tempos,
+        em vez de bloquear o event loop com job.result(timeout=...).
+        A cada consulta, o status real do Job (fila, ETA, progresso) é repassado para on_status.
+        """
+        deadline = time.monotonic() + timeout
+        last_report = None
         try:
-            if not self.client:
-                self.client = Client(self.space_url)
-                print(f"🔌 Conectado ao espaço: {self.space_url}")
-            return True
-        except Exception as e:
-            print(f"❌ Erro ao conectar ao espaço: {e}")
-            return False
+            while not job.done():
+                if time.monotonic() >= deadline:
+                    # O cancel() faz uma chamada HTTP ao Space: roda no executor, sem esperar, como no cancelamento abaixo.
+                    asyncio.get_running_loop().run_in_executor(self.space_executor, job.cancel)
+                    raise TimeoutError(f"O Space não respondeu em {timeout} segundos.")
+                if on_status:
+                    report = self._describe_space_status(job.status())
+                    # Só avisa quando muda etapa, posição ou progresso; oscilações do ETA não geram evento.
+                    if report and report[:3] != last_report:
+                        last_report = report[:3]
+                        await on_status(*report)
+                await asyncio.sleep(self.space_poll_interval)
+        except asyncio.CancelledError:
+            # Ninguém mais espera por este prato: avisa o Space para liberar a vaga na fila dele.
+            # O cancel() do gradio_client pode fazer uma chamada HTTP, então roda no executor sem esperar.
+            print("🛑 Preparo cancelado: avisando a cozinha IA para parar")
+            asyncio.get_running_loop().run_in_executor(self.space_executor, job.cancel)
+            raise
+        # O Job já terminou: result() devolve na hora (ou levanta o erro do Space).
+        return job.result()
+
+    @staticmethod
+    def _describe_space_status(update) -> Optional[Tuple[int, str, str, Optional[int]]]:
+        """
+        Traduz um StatusUpdate do gradio_client em (progresso, mensagem, etapa, tempo estimado).
+        Devolve None para status que não interessam ao cliente (ex.: LOG).
+        """
+        if update is None:
+            return None
+
+        code = getattr(update.code, "name", str(update.code))
+        eta = int(update.eta) if getattr(update, "eta", None) is not None else None
 
-    async def generate_music_async(self, db_manager: DatabaseConnection, music_data: dict, voice_file=None, user_id: str = None):
-        voice_sample_path = None
+        if code in ("STARTING", "JOINING_QUEUE"):
+            return 20, "📝 Enviando pedido para o chef", "sending_order", eta
+        if code == "QUEUE_FULL":
+            return 20, "🚦 A cozinha IA está lotada, aguardando uma vaga", "queue_full", eta
+        if code == "IN_QUEUE":
+            if update.rank is not None and update.queue_size:
+                message = f"⏳ Na fila da cozinha IA (posição {update.rank + 1} de {update.queue_size})"
+            else:
+                message = "⏳ Na fila da cozinha IA"
+            return 25, message, "in_queue", eta
+        if code == "SENDING_DATA":
+            return 30, "📦 Entregando os ingredientes ao chef", "sending_data", eta
+        if code in ("PROCESSING", "ITERATING", "PROGRESS"):
+            fraction = None
+            for unit in getattr(update, "progress_data", None) or []:
+                if unit.progress is not None:
+                    fraction = unit.progress
+                elif unit.index is not None and unit.length:
+                    fraction = unit.index / unit.length
+            if fraction is None:
+                return 40, "🔥 Música no forno da IA", "cooking", eta
+            progress = 40 + int(45 * max(0.0, min(1.0, fraction)))
+            return progress, f"🔥 Música no forno da IA ({int(fraction * 100)}%)", "cooking", eta
+        return None
+
+    async def save_voice_sample(self, voice_file, user_id: str) -> Tuple[str, str]:
+        """
+        Guarda a amostra de voz em disco para a comanda poder ser atendida depois da resposta HTTP.
+        O arquivo é copiado em pedaços, o limite de bytes é conferido durante a cópia e o hash
+        do conteúdo (usado pela vitrine) é calculado no caminho. Devolve (caminho, hash).
+        Levanta ValueError se a amostra passar de MAX_VOICE_SAMPLE_BYTES.
+        """
+        extension = os.path.splitext(voice_file.filename or "")[1].lower()
+        if extension not in VOICE_SAMPLE_EXTENSIONS:
+            extension = ".wav"
+        # Nome único por comanda: dois envios do mesmo cliente no mesmo segundo não se sobrescrevem.
+        voice_sample_path = os.path.join(tempfile.gettempdir(), f"voice_{user_id}_{uuid.uuid4().hex}{extension}")
+
+        digest = hashlib.sha256()
+        written = 0
+        try:
+            async with aiofiles.open(voice_sample_path, "wb") as f:
+                while True:
+                    chunk = await voice_file.read(VOICE_SAMPLE_CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    written += len(chunk)
+                    if written > MAX_VOICE_SAMPLE_BYTES:
+                        raise ValueError(f"Amostra de voz maior que {MAX_VOICE_SAMPLE_BYTES} bytes.")
+                    digest.update(chunk)
+                    await f.write(chunk)
+        except BaseException:
+            if os.path.exists(voice_sample_path):
+                os.remove(voice_sample_path)
+            raise
+
+        print(f"🎤 Amostra de voz guardada em {voice_sample_path} ({written} bytes)")
+        return voice_sample_path, digest.hexdigest()
+
+    @staticmethod
+    def discard_voice_sample(voice_sample_path: Optional[str]):
+        """Joga fora a amostra de voz de uma comanda encerrada."""
+        if voice_sample_path and os.path.exists(voice_sample_path):
+            try:
+                os.remove(voice_sample_path)
+            except OSError as e:
+                print(f"⚠️ Erro ao remover arquivo temporário: {e}")
+
+    def release_voice_sample(self, voice_sample_path: Optional[str]):
+        """
+        Joga fora a amostra de voz de uma comanda cancelada, mas só quando nenhum preparo em andamento
+        ainda a usa: o líder de um single-flight pode desistir enquanto os caronas seguem esperando
+        (inclusive por novas tentativas em outra cozinha, que reenviam a mesma amostra).
+        """
+        flights = [
+            flight for flight in self._inflight.values()
+            if voice_sample_path and flight["voice_sample_path"] == voice_sample_path and not flight["task"].done()
+        ]
+        if not flights:
+            self.discard_voice_sample(voice_sample_path)
+            return
+        print(f"🎤 Amostra {voice_sample_path} ainda está no forno de outros pedidos; sai quando o preparo terminar.")
+        flights[0]["task"].add_done_callback(lambda _task: self.release_voice_sample(voice_sample_path))
+
+    async def generate_music_async(self, db_manager: DatabaseConnection, music_data: dict, voice_sample_path: str = None,
+                                   user_id: str = None, process_id: str = None):
+        keep_voice_sample = False
         try:
-            if voice_file:
-                effective_user_id = user_id or music_data.get("userId")
-                voice_sample_path = f"/tmp/voice_{effective_user_id}_{int(time.time())}.wav"
-                with open(voice_sample_path, "wb") as f:
-                    content = await voice_file.read()
-                    f.write(content)
-            
             result = await self.generate_music(
                 db_manager=db_manager,
                 user_id=user_id or music_data.get("userId"),
@@ -153,106 +362,322 @@ class MusicGenerationService:
                 rhythm=music_data.get("rhythm", ""),
                 instruments=music_data.get("instruments", ""),
                 studio_type=music_data.get("studioType", "studio"),
-                voice_sample_path=voice_sample_path
+                voice_sample_path=voice_sample_path,
+                process_id=process_id,
+                use_cache=not music_data.get("fresh", False),
+                voice_sample_hash=music_data.get("voiceSampleHash")
             )
             
             return result
             
+        except asyncio.CancelledError:
+            # Comanda interrompida (ex.: worker reciclado): a amostra fica no disco para quem retomar a comanda.
+            keep_voice_sample = True
+            raise
         except Exception as e:
             print(f"❌ Erro no generate_music_async: {e}")
             await self._emit_error(user_id or music_data.get("userId"), str(e))
             return {"success": False, "error": str(e)}
         finally:
-            if voice_sample_path and os.path.exists(voice_sample_path):
-                try:
-                    os.remove(voice_sample_path)
-                except OSError as e:
-                    print(f"⚠️ Erro ao remover arquivo temporário: {e}")
+            if not keep_voice_sample:
+                self.discard_voice_sample(voice_sample_path)
 
 
-    async def generate_music(self, db_manager: DatabaseConnection, user_id: str, description: str, music_name: str, 
-                           voice_type: str = "instrumental", lyrics: str = "", 
-                           genre: str = "", rhythm: str = "", instruments: str = "", 
-                           studio_type: str = "studio", voice_sample_path: str = None):
-        process_id = f"music_{user_id}_{int(time.time())}"
-        
+    async def _emit_progress_all(self, subscribers: Dict[str, str], progress: int, message: str, step: str = "",
+                                 estimated_time: int = None):
+        """Envia o mesmo progresso para todos os clientes que aguardam o mesmo preparo."""
+        for process_id, user_id in list(subscribers.items()):
+            await self._emit_progress(user_id, progress, message, step, estimated_time, process_id)
+
+    async def _acquire_replica(self, report, tried) -> SpaceReplica:
+        """
+        Escolhe a cozinha saudável menos ocupada (ainda não tentada) e pede passagem ao seu porteiro.
+        Se todos os disjuntores estiverem abertos, a comanda falha na hora ou espera no máximo SPACE_BREAKER_WAIT segundos.
+        """
+        replica = self.space_pool.pick(exclude=tried)
+        if replica is None:
+            retry_in = self.space_pool.time_until_available(exclude=tried)
+            if self.space_breaker_wait <= 0 or retry_in > self.space_breaker_wait:
+                raise Exception("A cozinha IA está temporariamente fora do ar. Tente novamente em alguns minutos.")
+
+            await report(8, "🚧 A cozinha IA está instável. Aguardando ela se recuperar", "space_unavailable", int(retry_in))
+            deadline = time.monotonic() + self.space_breaker_wait
+            while replica is None:
+                if time.monotonic() >= deadline:
+                    raise Exception("A cozinha IA está temporariamente fora do ar. Tente novamente em alguns minutos.")
+                await asyncio.sleep(self.space_poll_interval)
+                replica = self.space_pool.pick(exclude=tried)
+
         try:
-            if self.notification_service:
-                self.notification_service.start_process_tracking(user_id, process_id, "music_generation")
-            
-            await self._emit_progress(user_id, 5, "📋 Pedido recebido na cozinha", "received", 180, process_id)
-            await asyncio.sleep(1)
-            
-            await self._emit_progress(user_id, 10, "🔌 Conectando com a cozinha IA", "connecting", 170, process_id)
-            if not self._connect_to_space():
+            await replica.limiter.acquire()
+        except BaseException:
+            replica.breaker.release_trial()
+            raise
+        return replica
+
+    async def _release_replica(self, replica: SpaceReplica, outcome: Optional[str], latency: float):
+        """Informa ao disjuntor e ao porteiro da cozinha como foi a chamada."""
+        if outcome == "success":
+            replica.breaker.record_success()
+        elif outcome in ("failure", "timeout"):
+            replica.breaker.record_failure(timeout=outcome == "timeout")
+            # Um Client com problema não fica guardado: a próxima comanda reconecta do zero.
+            replica.client = None
+        else:
+            replica.breaker.release_trial()
+            await replica.limiter.release(success=None)
+            return
+        await replica.limiter.release(latency, success=outcome == "success")
+
+    def get_status(self):
+        """Retorna o estado atual das cozinhas IA."""
+        return self.space_pool.get_status()
+
+    async def _call_replica(self, replica: SpaceReplica, report, full_prompt: str,
+                            voice_sample_path: str = None):
+        """Uma tentativa completa numa cozinha: conectar, enviar o pedido e esperar o resultado."""
+        started = time.monotonic()
+        outcome = None  # "success", "failure" ou "timeout"
+        try:
+            await report(10, "🔌 Conectando com a cozinha IA", "connecting", None)
+            if not await replica.connect(self.space_executor):
+                outcome = "failure"
                 raise Exception("Falha ao conectar com o serviço de IA. Tente novamente mais tarde.")
-            await asyncio.sleep(2)
-            
-            await self._emit_progress(user_id, 20, "📝 Enviando pedido para o chef", "sending_order", 150, process_id)
-            await asyncio.sleep(1)
-            
-            await self._emit_progress(user_id, 30, "👨‍🍳 Chef IA analisando seu pedido", "preparing", 130, process_id)
-            await asyncio.sleep(2)
-            
-            if voice_sample_path and voice_type != "instrumental":
-                await self._emit_progress(user_id, 40, "🎤 Processando sua amostra de voz", "processing_voice", 120, process_id)
-                await asyncio.sleep(3)
-            
-            await self._emit_progress(user_id, 50, "🔥 Música no forno da IA", "cooking", 90, process_id)
-            
-            full_prompt = self._build_prompt(description, voice_type, lyrics, genre, rhythm, instruments, studio_type)
-            
-            await self._emit_progress(user_id, 70, "⏳ Aguardando resultado da cozinha", "waiting_result", 60, process_id)
             
             # ================== INÍCIO DA CORREÇÃO DE ROBUSTEZ ==================
             try:
                 # A importação do 'Job' é feita aqui, dentro da função.
                 from gradio_client.client import Job
 
-                job: Optional[Job] = self.client.submit(
-                    full_prompt,
-                    voice_sample_path,
-                    api_name="/predict"
-                )
+                job: Optional[Job] = await self._submit_to_space(replica, full_prompt, voice_sample_path)
 
                 if not job:
                     raise Exception("O serviço de IA não aceitou o pedido. Pode estar sobrecarregado ou offline.")
                 
-                result = job.result(timeout=300)
+                result = await self._wait_for_space_job(job, self.space_timeout, on_status=report)
+                outcome = "success"
 
             except Exception as gradio_error:
+                outcome = "timeout" if isinstance(gradio_error, TimeoutError) else "failure"
                 # Se qualquer coisa der errado na comunicação com o Gradio (timeout, erro de rede, etc.),
                 # o Chef agora sabe como lidar com isso.
-                print(f"🚨 Erro de comunicação com o Forno Aliado (Gradio): {gradio_error}")
+                print(f"🚨 Erro de comunicação com o Forno Aliado (Gradio) em {replica.url}: {gradio_error}")
                 # Ele avisa o cliente com uma mensagem clara.
                 raise Exception("Houve um problema de comunicação com o serviço de IA. Por favor, tente novamente em alguns minutos.")
             # =================== FIM DA CORREÇÃO DE ROBUSTEZ ====================
+        finally:
+            await self._release_replica(replica, outcome, time.monotonic() - started)
+        
+        return result
+
+    async def _render_track(self, report, upload_name: str, full_prompt: str,
+                            voice_sample_path: str = None) -> Union[Dict[str, Optional[str]], StagedUpload]:
+        """
+        Prepara o prato de verdade: chama uma cozinha (com troca de cozinha em caso de falha) e envia o áudio para a nuvem,
+        junto com a versão de streaming e a prévia. Devolve {"music_url", "stream_url", "preview_url"}.
+        report(progress, message, step, estimated_time) recebe cada atualização de progresso.
+        Se a nuvem recusar o envio, o áudio vai para a despensa e o retorno é um StagedUpload em vez das URLs.
+        """
+        tried = set()
+        while True:
+            replica = await self._acquire_replica(report, tried)
+            tried.add(replica.url)
+            try:
+                result = await self._call_replica(replica, report, full_prompt, voice_sample_path)
+                break
+            except Exception:
+                if len(tried) >= self.space_max_attempts or not self.space_pool.candidates(exclude=tried):
+                    raise
+                print(f"🔁 Cozinha {replica.url} falhou. Levando o pedido para outra cozinha.")
+                await report(10, "🔁 A cozinha teve um imprevisto. Levando seu pedido para outra cozinha", "retrying", None)
+        
+        if not result:
+            raise Exception("Falha na geração da música. O serviço de IA não retornou um resultado válido.")
+        
+        await report(87, "🎚️ Dando o acabamento final na música", "finalizing", None)
+        processed_path = None
+        try:
+            processed_path = await audio_processing_service.process(result)
+        except Exception as e:
+            # O acabamento é um bônus: se falhar, o prato segue como saiu da cozinha.
+            print(f"⚠️ Falha no acabamento do áudio, enviando o resultado original: {e}")
+        
+        final_path = processed_path or result
+        renditions = {}
+        if isinstance(final_path, str):
+            try:
+                renditions = await audio_processing_service.renditions(final_path) or {}
+            except Exception as e:
+                # Versão de streaming e prévia também são bônus: o prato principal segue sem elas.
+                print(f"⚠️ Falha ao gerar a versão de streaming e a prévia: {e}")
+        
+        await report(90, "☁️ Garçom levando à sua mesa", "uploading", None)
+        
+        try:
+            # Cada preparo ganha seu próprio public_id: um prato novo nunca sobrescreve o que está na vitrine.
+            # O envio sai direto do arquivo em disco, em pedaços, sem carregar a faixa na memória.
+            # As versões extras vão junto; só a falha do prato principal interessa.
+            outcomes = await asyncio.gather(
+                storage_service.upload(final_path, upload_name),
+                *(self._upload_rendition(path, f"{upload_name}_{name}") for name, path in renditions.items()),
+                return_exceptions=True
+            )
+            if isinstance(outcomes[0], BaseException):
+                raise outcomes[0]
+            track = {"music_url": outcomes[0], "stream_url": None, "preview_url": None}
+            for name, url in zip(renditions, outcomes[1:]):
+                track[f"{name}_url"] = url
+        except Exception as e:
+            if not isinstance(final_path, str) or not os.path.exists(final_path):
+                raise Exception(f"Falha no upload da música para a nuvem: {e}")
+            # A nuvem recusou: o prato vai para a despensa, com as versões extras, e o entregador tenta de novo depois.
+            print(f"⚠️ Nuvem indisponível para '{upload_name}' ({e}). Guardando o prato na despensa.")
+            return await upload_retry_service.stage(final_path, upload_name, renditions)
+        finally:
+            # O arquivo baixado pelo gradio_client, o finalizado e as versões extras não servem mais depois do envio
+            # (os que foram para a despensa já saíram daqui).
+            for path in (processed_path, result, *renditions.values()):
+                if isinstance(path, str) and os.path.exists(path):
+                    os.remove(path)
+        
+        if not track["music_url"]:
+            raise Exception("Falha no upload da música para a nuvem.")
+        
+        return track
+
+    async def _upload_rendition(self, path: str, upload_name: str) -> Optional[str]:
+        """Envia uma versão extra (streaming ou prévia). Falhar aqui só deixa a URL dela vazia."""
+        try:
+            url = await storage_service.upload(path, upload_name)
+        except Exception as e:
+            print(f"⚠️ Versão extra '{upload_name}' não foi enviada: {e}")
+            return None
+        return None if url == PLACEHOLDER_AUDIO_URL else url
+
+    async def _render_track_once(self, cache_key: str, user_id: str, process_id: str, music_name: str,
+                                 full_prompt: str, voice_sample_path: str = None) -> Union[Dict[str, Optional[str]], StagedUpload]:
+        """
+        Single-flight: se um pedido com a mesma impressão digital já está no forno, este cliente
+        passa a acompanhar aquele preparo em vez de abrir outra chamada ao Space.
+        O preparo roda numa task própria: se um cliente desistir, os demais continuam esperando,
+        e só quando o último desiste o preparo (e o Job no Space) é cancelado.
+        """
+        flight = self._inflight.get(cache_key)
+        if flight:
+            print(f"🤝 Pedido '{music_name}' ({process_id}) pegou carona num preparo idêntico já em andamento.")
+            flight["subscribers"][process_id] = user_id
+            # Quem pega carona entra no meio do preparo: o cronômetro dele não vale como medição.
+            if process_id in self._eta_trackers:
+                self._eta_trackers[process_id].recording = False
+            await self._emit_progress(user_id, 10, "🤝 Um pedido igual ao seu já está no forno. Você vai receber o mesmo prato!", "coalesced", None, process_id)
+        else:
+            subscribers = {process_id: user_id}
+            
+            async def report(progress, message, step, estimated_time):
+                await self._emit_progress_all(subscribers, progress, message, step, estimated_time)
+            
+            task = asyncio.create_task(
+                self._render_track(report, f"{music_name}_{process_id}", full_prompt, voice_sample_path),
+                name=f"render-{process_id}"
+            )
+            flight = {"task": task, "subscribers": subscribers, "voice_sample_path": voice_sample_path}
+            self._inflight[cache_key] = flight
             
-            if not result:
-                raise Exception("Falha na geração da música. O serviço de IA não retornou um resultado válido.")
+            def land(_task, flight=flight):
+                if self._inflight.get(cache_key) is flight:
+                    del self._inflight[cache_key]
+            task.add_done_callback(land)
+        
+        try:
+            # shield: a desistência de um cliente não cancela o preparo dos outros.
+            return await asyncio.shield(flight["task"])
+        except asyncio.CancelledError:
+            flight["subscribers"].pop(process_id, None)
+            if not flight["subscribers"] and not flight["task"].done():
+                print(f"🛑 Ninguém mais espera pelo preparo de '{music_name}'. Cancelando.")
+                flight["task"].cancel()
+            raise
+        finally:
+            flight["subscribers"].pop(process_id, None)
+
+    async def generate_music(self, db_manager: DatabaseConnection, user_id: str, description: str, music_name: str, 
+                           voice_type: str = "instrumental", lyrics: str = "", 
+                           genre: str = "", rhythm: str = "", instruments: str = "", 
+                           studio_type: str = "studio", voice_sample_path: str = None, process_id: str = None,
+                           use_cache: bool = True, voice_sample_hash: str = None):
+        process_id = process_id or f"music_{user_id}_{int(time.time())}"
+        tracker = self._eta_trackers[process_id] = eta_service.track(voice_type, bool(voice_sample_path))
+        
+        try:
+            if self.notification_service:
+                self.notification_service.start_process_tracking(user_id, process_id, "music_generation")
             
-            await self._emit_progress(user_id, 85, "🎵 Finalizando detalhes da música", "finalizing", 30, process_id)
-            await asyncio.sleep(2)
+            await self._emit_progress(user_id, 5, "📋 Pedido recebido na cozinha", "received", None, process_id)
             
-            await self._emit_progress(user_id, 95, "☁️ Garçom levando à sua mesa", "uploading", 15, process_id)
+            full_prompt = self._build_prompt(description, voice_type, lyrics, genre, rhythm, instruments, studio_type)
+            
+            # A impressão digital do pedido é sempre calculada, para o prato novo poder ir para a vitrine.
+            if voice_sample_path and not voice_sample_hash:
+                loop = asyncio.get_running_loop()
+                voice_sample_hash = await loop.run_in_executor(None, generation_cache_service.hash_file, voice_sample_path)
+            cache_key = generation_cache_service.fingerprint(full_prompt, voice_type, voice_sample_hash)
             
-            cloudinary_service = CloudinaryService()
-            music_url = cloudinary_service.upload_audio(result, f"{music_name}_{user_id}")
+            cached = generation_cache_service.get(cache_key) if use_cache else None
+            if cached:
+                print(f"♻️ Prato '{music_name}' já estava pronto na vitrine. A cozinha IA não foi acionada.")
+                await self._emit_progress(user_id, 90, "♻️ Essa receita já estava pronta! Servindo direto da vitrine", "cache_hit", None, process_id)
+                track = cached
+            else:
+                if use_cache:
+                    track = await self._render_track_once(cache_key, user_id, process_id, music_name, full_prompt, voice_sample_path)
+                else:
+                    # Quem pediu uma versão nova não pega carona em preparos idênticos.
+                    async def report(progress, message, step, estimated_time):
+                        await self._emit_progress(user_id, progress, message, step, estimated_time, process_id)
+                    
+                    track = await self._render_track(report, f"{music_name}_{process_id}", full_prompt, voice_sample_path)
             
-            if not music_url:
-                raise Exception("Falha no upload da música para a nuvem.")
+            staged = None
+            if isinstance(track, StagedUpload):
+                staged, track = track, {}
+            elif not cached and track["music_url"] != PLACEHOLDER_AUDIO_URL:
+                # A URL de exemplo (Cloudinary indisponível) nunca vai para a vitrine.
+                generation_cache_service.put(cache_key, track["music_url"], track.get("stream_url"), track.get("preview_url"))
+            music_url = track.get("music_url")
             
-            await self._emit_progress(user_id, 98, "💾 Registrando no cardápio", "saving", 5, process_id)
+            await self._emit_progress(user_id, 98, "💾 Registrando no cardápio", "saving", None, process_id)
             
-            await MongoMusic.add_generated_music(db_manager, {
+            music_doc = await MongoMusic.add_generated_music(db_manager, {
                 "userId": user_id,
                 "musicName": music_name,
                 "description": description,
                 "musicUrl": music_url,
+                "streamUrl": track.get("stream_url"),
+                "previewUrl": track.get("preview_url"),
                 "voiceType": voice_type,
                 "genre": genre,
-                "lyrics": lyrics
+                "lyrics": lyrics,
+                "status": MUSIC_PENDING_UPLOAD if staged else MUSIC_READY
             })
+            if staged:
+                # Quem pegou carona num preparo já entregue recebe a URL na hora.
+                music_url = await upload_retry_service.register(db_manager, staged, music_doc, process_id, cache_key)
+            tracker.finish()
+            
+            if staged and not music_url:
+                await self._emit_progress(
+                    user_id, 99, "📦 A nuvem está indisponível. Seu prato ficou guardado e será entregue assim que ela voltar",
+                    MUSIC_PENDING_UPLOAD, None, process_id
+                )
+                if self.notification_service:
+                    self.notification_service.complete_process(process_id, True, f"Música '{music_name}' aguardando envio para a nuvem")
+                return {
+                    "success": True,
+                    "music_url": None,
+                    "upload_status": MUSIC_PENDING_UPLOAD,
+                    "music_name": music_name,
+                    "message": f"Música '{music_name}' gerada! O envio para a nuvem será concluído em breve."
+                }
             
             await self._emit_completion(user_id, music_name, music_url, process_id)
             
@@ -262,6 +687,9 @@ class MusicGenerationService:
             return {
                 "success": True,
                 "music_url": music_url,
+                "stream_url": track.get("stream_url"),
+                "preview_url": track.get("preview_url"),
+                "upload_status": MUSIC_READY,
                 "music_name": music_name,
                 "message": f"Música '{music_name}' gerada com sucesso!"
             }
@@ -280,6 +708,174 @@ class MusicGenerationService:
                 "error": error_message,
                 "message": "Erro ao gerar música. Tente novamente."
             }
+        finally:
+            self._eta_trackers.pop(process_id, None)
+
+    async def generate_music_batch_async(self, db_manager: DatabaseConnection, music_data: dict, voice_sample_path: str = None,
+                                         user_id: str = None, process_id: str = None):
+        """Versão de lote do generate_music_async: vários preparos a partir de uma única comanda."""
+        keep_voice_sample = False
+        try:
+            return await self.generate_music_batch(
+                db_manager=db_manager,
+                user_id=user_id or music_data.get("userId"),
+                music_data=music_data,
+                prompts=music_data.get("prompts") or [music_data.get("description")],
+                variants=music_data.get("variants", 1),
+                voice_sample_path=voice_sample_path,
+                process_id=process_id
+            )
+        except asyncio.CancelledError:
+            keep_voice_sample = True
+            raise
+        except Exception as e:
+            print(f"❌ Erro no generate_music_batch_async: {e}")
+            await self._emit_error(user_id or music_data.get("userId"), str(e))
+            return {"success": False, "error": str(e)}
+        finally:
+            if not keep_voice_sample:
+                self.discard_voice_sample(voice_sample_path)
+
+    async def generate_music_batch(self, db_manager: DatabaseConnection, user_id: str, music_data: dict,
+                                   prompts: List[str], variants: int = 1, voice_sample_path: str = None,
+                                   process_id: str = None):
+        """
+        Prepara N variações de uma vez. Todos os pedidos seguem juntos para as cozinhas (o porteiro AIMD
+        de cada Space decide quantos entram ao mesmo tempo), o progresso é agregado num único process_id
+        e todas as músicas prontas são registradas com um único insert_many.
+        Variações são sempre preparos novos: não passam pela vitrine nem pegam carona.
+        """
+        process_id = process_id or f"batch_{user_id}_{int(time.time())}"
+        music_name = music_data.get("musicName")
+        voice_type = music_data.get("voiceType", "instrumental")
+        
+        orders = [(prompt, variant) for prompt in prompts for variant in range(variants)]
+        total = len(orders)
+        track_progress = [0] * total
+        finished = [0]
+        last_emitted = [None]
+        
+        try:
+            if self.notification_service:
+                self.notification_service.start_process_tracking(user_id, process_id, "music_generation_batch")
+            
+            await self._emit_progress(user_id, 5, f"📋 Pedido de {total} variações recebido na cozinha", "received", None, process_id)
+            
+            def reporter(index: int):
+                async def report(progress, message, step, estimated_time):
+                    track_progress[index] = progress
+                    overall = 5 + int(sum(track_progress) / total * 0.9)
+                    # Só avisa quando o progresso agregado muda, para N preparos não inundarem o WebSocket.
+                    if overall != last_emitted[0]:
+                        last_emitted[0] = overall
+                        await self._emit_progress(
+                            user_id, overall, f"🎼 {finished[0]}/{total} variações prontas — {message}", step, estimated_time, process_id
+                        )
+                return report
+            
+            async def render(index: int, prompt: str):
+                full_prompt = self._build_prompt(
+                    prompt, voice_type, music_data.get("lyrics", ""), music_data.get("genre", ""),
+                    music_data.get("rhythm", ""), music_data.get("instruments", ""), music_data.get("studioType", "studio")
+                )
+                track = await self._render_track(reporter(index), f"{music_name}_{process_id}_{index + 1}", full_prompt, voice_sample_path)
+                track_progress[index] = 100
+                finished[0] += 1
+                return track
+            
+            results = await asyncio.gather(
+                *(render(index, prompt) for index, (prompt, _) in enumerate(orders)),
+                return_exceptions=True
+            )
+            
+            tracks = []
+            failures = []
+            for index, ((prompt, _), outcome) in enumerate(zip(orders, results)):
+                if isinstance(outcome, BaseException):
+                    failures.append(str(outcome))
+                    continue
+                staged = outcome if isinstance(outcome, StagedUpload) else None
+                tracks.append({
+                    "userId": user_id,
+                    "musicName": f"{music_name} (Variação {index + 1})" if total > 1 else music_name,
+                    "description": prompt,
+                    "musicUrl": None if staged else outcome["music_url"],
+                    "streamUrl": None if staged else outcome.get("stream_url"),
+                    "previewUrl": None if staged else outcome.get("preview_url"),
+                    "voiceType": voice_type,
+                    "genre": music_data.get("genre", ""),
+                    "lyrics": music_data.get("lyrics", ""),
+                    "status": MUSIC_PENDING_UPLOAD if staged else MUSIC_READY,
+                    "staged": staged
+                })
+            
+            if not tracks:
+                raise Exception(failures[0] if failures else "Nenhuma variação pôde ser preparada.")
+            
+            await self._emit_progress(user_id, 98, f"💾 Registrando {len(tracks)} variações no cardápio", "saving", None, process_id)
+            music_docs = await MongoMusic.add_generated_musics(db_manager, tracks)
+            if len(music_docs) < len(tracks):
+                # O insert_many é ordenado: só as primeiras variações (se alguma) ficaram no cardápio.
+                unsaved = tracks[len(music_docs):]
+                tracks = tracks[:len(music_docs)]
+                failures.extend(["Falha ao registrar a variação no cardápio."] * len(unsaved))
+                for track in unsaved:
+                    # Prato sem registro não tem a quem ser entregue: sai da despensa.
+                    if track["staged"]:
+                        upload_retry_service.discard(track["staged"])
+                if not tracks:
+                    raise Exception("Falha ao registrar as variações no cardápio. Tente novamente.")
+
+            # Variações que ficaram na despensa são entregues (e avisadas) uma a uma pelo entregador.
+            registered = []
+            for track, music_doc in zip(tracks, music_docs):
+                if track["staged"]:
+                    try:
+                        await upload_retry_service.register(db_manager, track["staged"], music_doc, process_id)
+                    except Exception as e:
+                        failures.append(str(e))
+                        continue
+                registered.append(track)
+            tracks = registered
+            if not tracks:
+                raise Exception(failures[0])
+            ready = [track for track in tracks if not track["staged"]]
+            pending = len(tracks) - len(ready)
+            
+            if ready:
+                await self._emit_batch_completion(user_id, music_name, ready, len(failures), process_id)
+            if pending:
+                await self._emit_progress(
+                    user_id, 99, f"📦 {pending} variação(ões) aguardando a nuvem voltar. Você será avisado na entrega",
+                    MUSIC_PENDING_UPLOAD, None, process_id
+                )
+            
+            if self.notification_service:
+                self.notification_service.complete_process(process_id, True, f"{len(tracks)} de {total} variações de '{music_name}' criadas")
+            
+            return {
+                "success": True,
+                "music_name": music_name,
+                "music_urls": [track["musicUrl"] for track in ready],
+                "pending_upload": pending,
+                "failed": len(failures),
+                "message": f"{len(tracks)} de {total} variações de '{music_name}' geradas com sucesso!"
+            }
+        
+        except Exception as e:
+            error_message = str(e)
+            print(f"❌ Erro inesperado no lote: {error_message}")
+            
+            await self._emit_error(user_id, error_message, process_id)
+            
+            if self.notification_service:
+                self.notification_service.complete_process(process_id, False, error_message)
+            
+            return {
+                "success": False,
+                "error": error_message,
+                "message": "Erro ao gerar as variações. Tente novamente."
+            }
 
     def _build_prompt(self, description: str, voice_type: str, lyrics: str = "", 
                      genre: str = "", rhythm: str = "", instruments: str = "", 
@@ -0,0 +1,154 @@
+# src/services/space_guard_service.py (O Segurança da Porta da Cozinha)
+
+import os
+import time
+import asyncio
+from collections import deque
+from typing import Dict, Any, Optional
+
+# Estados do disjuntor
+BREAKER_CLOSED = "closed"
+BREAKER_OPEN = "open"
+BREAKER_HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """
+    O Disjuntor da cozinha. Observa os últimos pedidos enviados ao Space e, se a taxa de erros
+    (incluindo timeouts) passar do limite, "desarma": os pedidos seguintes falham na hora em vez
+    de esperar minutos por uma cozinha fora do ar. Depois de um tempo deixa passar um pedido de
+    teste (meio-aberto); se ele der certo, o disjuntor volta a fechar.
+    """
+
+    def __init__(self, name: str = "space"):
+        self.name = name
+        self.failure_rate_threshold = float(os.getenv("SPACE_BREAKER_FAILURE_RATE", 0.5))
+        self.window_size = int(os.getenv("SPACE_BREAKER_WINDOW", 20))
+        self.min_calls = int(os.getenv("SPACE_BREAKER_MIN_CALLS", 5))
+        self.open_seconds = float(os.getenv("SPACE_BREAKER_OPEN_SECONDS", 60))
+        self.half_open_max_calls = int(os.getenv("SPACE_BREAKER_HALF_OPEN_CALLS", 1))
+
+        self.state = BREAKER_CLOSED
+        self.outcomes = deque(maxlen=self.window_size)  # True = sucesso, False = falha
+        self.opened_at = None
+        self.half_open_calls = 0
+        self.timeouts = 0
+
+    def allow_request(self) -> bool:
+        """Diz se um novo pedido pode seguir para o Space agora."""
+        if self.state == BREAKER_OPEN:
+            if time.monotonic() - self.opened_at < self.open_seconds:
+                return False
+            self.state = BREAKER_HALF_OPEN
+            self.half_open_calls = 0
+            print(f"🟡 Disjuntor '{self.name}': meio-aberto, deixando passar um pedido de teste")
+
+        if self.state == BREAKER_HALF_OPEN:
+            if self.half_open_calls >= self.half_open_max_calls:
+                return False
+            self.half_open_calls += 1
+        return True
+
+    def record_success(self):
+        """Registra um pedido bem-sucedido."""
+        if self.state == BREAKER_HALF_OPEN:
+            self.state = BREAKER_CLOSED
+            self.outcomes.clear()
+            print(f"🟢 Disjuntor '{self.name}': fechado, a cozinha voltou a responder")
+        self.outcomes.append(True)
+
+    def record_failure(self, timeout: bool = False):
+        """Registra um pedido que falhou (ou estourou o tempo)."""
+        if timeout:
+            self.timeouts += 1
+        if self.state == BREAKER_HALF_OPEN:
+            self._trip()
+            return
+
+        self.outcomes.append(False)
+        if len(self.outcomes) >= self.min_calls:
+            failure_rate = self.outcomes.count(False) / len(self.outcomes)
+            if failure_rate >= self.failure_rate_threshold:
+                self._trip()
+
+    def release_trial(self):
+        """Devolve a vaga de teste de um pedido que foi abandonado sem resultado (ex.: cancelado)."""
+        if self.state == BREAKER_HALF_OPEN and self.half_open_calls > 0:
+            self.half_open_calls -= 1
+
+    def time_until_retry(self) -> float:
+        """Segundos até o disjuntor aceitar um pedido de teste (0 se já aceita)."""
+        if self.state != BREAKER_OPEN:
+            return 0.0
+        return max(0.0, self.open_seconds - (time.monotonic() - self.opened_at))
+
+    def _trip(self):
+        self.state = BREAKER_OPEN
+        self.opened_at = time.monotonic()
+        self.outcomes.clear()
+        print(f"🔴 Disjuntor '{self.name}': ABERTO por {self.open_seconds:.0f}s, pedidos vão falhar na hora")
+
+    def get_status(self) -> Dict[str, Any]:
+        """Retorna o estado atual do disjuntor."""
+        return {
+            "state": self.state,
+            "recent_calls": len(self.outcomes),
+            "recent_failures": self.outcomes.count(False),
+            "timeouts": self.timeouts,
+            "retry_in": round(self.time_until_retry(), 1),
+        }
+
+
+class AdaptiveConcurrencyLimiter:
+    """
+    O Porteiro AIMD. Controla quantos pedidos podem estar no Space ao mesmo tempo:
+    cada resposta rápida aumenta o limite aos poucos (aditivo), e cada resposta lenta,
+    erro ou timeout corta o limite pela metade (multiplicativo).
+    """
+
+    def __init__(self, name: str = "space"):
+        self.name = name
+        self.min_limit = int(os.getenv("SPACE_MIN_CONCURRENCY", 1))
+        self.max_limit = int(os.getenv("SPACE_MAX_CONCURRENCY", 8))
+        self.latency_target = float(os.getenv("SPACE_LATENCY_TARGET", 120))  # segundos
+        self.backoff_ratio = float(os.getenv("SPACE_BACKOFF_RATIO", 0.5))
+
+        self.limit = float(os.getenv("SPACE_INITIAL_CONCURRENCY", 2))
+        self.in_flight = 0
+        self.last_latency = None
+        self._condition = asyncio.Condition()
+
+    async def acquire(self):
+        """Espera até haver vaga dentro do limite atual."""
+        async with self._condition:
+            await self._condition.wait_for(lambda: self.in_flight < int(self.limit))
+            self.in_flight += 1
+
+    async def release(self, latency: float = None, success: Optional[bool] = True):
+        """
+        Libera a vaga e ajusta o limite com base no que aconteceu.
+        success=None (pedido abandonado, ex.: cancelado) libera a vaga sem mexer no limite.
+        """
+        async with self._condition:
+            self.in_flight -= 1
+            if latency is not None:
+                self.last_latency = latency
+
+            if success is None:
+                pass
+            elif success and (latency is None or latency <= self.latency_target):
+                self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+            else:
+                self.limit = max(self.min_limit, self.limit * self.backoff_ratio)
+                print(f"📉 Porteiro '{self.name}': limite reduzido para {int(self.limit)} pedido(s) simultâneo(s)")
+
+            self._condition.notify_all()
+
+    def get_status(self) -> Dict[str, Any]:
+        """Retorna o estado atual do porteiro."""
+        return {
+            "limit": int(self.limit),
+            "in_flight": self.in_flight,
+            "last_latency": round(self.last_latency, 2) if self.last_latency is not None else None,
+            "latency_target": self.latency_target,
+        }
@@ -0,0 +1,108 @@
+# src/services/space_pool_service.py (As Cozinhas Parceiras)
+
+import os
+import asyncio
+from typing import Dict, Any, List, Optional, Iterable
+
+from gradio_client import Client
+
+from services.space_guard_service import CircuitBreaker, AdaptiveConcurrencyLimiter, BREAKER_OPEN
+from services.fake_space_service import is_fake_space
+
+DEFAULT_SPACE_URL = "https://lucasidcloned-cantai-api.hf.space"
+
+
+class SpaceReplica:
+    """Uma cozinha (Hugging Face Space) com seu próprio Client, disjuntor e porteiro."""
+
+    def __init__(self, url: str):
+        self.url = url
+        self.client: Optional[Client] = None
+        self.breaker = CircuitBreaker(url)
+        self.limiter = AdaptiveConcurrencyLimiter(url)
+
+    @property
+    def in_flight(self) -> int:
+        return self.limiter.in_flight
+
+    @property
+    def load(self) -> float:
+        """Ocupação relativa ao limite atual do porteiro (0 = ociosa)."""
+        return self.limiter.in_flight / max(1, int(self.limiter.limit))
+
+    def is_healthy(self) -> bool:
+        """Uma cozinha com o disjuntor aberto só volta à escala quando chega a hora do pedido de teste."""
+        return self.breaker.state != BREAKER_OPEN or self.breaker.time_until_retry() == 0
+
+    async def connect(self, executor) -> bool:
+        """Abre o Client desta cozinha (uma vez), sem travar o event loop."""
+        try:
+            if not self.client:
+                loop = asyncio.get_running_loop()
+                self.client = await loop.run_in_executor(executor, self._client_factory(), self.url)
+                print(f"🔌 Conectado ao espaço: {self.url}")
+            return True
+        except Exception as e:
+            print(f"❌ Erro ao conectar ao espaço {self.url}: {e}")
+            return False
+
+    def _client_factory(self):
+        """Client de verdade, ou a cozinha de ensaio para URLs fake:// (testes de carga e benchmark)."""
+        if is_fake_space(self.url):
+            from services.fake_space_service import FakeSpaceClient
+            return FakeSpaceClient
+        return Client
+
+    def get_status(self) -> Dict[str, Any]:
+        return {
+            "url": self.url,
+            "connected": self.client is not None,
+            "healthy": self.is_healthy(),
+            "breaker": self.breaker.get_status(),
+            "concurrency": self.limiter.get_status(),
+        }
+
+
+class SpacePoolService:
+    """
+    A Escala das Cozinhas. Mantém um conjunto de Spaces intercambiáveis (clones do mesmo Space)
+    e decide para qual deles vai cada comanda: sempre a cozinha saudável menos ocupada.
+    Configurado por HUGGING_FACE_SPACE_URLS (lista separada por vírgulas).
+    """
+
+    def __init__(self):
+        urls = os.getenv("HUGGING_FACE_SPACE_URLS", DEFAULT_SPACE_URL)
+        self.replicas: List[SpaceReplica] = [SpaceReplica(url.strip()) for url in urls.split(",") if url.strip()]
+        if not self.replicas:
+            self.replicas = [SpaceReplica(DEFAULT_SPACE_URL)]
+        print(f"🏭 Escala de cozinhas: {len(self.replicas)} Space(s) configurado(s)")
+
+    def candidates(self, exclude: Iterable[str] = ()) -> List[SpaceReplica]:
+        """Cozinhas saudáveis ainda não tentadas, da menos para a mais ocupada."""
+        excluded = set(exclude)
+        healthy = [replica for replica in self.replicas if replica.url not in excluded and replica.is_healthy()]
+        return sorted(healthy, key=lambda replica: (replica.load, replica.in_flight))
+
+    def pick(self, exclude: Iterable[str] = ()) -> Optional[SpaceReplica]:
+        """Escolhe a cozinha menos ocupada cujo disjuntor aceita o pedido agora."""
+        for replica in self.candidates(exclude):
+            if replica.breaker.allow_request():
+                return replica
+        return None
+
+    def time_until_available(self, exclude: Iterable[str] = ()) -> float:
+        """Segundos até alguma cozinha não tentada voltar a aceitar pedidos."""
+        excluded = set(exclude)
+        waits = [replica.breaker.time_until_retry() for replica in self.replicas if replica.url not in excluded]
+        return min(waits) if waits else float("inf")
+
+    def get_status(self) -> Dict[str, Any]:
+        """Retorna o estado de todas as cozinhas."""
+        return {
+            "replicas": [replica.get_status() for replica in self.replicas],
+            "healthy": sum(1 for replica in self.replicas if replica.is_healthy()),
+        }
+
+
+# Instância global da escala de cozinhas
+space_pool_service = SpacePoolService()
@@ -0,0 +1,196 @@
+# src/services/storage_service.py (A Adega: onde os pratos ficam guardados)
+
+import os
+import re
+import shutil
+import asyncio
+import functools
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Optional
+
+from services.cloudinary_service import CloudinaryService
+
+# O S3 é opcional: só precisa do boto3 quem escolher STORAGE_BACKEND=s3.
+try:
+    import boto3
+    from boto3.s3.transfer import TransferConfig
+except ImportError:
+    boto3 = None
+    TransferConfig = None
+
+STORAGE_CLOUDINARY = "cloudinary"
+STORAGE_LOCAL = "local"
+STORAGE_S3 = "s3"
+
+# Rota que serve os áudios guardados no disco local (ver routes/music.py)
+LOCAL_AUDIO_ROUTE = "/api/music/audio"
+
+AUDIO_CONTENT_TYPES = {".mp3": "audio/mpeg", ".wav": "audio/wav", ".ogg": "audio/ogg", ".flac": "audio/flac", ".m4a": "audio/mp4"}
+
+
+def storage_key(upload_name: str, source_path: str) -> str:
+    """Nome do arquivo guardado: o nome do envio sem caracteres problemáticos, com a extensão do áudio."""
+    return re.sub(r"[^\w.-]", "_", upload_name) + (os.path.splitext(source_path)[1] or ".mp3")
+
+
+class StorageBackend(ABC):
+    """
+    Contrato de uma adega. upload(path, upload_name) guarda o arquivo e devolve a URL pública;
+    quem chama continua dono do arquivo de origem (apaga ou guarda na despensa).
+    """
+    name = "base"
+
+    @abstractmethod
+    async def upload(self, path: str, upload_name: str) -> str:
+        """Guarda o arquivo e devolve a URL pública. Levanta exceção se a adega recusar."""
+
+    def local_path(self, key: str) -> Optional[str]:
+        """Caminho em disco de um áudio guardado (só a adega local serve arquivos)."""
+        return None
+
+    def get_status(self) -> Dict[str, Any]:
+        return {"backend": self.name}
+
+
+class CloudinaryStorage(StorageBackend):
+    """A adega de sempre: Cloudinary, com envio em pedaços, executor e métricas do CloudinaryService."""
+    name = STORAGE_CLOUDINARY
+
+    async def upload(self, path: str, upload_name: str) -> str:
+        return await CloudinaryService.upload_audio_async(path, upload_name)
+
+    def get_status(self) -> Dict[str, Any]:
+        return {"backend": self.name, **CloudinaryService.get_status()}
+
+
+class LocalStorage(StorageBackend):
+    """
+    Adega no próprio disco: sem custo de saída de rede e sem depender de nada externo
+    (útil para servir faixas muito tocadas e para testes de carga da reprodução).
+    Os áudios são servidos pela rota LOCAL_AUDIO_ROUTE, com suporte a Range.
+    """
+    name = STORAGE_LOCAL
+
+    def __init__(self):
+        self.root = os.path.abspath(os.getenv("STORAGE_LOCAL_DIR", os.path.join(os.getcwd(), "storage", "audio")))
+        # Prefixo público das URLs (ex.: https://cdn.exemplo.com); vazio = mesma origem da API.
+        self.public_base_url = os.getenv("STORAGE_PUBLIC_BASE_URL", "").rstrip("/")
+        # Atrás de um nginx, a rota só responde X-Accel-Redirect e o próprio nginx faz o sendfile (e o Range).
+        self.accel_redirect_prefix = os.getenv("STORAGE_LOCAL_ACCEL_PREFIX", "").rstrip("/")
+        self.stored = 0
+
+    async def upload(self, path: str, upload_name: str) -> str:
+        key = storage_key(upload_name, path)
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self._store, path, key)
+        self.stored += 1
+        print(f"✅ Áudio guardado na adega local: {key}")
+        return f"{self.public_base_url}{LOCAL_AUDIO_ROUTE}/{key}"
+
+    def _store(self, path: str, key: str):
+        os.makedirs(self.root, exist_ok=True)
+        destination = os.path.join(self.root, key)
+        # Copia para um temporário e renomeia: quem estiver tocando a versão anterior nunca lê um arquivo pela metade.
+        partial = destination + ".part"
+        shutil.copyfile(path, partial)
+        os.replace(partial, destination)
+
+    def local_path(self, key: str) -> Optional[str]:
+        if os.path.basename(key) != key or key.startswith("."):
+            return None
+        path = os.path.join(self.root, key)
+        return path if os.path.isfile(path) else None
+
+    def get_status(self) -> Dict[str, Any]:
+        return {"backend": self.name, "root": self.root, "stored": self.stored}
+
+
+class S3Storage(StorageBackend):
+    """
+    Adega compatível com S3 (AWS, MinIO, R2...). Para o MinIO local basta apontar S3_ENDPOINT_URL
+    (ex.: http://localhost:9000). O envio usa o upload multipart do boto3 num executor próprio.
+    """
+    name = STORAGE_S3
+
+    def __init__(self):
+        if boto3 is None:
+            raise Exception("STORAGE_BACKEND=s3 exige o pacote boto3 (pip install boto3).")
+        self.bucket = os.getenv("S3_BUCKET")
+        if not self.bucket:
+            raise Exception("STORAGE_BACKEND=s3 exige S3_BUCKET.")
+        self.endpoint_url = os.getenv("S3_ENDPOINT_URL") or None
+        self.prefix = os.getenv("S3_PREFIX", "alquimista").strip("/")
+        self.public_base_url = os.getenv("S3_PUBLIC_BASE_URL", "").rstrip("/")
+        self.client = boto3.client(
+            "s3",
+            endpoint_url=self.endpoint_url,
+            region_name=os.getenv("S3_REGION"),
+            aws_access_key_id=os.getenv("S3_ACCESS_KEY_ID"),
+            aws_secret_access_key=os.getenv("S3_SECRET_ACCESS_KEY"),
+        )
+        self.transfer_config = TransferConfig(
+            multipart_chunksize=int(os.getenv("S3_CHUNK_SIZE", 8 * 1024 * 1024)),
+            max_concurrency=int(os.getenv("S3_UPLOAD_THREADS", 4)),
+        )
+        self._executor = ThreadPoolExecutor(
+            max_workers=int(os.getenv("S3_UPLOAD_WORKERS", 4)), thread_name_prefix="s3-upload"
+        )
+        self.uploads = 0
+        self.failures = 0
+
+    async def upload(self, path: str, upload_name: str) -> str:
+        key = f"{self.prefix}/{storage_key(upload_name, path)}" if self.prefix else storage_key(upload_name, path)
+        content_type = AUDIO_CONTENT_TYPES.get(os.path.splitext(path)[1].lower(), "application/octet-stream")
+        upload = functools.partial(
+            self.client.upload_file, path, self.bucket, key,
+            ExtraArgs={"ContentType": content_type}, Config=self.transfer_config
+        )
+        loop = asyncio.get_running_loop()
+        try:
+            await loop.run_in_executor(self._executor, upload)
+        except Exception as error:
+            self.failures += 1
+            print(f"❌ Erro ao guardar o áudio no S3 ({self.bucket}/{key}): {error}")
+            raise
+        self.uploads += 1
+        print(f"✅ Áudio guardado no S3: {self.bucket}/{key}")
+        return self._public_url(key)
+
+    def _public_url(self, key: str) -> str:
+        if self.public_base_url:
+            return f"{self.public_base_url}/{key}"
+        if self.endpoint_url:
+            # Estilo "path" (o padrão do MinIO): endpoint/bucket/chave
+            return f"{self.endpoint_url.rstrip('/')}/{self.bucket}/{key}"
+        return f"https://{self.bucket}.s3.amazonaws.com/{key}"
+
+    def get_status(self) -> Dict[str, Any]:
+        return {
+            "backend": self.name,
+            "bucket": self.bucket,
+            "endpoint_url": self.endpoint_url,
+            "uploads": self.uploads,
+            "failures": self.failures,
+        }
+
+
+STORAGE_BACKENDS = {
+    STORAGE_CLOUDINARY: CloudinaryStorage,
+    STORAGE_LOCAL: LocalStorage,
+    STORAGE_S3: S3Storage,
+}
+
+
+def create_storage_backend(name: Optional[str] = None) -> StorageBackend:
+    """Monta a adega escolhida em STORAGE_BACKEND (cloudinary, local ou s3)."""
+    name = (name or os.getenv("STORAGE_BACKEND", STORAGE_CLOUDINARY)).strip().lower()
+    if name not in STORAGE_BACKENDS:
+        raise Exception(f"STORAGE_BACKEND desconhecido: '{name}'. Use um de: {', '.join(STORAGE_BACKENDS)}.")
+    backend = STORAGE_BACKENDS[name]()
+    print(f"🍷 Adega de áudios: {backend.name}")
+    return backend
+
+
+# Instância global da adega
+storage_service = create_storage_backend()
@@ -0,0 +1,299 @@
+# src/services/upload_retry_service.py (A Despensa e o Entregador)
+
+import os
+import re
+import uuid
+import random
+import shutil
+import socket
+import asyncio
+import tempfile
+from collections import namedtuple
+from typing import Any, Dict, Optional
+
+from services.cloudinary_service import PLACEHOLDER_AUDIO_URL
+from services.storage_service import storage_service
+from services.generation_cache_service import generation_cache_service
+from models.upload_models import MongoPendingUpload, UPLOAD_DONE
+from models.mongo_models import MongoMusic, MUSIC_READY, MUSIC_UPLOAD_FAILED
+
+# Um prato guardado na despensa esperando a nuvem voltar: o arquivo, o nome com que será enviado
+# e as versões extras (streaming e prévia) guardadas junto, {nome: arquivo}.
+StagedUpload = namedtuple("StagedUpload", "path upload_name renditions", defaults=(None,))
+
+
+class UploadRetryService:
+    """
+    A Despensa e o Entregador. Quando a adega (Cloudinary, S3...) recusa um prato, o áudio não vira a
+    URL de exemplo: fica guardado na despensa (UPLOAD_STAGING_DIR), a música é registrada como
+    'pending_upload' e a entrega é anotada no caderno (MongoDB), que sobrevive a reinícios.
+    O entregador passa de tempos em tempos tentando de novo, com espera exponencial entre as
+    tentativas, e avisa o cliente pelo WebSocket assim que a URL definitiva chega.
+    """
+
+    def __init__(self):
+        self.staging_dir = os.getenv("UPLOAD_STAGING_DIR", os.path.join(tempfile.gettempdir(), "alquimista_staging"))
+        self.poll_interval = float(os.getenv("UPLOAD_RETRY_POLL_INTERVAL", 15))  # segundos
+        self.base_delay = float(os.getenv("UPLOAD_RETRY_BASE_DELAY", 30))  # segundos, dobra a cada tentativa
+        self.max_delay = float(os.getenv("UPLOAD_RETRY_MAX_DELAY", 3600))  # segundos
+        self.max_attempts = int(os.getenv("UPLOAD_RETRY_MAX_ATTEMPTS", 12))
+        self.lease_seconds = int(os.getenv("UPLOAD_RETRY_LEASE_SECONDS", 600))  # tempo máximo de um envio
+        self.batch_size = int(os.getenv("UPLOAD_RETRY_BATCH", 5))  # entregas por passada
+
+        # A despensa é local: as entregas são anotadas com esta máquina e só ela as assume.
+        self.host = socket.gethostname()
+        self.owner_id = f"{self.host}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self.db_manager = None
+        self._registered = set()  # arquivos da despensa com entrega já anotada por este processo
+        self.task: Optional[asyncio.Task] = None
+        self.staged = 0
+        self.delivered = 0
+        self.retries = 0
+        self.failed = 0
+
+        self.websocket_service = None
+        self.notification_service = None
+        try:
+            from services.websocket_service import websocket_service
+            self.websocket_service = websocket_service
+        except ImportError:
+            print("⚠️ WebSocket service não disponível")
+        try:
+            from services.notification_service import notification_service
+            self.notification_service = notification_service
+        except ImportError:
+            print("⚠️ Notification service não disponível")
+
+    def backoff(self, attempts: int) -> float:
+        """Espera antes da próxima tentativa: dobra a cada falha, com um pouco de variação para não sincronizar workers."""
+        delay = min(self.max_delay, self.base_delay * 2 ** max(0, attempts - 1))
+        return delay * random.uniform(0.8, 1.2)
+
+    async def stage(self, path: str, upload_name: str, renditions: Optional[Dict[str, str]] = None) -> StagedUpload:
+        """
+        Guarda o áudio finalizado na despensa (fora dos temporários que são apagados depois do envio),
+        junto com as versões extras, que são entregues com ele.
+        """
+        os.makedirs(self.staging_dir, exist_ok=True)
+        loop = asyncio.get_running_loop()
+
+        async def keep(source: str, name: str) -> str:
+            file_name = re.sub(r"[^\w.-]", "_", name) + (os.path.splitext(source)[1] or ".mp3")
+            staged_path = os.path.join(self.staging_dir, file_name)
+            await loop.run_in_executor(None, shutil.move, source, staged_path)
+            return staged_path
+
+        staged_path = await keep(path, upload_name)
+        staged_renditions = {}
+        for name, rendition_path in (renditions or {}).items():
+            if os.path.exists(rendition_path):
+                staged_renditions[name] = await keep(rendition_path, f"{upload_name}_{name}")
+        self.staged += 1
+        print(f"📦 Despensa: '{upload_name}' guardado em {staged_path} até a nuvem voltar.")
+        return StagedUpload(staged_path, upload_name, staged_renditions)
+
+    async def register(self, db_manager, staged: StagedUpload, music_doc: Optional[Dict[str, Any]],
+                       process_id: str = None, cache_key: str = None) -> Optional[str]:
+        """
+        Anota a música como destinatária da entrega pendente.
+        Devolve a URL definitiva se a entrega já tinha sido concluída (carona que chegou atrasada).
+        Se a entrega não puder ser anotada, ninguém viria buscar o prato: ele sai da despensa e levanta Exception.
+        """
+        upload = None
+        if music_doc:
+            target = {
+                "music_id": str(music_doc["_id"]),
+                "user_id": music_doc.get("userId"),
+                "music_name": music_doc.get("music_name"),
+                "process_id": process_id,
+            }
+            try:
+                upload = await MongoPendingUpload.add_target(
+                    db_manager, staged.upload_name, staged.path, self.host, target, self.backoff(0), cache_key,
+                    staged.renditions
+                )
+            except Exception as e:
+                print(f"⚠️ Despensa: erro ao anotar a entrega de '{staged.upload_name}': {e}")
+
+        if not upload:
+            # Caronas do mesmo preparo dividem o arquivo: ele só sai se nenhuma entrega foi anotada com ele.
+            if staged.path not in self._registered:
+                self.discard(staged)
+            if music_doc:
+                try:
+                    await MongoMusic.set_upload_result(db_manager, [str(music_doc["_id"])], MUSIC_UPLOAD_FAILED)
+                except Exception as e:
+                    print(f"⚠️ Despensa: erro ao marcar a falha de '{staged.upload_name}' no cardápio: {e}")
+            raise Exception(f"Não foi possível registrar a entrega pendente de '{staged.upload_name}'.")
+
+        self._registered.add(staged.path)
+        if upload["status"] == UPLOAD_DONE:
+            await MongoMusic.set_upload_result(db_manager, [target["music_id"]], MUSIC_READY, upload["music_url"])
+            return upload["music_url"]
+        return None
+
+    def discard(self, staged: StagedUpload):
+        """Tira da despensa um prato (e suas versões extras) que não tem a quem ser entregue."""
+        for path in (staged.path, *(staged.renditions or {}).values()):
+            if os.path.exists(path):
+                os.remove(path)
+        print(f"🗑️ Despensa: '{staged.upload_name}' descartado, a entrega não pôde ser anotada.")
+
+    def start(self, db_manager):
+        self.db_manager = db_manager
+        if self.task is None:
+            self.task = asyncio.create_task(self._loop(), name="upload-retry")
+            print(f"🚚 Entregador de pratos pendentes iniciado (a cada {self.poll_interval:.0f}s).")
+
+    async def stop(self):
+        if self.task:
+            self.task.cancel()
+            await asyncio.gather(self.task, return_exceptions=True)
+            self.task = None
+
+    async def _loop(self):
+        while True:
+            try:
+                await self.run_due()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"⚠️ Entregador: erro ao percorrer as entregas pendentes: {e}")
+            await asyncio.sleep(self.poll_interval)
+
+    async def run_due(self) -> int:
+        """Tenta as entregas cuja próxima tentativa já venceu. Devolve quantas foram tentadas."""
+        attempted = 0
+        while attempted < self.batch_size:
+            upload = await MongoPendingUpload.claim_due(self.db_manager, self.owner_id, self.host, self.lease_seconds)
+            if upload is None:
+                break
+            attempted += 1
+            await self._deliver(upload)
+        return attempted
+
+    async def _deliver(self, upload: Dict[str, Any]):
+        upload_id = upload["_id"]
+        staged_path = upload["staged_path"]
+        try:
+            if not os.path.exists(staged_path):
+                # Ex.: disco da despensa ainda não montado depois de um reinício. Conta como uma tentativa.
+                raise Exception(f"Arquivo não encontrado na despensa: {staged_path}")
+            music_url = await storage_service.upload(staged_path, upload_id)
+            if music_url == PLACEHOLDER_AUDIO_URL:
+                raise Exception("Adega de áudios não configurada.")
+        except Exception as e:
+            if upload["attempts"] >= self.max_attempts:
+                await self._give_up(upload_id, str(e))
+                return
+            delay = self.backoff(upload["attempts"])
+            self.retries += 1
+            print(f"🔁 Entregador: '{upload_id}' recusado de novo ({e}). Próxima tentativa em {delay:.0f}s.")
+            await MongoPendingUpload.reschedule(self.db_manager, upload_id, delay, str(e))
+            return
+
+        # As versões extras vão depois do prato principal; se falharem, a música fica pronta sem elas.
+        renditions = upload.get("renditions") or {}
+        extra_urls = {}
+        for name, rendition_path in renditions.items():
+            extra_urls[f"{name}_url"] = await self._upload_rendition(rendition_path, f"{upload_id}_{name}")
+
+        upload = await MongoPendingUpload.complete(self.db_manager, upload_id, music_url)
+        targets = upload.get("targets", []) if upload else []
+        await MongoMusic.set_upload_result(
+            self.db_manager, [target["music_id"] for target in targets], MUSIC_READY, music_url,
+            extra_urls.get("stream_url"), extra_urls.get("preview_url")
+        )
+        if upload and upload.get("cache_key"):
+            generation_cache_service.put(
+                upload["cache_key"], music_url, extra_urls.get("stream_url"), extra_urls.get("preview_url")
+            )
+        for path in (staged_path, *renditions.values()):
+            if os.path.exists(path):
+                os.remove(path)
+        self._registered.discard(staged_path)
+        self.delivered += 1
+        print(f"✅ Entregador: '{upload_id}' finalmente servido ({len(targets)} música(s)).")
+
+        for target in targets:
+            await self._notify_ready(target, music_url)
+
+    async def _upload_rendition(self, path: str, upload_name: str) -> Optional[str]:
+        """Envia uma versão extra guardada na despensa. Falhar aqui só deixa a URL dela vazia."""
+        if not os.path.exists(path):
+            return None
+        try:
+            url = await storage_service.upload(path, upload_name)
+        except Exception as e:
+            print(f"⚠️ Entregador: versão extra '{upload_name}' não foi enviada: {e}")
+            return None
+        return None if url == PLACEHOLDER_AUDIO_URL else url
+
+    async def _give_up(self, upload_id: str, error: str):
+        upload = await MongoPendingUpload.fail(self.db_manager, upload_id, error)
+        targets = upload.get("targets", []) if upload else []
+        await MongoMusic.set_upload_result(
+            self.db_manager, [target["music_id"] for target in targets], MUSIC_UPLOAD_FAILED
+        )
+        self.failed += 1
+        # O arquivo fica na despensa para recuperação manual.
+        print(f"❌ Entregador: desistindo de '{upload_id}': {error}")
+        for target in targets:
+            await self._notify_failed(target, error)
+
+    async def _notify_ready(self, target: Dict[str, Any], music_url: str):
+        user_id = target["user_id"]
+        music_name = target["music_name"]
+        try:
+            if self.websocket_service:
+                await self.websocket_service.emit_completion(user_id=user_id, music_name=music_name, music_url=music_url)
+            if self.notification_service:
+                if target.get("process_id"):
+                    await self.notification_service.save_process_history(
+                        user_id=user_id,
+                        process_id=target["process_id"],
+                        step='completed',
+                        status='success',
+                        message=f"Música '{music_name}' entregue na nuvem"
+                    )
+                await self.notification_service.create_notification(
+                    user_id=user_id,
+                    title="🎵 Música Pronta!",
+                    message=f"Sua música '{music_name}' foi entregue e está pronta para download.",
+                    notification_type="success",
+                    metadata={'music_url': music_url, 'music_name': music_name, 'music_id': target["music_id"]}
+                )
+        except Exception as e:
+            print(f"⚠️ Erro ao avisar a entrega de '{music_name}': {e}")
+
+    async def _notify_failed(self, target: Dict[str, Any], error: str):
+        user_id = target["user_id"]
+        music_name = target["music_name"]
+        message = f"Não foi possível enviar a música '{music_name}' para a nuvem: {error}"
+        try:
+            if self.websocket_service:
+                await self.websocket_service.emit_error(user_id=user_id, error_message=message)
+            if self.notification_service:
+                await self.notification_service.create_notification(
+                    user_id=user_id,
+                    title="❌ Erro na Entrega",
+                    message=message,
+                    notification_type="error",
+                    metadata={'music_id': target["music_id"], 'music_name': music_name}
+                )
+        except Exception as e:
+            print(f"⚠️ Erro ao avisar a falha de entrega de '{music_name}': {e}")
+
+    def get_status(self) -> Dict[str, Any]:
+        return {
+            "staging_dir": self.staging_dir,
+            "running": self.task is not None,
+            "staged": self.staged,
+            "delivered": self.delivered,
+            "retries": self.retries,
+            "failed": self.failed,
+        }
+
+
+# Instância global do entregador
+upload_retry_service = UploadRetryService()
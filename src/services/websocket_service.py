@@ -33,6 +33,7 @@ class WebSocketService:
         self.sio.on('connect', self.handle_connect)
         self.sio.on('disconnect', self.handle_disconnect)
         self.sio.on('join_user_room', self.handle_join_user_room)
+        self.sio.on('cancel_job', self.handle_cancel_job)
     
     async def handle_connect(self, sid, environ):
         """Evento quando um cliente se conecta."""
@@ -71,6 +72,29 @@ class WebSocketService:
             print(f"⚠️ Cliente {sid} enviou dados sem 'userId'. Dados recebidos: {data}")
             await self.sio.emit('join_error', {'message': 'O ID do usuário (userId) não foi encontrado nos dados.'}, room=sid)
 
+    async def handle_cancel_job(self, sid, data):
+        """
+        Evento para o cliente desistir de uma comanda pelo próprio WebSocket.
+        Espera {'jobId': ..., 'token': ...}; o token é o mesmo crachá usado nas rotas HTTP.
+        """
+        # Importações tardias: a fila e o crachá dependem de serviços que importam este módulo.
+        from models.mongo_models import verify_token
+        from services.generation_queue_service import generation_queue_service, JOB_CANCELLED
+
+        job_id = (data or {}).get('jobId')
+        user_id = verify_token((data or {}).get('token') or "")
+        if not job_id or not user_id:
+            await self.sio.emit('cancel_error', {'jobId': job_id, 'message': 'Envie o jobId e um token válido para cancelar.'}, room=sid)
+            return
+
+        job = await generation_queue_service.cancel(job_id, user_id)
+        if not job:
+            await self.sio.emit('cancel_error', {'jobId': job_id, 'message': 'Comanda não encontrada.'}, room=sid)
+        elif job['status'] != JOB_CANCELLED:
+            await self.sio.emit('cancel_error', {'jobId': job_id, 'message': f"Comanda já finalizada (status: {job['status']})."}, room=sid)
+        else:
+            await self.sio.emit('job_cancelled', {'jobId': job_id, 'status': job['status']}, room=sid)
+
     async def send_progress_update(self, user_id: str, progress_data: Dict[str, Any]):
         """Envia atualização de progresso para um usuário específico."""
         session_id = self.connected_users.get(user_id)
@@ -32,6 +32,9 @@ import {
 import { motion, AnimatePresence } from 'framer-motion';
 import io from 'socket.io-client';
 
+// A biblioteca vem em páginas (next_cursor); só os campos que a lista mostra.
+const MUSIC_LIST_FIELDS = 'id,music_name,description,voice_type,genre,music_url,timestamp';
+
 const MusicGenerator = ({ user, onLogout }) => {
   // Estados do formulário
   const [formData, setFormData] = useState({
@@ -50,6 +53,8 @@ const MusicGenerator = ({ user, onLogout }) => {
   const [isGenerating, setIsGenerating] = useState(false);
   const [alert, setAlert] = useState(null);
   const [userMusics, setUserMusics] = useState([]);
+  const [musicsCursor, setMusicsCursor] = useState(null);
+  const [isLoadingMoreMusics, setIsLoadingMoreMusics] = useState(false);
   const [isPlaying, setIsPlaying] = useState(false);
   const [currentPlayingId, setCurrentPlayingId] = useState(null);
   
@@ -176,10 +181,15 @@ const MusicGenerator = ({ user, onLogout }) => {
     setIsGenerating(false); // Garante que o estado de geração seja resetado
   };
 
-  const loadUserMusics = async () => {
+  // Sem cursor, recarrega a primeira página; com cursor, acrescenta a próxima página à lista.
+  const loadUserMusics = async (cursor = null) => {
     try {
       const token = localStorage.getItem('alquimista_token');
-      const response = await fetch('/api/music/musics', {
+      const params = new URLSearchParams({ fields: MUSIC_LIST_FIELDS });
+      if (cursor) {
+        params.set('cursor', cursor);
+      }
+      const response = await fetch(`/api/music/musics?${params}`, {
         headers: {
           'Authorization': `Bearer ${token}`
         }
@@ -187,7 +197,9 @@ const MusicGenerator = ({ user, onLogout }) => {
       
       if (response.ok) {
         const data = await response.json();
-        setUserMusics(data.musics || []);
+        const page = data.musics || [];
+        setUserMusics(prev => (cursor ? [...prev, ...page] : page));
+        setMusicsCursor(data.next_cursor || null);
       } else {
         console.error("Falha ao carregar músicas do usuário.");
       }
@@ -196,6 +208,12 @@ const MusicGenerator = ({ user, onLogout }) => {
     }
   };
 
+  const loadMoreMusics = async () => {
+    setIsLoadingMoreMusics(true);
+    await loadUserMusics(musicsCursor);
+    setIsLoadingMoreMusics(false);
+  };
+
   const loadNotifications = async () => {
     try {
       const token = localStorage.getItem('alquimista_token');
@@ -880,7 +898,7 @@ const MusicGenerator = ({ user, onLogout }) => {
                   Suas Músicas
                 </CardTitle>
                 <CardDescription className="text-purple-200">
-                  {userMusics.length} música{userMusics.length !== 1 ? 's' : ''} criada{userMusics.length !== 1 ? 's' : ''}
+                  {userMusics.length}{musicsCursor ? '+' : ''} música{userMusics.length !== 1 ? 's' : ''} criada{userMusics.length !== 1 ? 's' : ''}
                 </CardDescription>
               </CardHeader>
               <CardContent>
@@ -926,6 +944,16 @@ const MusicGenerator = ({ user, onLogout }) => {
                         </div>
                       </motion.div>
                     ))}
+                    {musicsCursor && (
+                      <Button
+                        onClick={loadMoreMusics}
+                        disabled={isLoadingMoreMusics}
+                        variant="outline"
+                        className="w-full bg-white/10 border-white/20 text-white hover:bg-white/20"
+                      >
+                        {isLoadingMoreMusics ? 'Carregando...' : 'Carregar mais músicas'}
+                      </Button>
+                    )}
                   </div>
                 ) : (
                   <div className="text-center py-12">
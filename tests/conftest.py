@@ -0,0 +1,17 @@
+# tests/conftest.py (A Cozinha de Testes)
+
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+# Mesmo ajuste de path usado por app.py / wsgi.py e pelos benchmarks (mais a raiz, para o pacote 'src')
+project_root = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(project_root))
+sys.path.insert(0, str(project_root / "src"))
+
+# Os serviços globais são montados na importação: os testes nunca falam com o Space, a nuvem ou o cofre de verdade.
+os.environ.setdefault("HUGGING_FACE_SPACE_URLS", "fake://local?latency=1&jitter=0&seconds=1")
+os.environ.setdefault("STORAGE_BACKEND", "local")
+os.environ.setdefault("STORAGE_LOCAL_DIR", os.path.join(tempfile.gettempdir(), "alquimista_test_storage"))
+os.environ.setdefault("UPLOAD_STAGING_DIR", os.path.join(tempfile.gettempdir(), "alquimista_test_staging"))
@@ -0,0 +1,44 @@
+# tests/test_audio_processing.py
+
+import os
+
+import numpy as np
+import pytest
+import soundfile as sf
+
+from services import audio_processing_service
+from services.audio_processing_service import render_renditions, OUTPUT_FORMATS, RENDITIONS
+
+SAMPLE_RATE = 44100
+
+
+@pytest.fixture
+def short_wav(tmp_path):
+    t = np.arange(3 * SAMPLE_RATE) / SAMPLE_RATE
+    tone = (0.3 * np.sin(2 * np.pi * 440 * t)).astype(np.float32)
+    path = tmp_path / "faixa.wav"
+    sf.write(path, np.column_stack([tone, tone]), SAMPLE_RATE)
+    return str(path)
+
+
+def _require_format(output_format):
+    if OUTPUT_FORMATS[output_format][0] not in sf.available_formats():
+        pytest.skip(f"libsndfile sem suporte a {output_format}")
+
+
+@pytest.mark.parametrize("output_format", sorted(OUTPUT_FORMATS))
+@pytest.mark.parametrize("encoder_options", [True, False], ids=["soundfile>=0.13", "soundfile<0.13"])
+def test_render_renditions_writes_stream_and_preview(short_wav, tmp_path, monkeypatch, output_format, encoder_options):
+    _require_format(output_format)
+    if encoder_options and not audio_processing_service.ENCODER_OPTIONS_SUPPORTED:
+        pytest.skip("soundfile instalado não aceita compression_level")
+    monkeypatch.setattr(audio_processing_service, "ENCODER_OPTIONS_SUPPORTED", encoder_options)
+
+    paths = render_renditions(short_wav, output_format, preview_seconds=1.0, output_dir=str(tmp_path))
+
+    assert set(paths) == set(RENDITIONS)
+    for path in paths.values():
+        assert os.path.exists(path) and os.path.getsize(path) > 0
+    stream, preview = sf.info(paths["stream"]), sf.info(paths["preview"])
+    assert stream.duration == pytest.approx(3.0, abs=0.2)
+    assert preview.duration == pytest.approx(1.0, abs=0.2)
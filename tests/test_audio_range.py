@@ -0,0 +1,54 @@
+# tests/test_audio_range.py
+
+import pytest
+
+music_routes = pytest.importorskip("routes.music")
+HTTPException = music_routes.HTTPException
+_parse_range = music_routes._parse_range
+
+SIZE = 1000
+
+
+def test_open_ended_range_goes_to_the_end_of_the_file():
+    assert _parse_range("bytes=0-", SIZE) == (0, 999)
+    assert _parse_range("bytes=500-", SIZE) == (500, 999)
+
+
+def test_closed_range_is_inclusive():
+    assert _parse_range("bytes=0-99", SIZE) == (0, 99)
+    assert _parse_range(" bytes=10-10 ", SIZE) == (10, 10)
+
+
+def test_suffix_range_serves_the_last_bytes():
+    assert _parse_range("bytes=-100", SIZE) == (900, 999)
+    # Pedir mais do que o arquivo tem serve o arquivo inteiro.
+    assert _parse_range("bytes=-5000", SIZE) == (0, 999)
+
+
+def test_end_past_eof_is_clamped_to_the_last_byte():
+    assert _parse_range("bytes=900-5000", SIZE) == (900, 999)
+
+
+@pytest.mark.parametrize("header", ["bytes=1000-", "bytes=1500-2000", "bytes=-0"])
+def test_range_outside_the_file_is_416(header):
+    with pytest.raises(HTTPException) as error:
+        _parse_range(header, SIZE)
+    assert error.value.status_code == 416
+    assert error.value.headers["Content-Range"] == f"bytes */{SIZE}"
+
+
+def test_start_after_end_is_ignored():
+    assert _parse_range("bytes=500-100", SIZE) is None
+
+
+@pytest.mark.parametrize("header", [
+    "bytes=0-99,200-299",  # vários intervalos: o arquivo inteiro é servido
+    "bytes=-",
+    "bytes=abc-def",
+    "bytes 0-99",
+    "items=0-99",
+    "bytes=0-99-",
+    "",
+])
+def test_malformed_or_multi_range_header_is_ignored(header):
+    assert _parse_range(header, SIZE) is None
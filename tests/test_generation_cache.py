@@ -0,0 +1,119 @@
+# tests/test_generation_cache.py
+
+import asyncio
+
+import pytest
+
+generation_cache_module = pytest.importorskip("services.generation_cache_service")
+GenerationCacheService = generation_cache_module.GenerationCacheService
+
+
+class FakeClock:
+    def __init__(self, now: float = 1000.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(generation_cache_module.time, "time", fake)
+    return fake
+
+
+def make_cache(monkeypatch, ttl: int = 60, size: int = 3) -> GenerationCacheService:
+    monkeypatch.setenv("GENERATION_CACHE_TTL", str(ttl))
+    monkeypatch.setenv("GENERATION_CACHE_SIZE", str(size))
+    return GenerationCacheService()
+
+
+def test_entry_expires_after_the_ttl(monkeypatch, clock):
+    cache = make_cache(monkeypatch, ttl=60)
+    cache.put("receita", "https://example.com/a.mp3")
+
+    clock.now += 59
+    assert cache.get("receita")["music_url"] == "https://example.com/a.mp3"
+
+    clock.now += 2
+    assert cache.get("receita") is None
+    # O prato vencido sai da vitrine em vez de ficar ocupando lugar.
+    assert "receita" not in cache.entries
+
+
+def test_least_recently_used_entry_is_evicted_at_max_size(monkeypatch, clock):
+    cache = make_cache(monkeypatch, size=2)
+    cache.put("a", "https://example.com/a.mp3")
+    cache.put("b", "https://example.com/b.mp3")
+
+    # Consultar "a" o torna o mais recente: quem sai é "b".
+    assert cache.get("a") is not None
+    cache.put("c", "https://example.com/c.mp3")
+
+    assert cache.get("b") is None
+    assert cache.get("a") is not None and cache.get("c") is not None
+    assert len(cache.entries) == 2
+
+
+def test_fingerprint_changes_with_prompt_voice_type_and_sample_hash():
+    base = GenerationCacheService.fingerprint("samba alegre", "male", "abc")
+
+    assert GenerationCacheService.fingerprint("samba alegre", "male", "abc") == base
+    assert GenerationCacheService.fingerprint("samba triste", "male", "abc") != base
+    assert GenerationCacheService.fingerprint("samba alegre", "female", "abc") != base
+    assert GenerationCacheService.fingerprint("samba alegre", "male", "abd") != base
+    assert GenerationCacheService.fingerprint("samba alegre", "male") != base
+
+
+def test_fresh_order_is_passed_on_as_cache_opt_out(monkeypatch):
+    music_generation_service = pytest.importorskip("services.music_generation_service")
+    service = music_generation_service.MusicGenerationService()
+    calls = []
+
+    async def generate_music(**kwargs):
+        calls.append(kwargs["use_cache"])
+        return {"success": True}
+
+    monkeypatch.setattr(service, "generate_music", generate_music)
+
+    asyncio.run(service.generate_music_async(None, {"userId": "u1", "musicName": "m", "fresh": True}))
+    asyncio.run(service.generate_music_async(None, {"userId": "u1", "musicName": "m"}))
+
+    assert calls == [False, True]
+
+
+def test_fresh_generation_skips_the_cache_lookup(monkeypatch):
+    music_generation_service = pytest.importorskip("services.music_generation_service")
+    service = music_generation_service.MusicGenerationService()
+    cache = music_generation_service.generation_cache_service
+    rendered = []
+
+    async def quiet(*_args, **_kwargs):
+        return None
+
+    async def render_track(_report, upload_name, *_args):
+        rendered.append(upload_name)
+        return {"music_url": "https://example.com/nova.mp3"}
+
+    async def add_generated_music(_db, music):
+        return {"_id": "music1", **music}
+
+    def cache_get(_key):
+        raise AssertionError("Pedido 'fresh' não deveria consultar a vitrine.")
+
+    for name in ("_emit_progress", "_emit_completion", "_emit_error"):
+        monkeypatch.setattr(service, name, quiet)
+    monkeypatch.setattr(service, "_render_track", render_track)
+    monkeypatch.setattr(music_generation_service.MongoMusic, "add_generated_music", add_generated_music)
+    monkeypatch.setattr(cache, "get", cache_get)
+    monkeypatch.setattr(cache, "entries", type(cache.entries)())
+
+    result = asyncio.run(service.generate_music(
+        None, "u1", "samba alegre", "Samba", process_id="p1", use_cache=False
+    ))
+
+    assert result["success"] and result["music_url"] == "https://example.com/nova.mp3"
+    assert rendered == ["Samba_p1"]
+    # A versão nova ainda vai para a vitrine, para os próximos pedidos iguais.
+    assert len(cache.entries) == 1
@@ -0,0 +1,78 @@
+# tests/test_generation_queue.py
+
+import asyncio
+
+import pytest
+
+generation_queue_service = pytest.importorskip("services.generation_queue_service")
+FairScheduler = generation_queue_service.FairScheduler
+
+
+def test_position_follows_the_fair_dispatch_order():
+    async def scenario():
+        scheduler = FairScheduler(maxsize=50)
+        orders = [("a", "fast"), ("a", "fast"), ("a", "fast"), ("b", "fast"), ("c", "voice"), ("a", "batch"), ("c", "voice")]
+        for index, (user_id, lane) in enumerate(orders):
+            scheduler.put_nowait({"job_id": f"job{index}", "user_id": user_id, "lane": lane})
+
+        predicted = {f"job{index}": scheduler.position(f"job{index}") for index in range(len(orders))}
+        served = [(await scheduler.get())["job_id"] for _ in orders]
+        return predicted, served
+
+    predicted, served = asyncio.run(scenario())
+    assert predicted == {job_id: position for position, job_id in enumerate(served, start=1)}
+    # Não é ordem de chegada: o segundo pedido do cliente "a" espera os outros clientes.
+    assert predicted["job1"] > predicted["job3"]
+
+
+def test_position_of_unknown_job_is_none():
+    scheduler = FairScheduler(maxsize=5)
+    scheduler.put_nowait({"job_id": "job0", "user_id": "a", "lane": "fast"})
+    assert scheduler.position("missing") is None
+    # A simulação não mexe no rodízio de verdade.
+    assert scheduler.position("job0") == 1 and scheduler.qsize() == 1
+
+
+def test_job_not_recorded_in_the_store_still_runs(monkeypatch):
+    """O livro falhou no create e voltou antes do claim: a comanda roda em memória em vez de sumir."""
+    music_generation_service = pytest.importorskip("services.music_generation_service")
+    MongoGenerationJob = generation_queue_service.MongoGenerationJob
+
+    class StoreBackOnline:
+        db = object()
+
+    async def create_fails(*_args, **_kwargs):
+        raise RuntimeError("cofre fora do ar")
+
+    async def claim_finds_nothing(*_args, **_kwargs):
+        return None
+
+    async def finish(*_args, **_kwargs):
+        return False
+
+    async def generate(**_kwargs):
+        return {"success": True, "music_url": "https://example.com/musica.mp3"}
+
+    monkeypatch.setattr(MongoGenerationJob, "create", create_fails)
+    monkeypatch.setattr(MongoGenerationJob, "claim", claim_finds_nothing)
+    monkeypatch.setattr(MongoGenerationJob, "finish", finish)
+    monkeypatch.setattr(MongoGenerationJob, "heartbeat", finish)
+    monkeypatch.setattr(music_generation_service.music_generation_service, "generate_music_async", generate)
+
+    async def scenario():
+        queue = generation_queue_service.GenerationQueueService()
+        queue.worker_count = 1
+        queue.start(StoreBackOnline())
+        try:
+            job = await queue.submit(None, {"musicName": "teste"}, "user1")
+            for _ in range(100):
+                if queue.get_job(job["job_id"])["status"] in generation_queue_service.FINISHED_STATES:
+                    break
+                await asyncio.sleep(0.01)
+            return queue.get_job(job["job_id"])
+        finally:
+            await queue.stop()
+
+    job = asyncio.run(scenario())
+    assert job["persisted"] is False
+    assert job["status"] == generation_queue_service.JOB_DONE
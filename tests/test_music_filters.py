@@ -0,0 +1,97 @@
+# tests/test_music_filters.py
+
+import re
+from datetime import datetime
+
+import pytest
+
+music_filters = pytest.importorskip("models.music_filters")
+compile_music_filters = music_filters.compile_music_filters
+
+
+def test_only_the_owner_and_the_default_index_without_filters():
+    compiled = compile_music_filters("u1", [])
+    assert compiled.query == {"userId": "u1"}
+    assert compiled.hint == music_filters.DEFAULT_FILTER_INDEX
+    assert compiled.applied == {}
+
+
+def test_unknown_keys_are_rejected():
+    with pytest.raises(ValueError, match="Filtros não suportados: userId"):
+        compile_music_filters("u1", [("genre", "samba"), ("userId", "outro")])
+
+
+@pytest.mark.parametrize("params, message", [
+    ([("voice_type", "robot")], "voice_type inválido"),
+    ([("genre", "   ")], "genre não pode ser vazio"),
+    ([("name_prefix", "")], "name_prefix deve ter"),
+    ([("name_prefix", "x" * 101)], "name_prefix deve ter"),
+    ([("created_after", "ontem")], "Data inválida"),
+    ([("created_after", "2024-01-01"), ("created_after", "2024-02-01")], "aceita um único valor"),
+    ([("created_after", "2024-02-01"), ("created_before", "2024-01-01")], "anterior a created_before"),
+])
+def test_invalid_values_are_rejected(params, message):
+    with pytest.raises(ValueError, match=message):
+        compile_music_filters("u1", params)
+
+
+def test_dates_are_parsed_and_converted_to_naive_utc():
+    compiled = compile_music_filters("u1", [
+        ("created_after", "2024-05-01"),
+        ("created_before", "2024-05-02T03:00:00-03:00"),
+    ])
+    assert compiled.query["created_at"] == {
+        "$gte": datetime(2024, 5, 1),
+        "$lt": datetime(2024, 5, 2, 6, 0),
+    }
+    assert compiled.applied == {"created_after": "2024-05-01T00:00:00", "created_before": "2024-05-02T06:00:00"}
+    assert compiled.hint == music_filters.DEFAULT_FILTER_INDEX
+
+    zulu = compile_music_filters("u1", [("created_after", "2024-05-01T12:00:00Z")])
+    assert zulu.query["created_at"]["$gte"] == datetime(2024, 5, 1, 12, 0)
+
+
+def test_name_prefix_is_an_anchored_escaped_regex():
+    compiled = compile_music_filters("u1", [("name_prefix", "  Samba (ao vivo) .*  ")])
+    pattern = compiled.query["music_name"]["$regex"]
+
+    assert pattern == "^" + re.escape("Samba (ao vivo) .*")
+    assert re.match(pattern, "Samba (ao vivo) .* 2024")
+    # Os caracteres especiais valem como texto: nada de curinga nem alternativa.
+    assert not re.match(pattern, "Samba (ao vivo) qualquer coisa")
+    assert not re.match(pattern, "Meu Samba (ao vivo) .*")
+    assert compiled.applied == {"name_prefix": "Samba (ao vivo) .*"}
+
+
+def test_multiple_values_become_a_sorted_in_clause():
+    compiled = compile_music_filters("u1", [("voice_type", "Male"), ("voice_type", "female"), ("voice_type", "male")])
+    assert compiled.query["voice_type"] == {"$in": ["female", "male"]}
+
+    single = compile_music_filters("u1", [("genre", "  Bossa   Nova ")])
+    assert single.query["genre"] == "bossa nova"
+    assert single.applied == {"genre": ["bossa nova"]}
+
+
+@pytest.mark.parametrize("params, hint", [
+    ([("name_prefix", "Sa")], "userId_created_at_id_music_name"),
+    ([("genre", "samba")], "userId_genre_created_at_id"),
+    ([("voice_type", "male")], "userId_voice_type_created_at_id"),
+    ([("name_prefix", "Sa"), ("voice_type", "male")], "userId_voice_type_created_at_id"),
+    ([("name_prefix", "Sa"), ("voice_type", "male"), ("genre", "samba")], "userId_genre_created_at_id"),
+    ([("created_after", "2024-05-01"), ("name_prefix", "Sa")], "userId_created_at_id_music_name"),
+])
+def test_hint_follows_the_filter_index_preference(params, hint):
+    assert compile_music_filters("u1", params).hint == hint
+
+
+def test_every_hint_is_a_registered_index_ending_in_the_page_order():
+    indexes = pytest.importorskip("database.indexes")
+    registered = {model.document["name"]: list(model.document["key"]) for model in indexes.INDEXES["musics"]}
+
+    for _, name in (*music_filters.FILTER_INDEXES, (None, music_filters.DEFAULT_FILTER_INDEX)):
+        keys = registered[name]
+        assert keys[0] == "userId"
+        # A ordenação da página vem antes de qualquer intervalo: o MongoDB não precisa ordenar na memória.
+        page_order = keys.index("created_at")
+        assert keys[page_order:page_order + 2] == ["created_at", "_id"]
+        assert "music_name" not in keys[:page_order]
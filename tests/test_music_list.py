@@ -0,0 +1,179 @@
+# tests/test_music_list.py
+
+import io
+import csv
+import base64
+import json
+from datetime import datetime, timedelta
+
+import pytest
+
+mongo_models = pytest.importorskip("models.mongo_models")
+MongoMusic = mongo_models.MongoMusic
+ObjectId = mongo_models.ObjectId
+
+
+class FakeDatabaseConnection:
+    def __init__(self, db):
+        self.db = db
+
+
+def _matches(document, query):
+    for key, condition in query.items():
+        if key == "$and":
+            if not all(_matches(document, part) for part in condition):
+                return False
+        elif key == "$or":
+            if not any(_matches(document, part) for part in condition):
+                return False
+        elif isinstance(condition, dict):
+            if "$lt" in condition and not document.get(key) < condition["$lt"]:
+                return False
+        elif document.get(key) != condition:
+            return False
+    return True
+
+
+class FakeFind:
+    """O pedaço do cursor do Motor que o Arquivista usa: sort, limit, clone, hint e to_list."""
+
+    def __init__(self, collection, query):
+        self.collection = collection
+        self.query = query
+        self.order = []
+        self.limit_to = None
+
+    def sort(self, order):
+        self.order = order
+        return self
+
+    def limit(self, count):
+        self.limit_to = count
+        return self
+
+    def clone(self):
+        return self
+
+    def hint(self, _index):
+        return self
+
+    async def to_list(self, length):
+        self.collection.queries.append((self.query, self.limit_to))
+        found = [document for document in self.collection.documents if _matches(document, self.query)]
+        for field, direction in reversed(self.order):
+            found.sort(key=lambda document: document[field], reverse=direction < 0)
+        return found[:min(length, self.limit_to or length)]
+
+
+class FakeMusics:
+    def __init__(self, documents):
+        self.documents = documents
+        self.queries = []
+
+    def find(self, query, _projection=None):
+        return FakeFind(self, query)
+
+
+class FakeDb:
+    def __init__(self, documents):
+        self.musics = FakeMusics(documents)
+
+
+def client_for(db):
+    """App só com as rotas do Maître, com o cofre trocado pelo de teste."""
+    pytest.importorskip("httpx")
+    fastapi = pytest.importorskip("fastapi")
+    testclient = pytest.importorskip("fastapi.testclient")
+    music_list = pytest.importorskip("routes.music_list")
+
+    async def get_database():
+        return FakeDatabaseConnection(db)
+
+    app = fastapi.FastAPI()
+    app.include_router(music_list.music_list_router)
+    app.dependency_overrides[music_list.get_database] = get_database
+    app.dependency_overrides[music_list.get_current_user_id] = lambda: "u1"
+    return testclient.TestClient(app)
+
+
+def test_cursor_round_trip_keeps_the_exact_position():
+    music = {"_id": ObjectId(), "created_at": datetime(2024, 5, 1, 12, 30, 15, 123456)}
+
+    cursor = MongoMusic.encode_cursor(music)
+
+    assert "=" not in cursor and "+" not in cursor and "/" not in cursor
+    assert MongoMusic.decode_cursor(cursor) == (music["created_at"], music["_id"])
+
+
+@pytest.mark.parametrize("cursor", [
+    "nada-a-ver",
+    base64.urlsafe_b64encode(b"{not json").decode(),
+    base64.urlsafe_b64encode(json.dumps({"t": "2024-05-01T00:00:00"}).encode()).decode(),
+    base64.urlsafe_b64encode(json.dumps({"t": "ontem", "id": str(ObjectId())}).encode()).decode(),
+    base64.urlsafe_b64encode(json.dumps({"t": "2024-05-01T00:00:00", "id": "xyz"}).encode()).decode(),
+])
+def test_tampered_cursor_raises_value_error(cursor):
+    with pytest.raises(ValueError, match="Cursor de paginação inválido"):
+        MongoMusic.decode_cursor(cursor)
+
+
+def test_tampered_cursor_is_a_400_not_a_500():
+    client = client_for(db=object())
+
+    response = client.get("/musics/u1", params={"cursor": "nada-a-ver"})
+
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Cursor de paginação inválido."
+
+
+def library(count, user_id="u1", lyrics=None):
+    start = datetime(2024, 5, 1)
+    return [
+        {
+            "_id": ObjectId(),
+            "userId": user_id,
+            "music_name": f"Faixa {index}",
+            "lyrics": lyrics(index) if lyrics else None,
+            # Duas faixas por instante: o desempate pelo _id também é exercitado.
+            "created_at": start + timedelta(minutes=index // 2),
+        }
+        for index in range(count)
+    ]
+
+
+def library_of(documents, user_id):
+    return [document for document in documents if document["userId"] == user_id]
+
+
+def test_export_csv_quotes_lyrics_with_commas_quotes_and_newlines():
+    tricky = 'Primeiro verso, com vírgula\nsegundo "verso"\r\nfim'
+    documents = library(1, lyrics=lambda _index: tricky)
+    client = client_for(FakeDb(documents))
+
+    response = client.get("/export", params={"format": "csv", "fields": "music_name,lyrics"})
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/csv")
+    rows = list(csv.reader(io.StringIO(response.text, newline="")))
+    assert rows == [["music_name", "lyrics"], ["Faixa 0", tricky]]
+
+
+def test_export_pages_through_the_library_with_the_keyset_cursor(monkeypatch):
+    music_list = pytest.importorskip("routes.music_list")
+    monkeypatch.setattr(music_list, "MUSIC_EXPORT_BATCH_SIZE", 2)
+    documents = library(5) + library(3, user_id="u2")
+    db = FakeDb(documents)
+    client = client_for(db)
+
+    response = client.get("/export", params={"format": "ndjson", "fields": "id,music_name"})
+
+    exported = [json.loads(line) for line in response.text.splitlines()]
+    newest_first = sorted(library_of(documents, "u1"), key=lambda d: (d["created_at"], d["_id"]), reverse=True)
+    assert [music["id"] for music in exported] == [str(d["_id"]) for d in newest_first]
+
+    # Uma consulta curta por página, cada uma limitada e continuando da posição da anterior.
+    queries = db.musics.queries
+    assert len(queries) == 3
+    assert all(limit == 3 for _, limit in queries)
+    assert queries[0][0] == {"userId": "u1"}
+    assert all("$and" in query for query, _ in queries[1:])
@@ -0,0 +1,48 @@
+# tests/test_single_flight.py
+
+import os
+import asyncio
+import tempfile
+
+import pytest
+
+music_generation_service = pytest.importorskip("services.music_generation_service")
+
+
+def test_cancelled_leader_keeps_the_voice_sample_until_the_shared_render_lands():
+    async def scenario():
+        service = music_generation_service.MusicGenerationService()
+        handle, voice_sample_path = tempfile.mkstemp(suffix=".wav", prefix="voice_test_")
+        os.close(handle)
+
+        render_may_finish = asyncio.Event()
+        render = asyncio.create_task(render_may_finish.wait())
+        service._inflight["fingerprint"] = {
+            "task": render, "subscribers": {"follower": "user2"}, "voice_sample_path": voice_sample_path
+        }
+        render.add_done_callback(lambda _task: service._inflight.pop("fingerprint", None))
+        try:
+            # O líder desistiu: o carona ainda espera o mesmo preparo, que usa a amostra do líder.
+            service.release_voice_sample(voice_sample_path)
+            kept_while_rendering = os.path.exists(voice_sample_path)
+
+            render_may_finish.set()
+            await render
+            await asyncio.sleep(0)
+            return kept_while_rendering, os.path.exists(voice_sample_path)
+        finally:
+            service._inflight.pop("fingerprint", None)
+            if os.path.exists(voice_sample_path):
+                os.remove(voice_sample_path)
+
+    kept_while_rendering, exists_after = asyncio.run(scenario())
+    assert kept_while_rendering
+    assert not exists_after
+
+
+def test_voice_sample_without_a_render_is_discarded_right_away():
+    service = music_generation_service.MusicGenerationService()
+    handle, voice_sample_path = tempfile.mkstemp(suffix=".wav", prefix="voice_test_")
+    os.close(handle)
+    service.release_voice_sample(voice_sample_path)
+    assert not os.path.exists(voice_sample_path)
@@ -0,0 +1,70 @@
+# tests/test_space_call.py
+
+import time
+import asyncio
+
+import pytest
+
+music_generation_service = pytest.importorskip("services.music_generation_service")
+from services.space_pool_service import SpaceReplica
+
+
+async def _max_loop_lag(stop: asyncio.Event, interval: float = 0.01) -> float:
+    """Maior atraso observado num sleep curto enquanto a geração roda: mede se o event loop ficou travado."""
+    lag = 0.0
+    while not stop.is_set():
+        started = time.monotonic()
+        await asyncio.sleep(interval)
+        lag = max(lag, time.monotonic() - started - interval)
+    return lag
+
+
+async def _report(*_args):
+    pass
+
+
+def test_event_loop_keeps_answering_during_a_long_generation():
+    async def scenario():
+        service = music_generation_service.MusicGenerationService()
+        replica = SpaceReplica("fake://test?latency=1.5&jitter=0&seconds=1&progress_steps=3")
+        stop = asyncio.Event()
+        lag_task = asyncio.create_task(_max_loop_lag(stop))
+
+        generation = asyncio.create_task(service._call_replica(replica, _report, "prompt lento"))
+        await asyncio.sleep(0.3)
+        # Com a geração no forno, outra requisição (o status das cozinhas, usado pelo /health) responde na hora.
+        started = time.monotonic()
+        status = service.get_status()
+        answered_in = time.monotonic() - started
+        assert not generation.done()
+
+        output = await generation
+        stop.set()
+        return output, status, answered_in, await lag_task
+
+    output, status, answered_in, lag = asyncio.run(scenario())
+    assert output
+    assert status["replicas"]
+    assert answered_in < 0.05
+    assert lag < 0.2
+
+
+def test_space_timeout_does_not_block_the_event_loop():
+    async def scenario():
+        service = music_generation_service.MusicGenerationService()
+        replica = SpaceReplica("fake://test?latency=5&jitter=0&seconds=1")
+        await replica.connect(service.space_executor)
+        job = await service._submit_to_space(replica, "prompt lento")
+
+        stop = asyncio.Event()
+        lag_task = asyncio.create_task(_max_loop_lag(stop))
+        with pytest.raises(TimeoutError):
+            await service._wait_for_space_job(job, timeout=0.3)
+        await asyncio.sleep(0.2)
+        stop.set()
+        return job, await lag_task
+
+    job, lag = asyncio.run(scenario())
+    assert lag < 0.2
+    # O cancelamento chegou ao Space (pelo executor).
+    assert job.done() or job._cancelled.is_set()
@@ -0,0 +1,135 @@
+# tests/test_space_guard.py
+
+import asyncio
+
+import pytest
+
+space_guard_service = pytest.importorskip("services.space_guard_service")
+CircuitBreaker = space_guard_service.CircuitBreaker
+AdaptiveConcurrencyLimiter = space_guard_service.AdaptiveConcurrencyLimiter
+
+
+class FakeClock:
+    def __init__(self, now: float = 1000.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(space_guard_service.time, "monotonic", fake)
+    return fake
+
+
+@pytest.fixture
+def breaker(monkeypatch, clock):
+    monkeypatch.setenv("SPACE_BREAKER_FAILURE_RATE", "0.5")
+    monkeypatch.setenv("SPACE_BREAKER_WINDOW", "10")
+    monkeypatch.setenv("SPACE_BREAKER_MIN_CALLS", "4")
+    monkeypatch.setenv("SPACE_BREAKER_OPEN_SECONDS", "30")
+    monkeypatch.setenv("SPACE_BREAKER_HALF_OPEN_CALLS", "1")
+    return CircuitBreaker("teste")
+
+
+def test_failures_and_timeouts_through_the_threshold_open_the_breaker(breaker):
+    breaker.record_success()
+    breaker.record_success()
+    breaker.record_failure()
+    # 1 falha em 3 pedidos: ainda abaixo do mínimo de chamadas e da taxa.
+    assert breaker.state == space_guard_service.BREAKER_CLOSED
+
+    breaker.record_failure(timeout=True)
+    # 2 falhas em 4 pedidos (50%): o timeout conta como falha e desarma.
+    assert breaker.state == space_guard_service.BREAKER_OPEN
+    assert breaker.timeouts == 1
+    assert not breaker.allow_request()
+    assert breaker.time_until_retry() == 30
+
+
+def test_breaker_stays_closed_below_the_minimum_number_of_calls(breaker):
+    for _ in range(3):
+        breaker.record_failure()
+    assert breaker.state == space_guard_service.BREAKER_CLOSED
+    assert breaker.allow_request()
+
+
+def test_after_cooldown_a_successful_probe_closes_the_breaker(breaker, clock):
+    for _ in range(4):
+        breaker.record_failure()
+    assert breaker.state == space_guard_service.BREAKER_OPEN
+
+    clock.now += 29
+    assert not breaker.allow_request()
+
+    clock.now += 1
+    assert breaker.allow_request()
+    assert breaker.state == space_guard_service.BREAKER_HALF_OPEN
+    # Só um pedido de teste por vez.
+    assert not breaker.allow_request()
+
+    breaker.record_success()
+    assert breaker.state == space_guard_service.BREAKER_CLOSED
+    assert breaker.allow_request()
+
+
+def test_failed_probe_reopens_the_breaker(breaker, clock):
+    for _ in range(4):
+        breaker.record_failure()
+    clock.now += 30
+    assert breaker.allow_request()
+
+    breaker.record_failure(timeout=True)
+    assert breaker.state == space_guard_service.BREAKER_OPEN
+    assert breaker.time_until_retry() == 30
+
+
+@pytest.fixture
+def limiter(monkeypatch):
+    monkeypatch.setenv("SPACE_MIN_CONCURRENCY", "1")
+    monkeypatch.setenv("SPACE_MAX_CONCURRENCY", "8")
+    monkeypatch.setenv("SPACE_LATENCY_TARGET", "10")
+    monkeypatch.setenv("SPACE_BACKOFF_RATIO", "0.5")
+    monkeypatch.setenv("SPACE_INITIAL_CONCURRENCY", "4")
+    return AdaptiveConcurrencyLimiter("teste")
+
+
+def call(limiter, latency, success=True):
+    async def scenario():
+        await limiter.acquire()
+        await limiter.release(latency, success)
+
+    asyncio.run(scenario())
+
+
+def test_limit_halves_on_a_slow_call(limiter):
+    call(limiter, latency=11)
+    assert limiter.limit == 2
+
+
+def test_limit_halves_on_a_failed_call_but_not_below_the_minimum(limiter):
+    call(limiter, latency=1, success=False)
+    assert limiter.limit == 2
+    call(limiter, latency=1, success=False)
+    call(limiter, latency=1, success=False)
+    assert limiter.limit == 1
+
+
+def test_limit_grows_additively_on_fast_calls(limiter):
+    call(limiter, latency=1)
+    assert limiter.limit == pytest.approx(4.25)
+
+    # Cerca de uma vaga a mais por "janela" de respostas rápidas, nunca acima do máximo.
+    for _ in range(3):
+        call(limiter, latency=1)
+    assert 4.9 < limiter.limit < 5.1
+    for _ in range(200):
+        call(limiter, latency=1)
+    assert limiter.limit == 8
+
+
+def test_abandoned_call_frees_the_slot_without_touching_the_limit(limiter):
+    call(limiter, latency=None, success=None)
+    assert limiter.limit == 4 and limiter.in_flight == 0
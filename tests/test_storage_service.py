@@ -0,0 +1,65 @@
+# tests/test_storage_service.py
+
+import os
+import asyncio
+import tempfile
+
+import pytest
+
+storage_service = pytest.importorskip("services.storage_service")
+
+BUCKET = "alquimista-test"
+
+
+@pytest.fixture
+def s3_env(monkeypatch):
+    """Um S3 em memória (moto) no lugar do MinIO/AWS; só roda com boto3 e moto instalados."""
+    boto3 = pytest.importorskip("boto3")
+    moto = pytest.importorskip("moto")
+    monkeypatch.setenv("S3_BUCKET", BUCKET)
+    monkeypatch.setenv("S3_REGION", "us-east-1")
+    monkeypatch.setenv("S3_ACCESS_KEY_ID", "test")
+    monkeypatch.setenv("S3_SECRET_ACCESS_KEY", "test")
+    monkeypatch.setenv("S3_PREFIX", "alquimista")
+    monkeypatch.delenv("S3_ENDPOINT_URL", raising=False)
+    monkeypatch.delenv("S3_PUBLIC_BASE_URL", raising=False)
+    with moto.mock_aws():
+        boto3.client("s3", region_name="us-east-1").create_bucket(Bucket=BUCKET)
+        yield
+
+
+def test_s3_round_trip(s3_env):
+    handle, path = tempfile.mkstemp(suffix=".mp3")
+    audio = os.urandom(64 * 1024)
+    with os.fdopen(handle, "wb") as f:
+        f.write(audio)
+    try:
+        backend = storage_service.create_storage_backend(storage_service.STORAGE_S3)
+        url = asyncio.run(backend.upload(path, "minha musica_123"))
+
+        key = "alquimista/minha_musica_123.mp3"
+        stored = backend.client.get_object(Bucket=BUCKET, Key=key)
+        assert stored["Body"].read() == audio
+        assert stored["ContentType"] == "audio/mpeg"
+        assert url == f"https://{BUCKET}.s3.amazonaws.com/{key}"
+        assert backend.get_status()["uploads"] == 1
+    finally:
+        os.remove(path)
+
+
+def test_s3_upload_failure_is_raised_and_counted(s3_env, monkeypatch):
+    monkeypatch.setenv("S3_BUCKET", "balde-que-nao-existe")
+    backend = storage_service.S3Storage()
+    handle, path = tempfile.mkstemp(suffix=".mp3")
+    os.close(handle)
+    try:
+        with pytest.raises(Exception):
+            asyncio.run(backend.upload(path, "sem_balde"))
+        assert backend.get_status()["failures"] == 1
+    finally:
+        os.remove(path)
+
+
+def test_storage_backend_is_abstract():
+    with pytest.raises(TypeError):
+        storage_service.StorageBackend()
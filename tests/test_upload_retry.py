@@ -0,0 +1,163 @@
+# tests/test_upload_retry.py
+
+import os
+import asyncio
+
+import pytest
+
+upload_retry_module = pytest.importorskip("services.upload_retry_service")
+MongoPendingUpload = upload_retry_module.MongoPendingUpload
+MongoMusic = upload_retry_module.MongoMusic
+
+
+class Recorder:
+    """Anota as chamadas feitas ao caderno de entregas e ao cardápio no lugar do MongoDB."""
+
+    def __init__(self):
+        self.calls = []
+
+    def stub(self, name, result=None):
+        async def call(*args, **_kwargs):
+            self.calls.append((name, args[1:]))
+            return result
+        return call
+
+    def names(self):
+        return [name for name, _ in self.calls]
+
+    def args(self, name):
+        return next(args for called, args in self.calls if called == name)
+
+
+@pytest.fixture
+def service(monkeypatch, tmp_path):
+    monkeypatch.setenv("UPLOAD_STAGING_DIR", str(tmp_path))
+    monkeypatch.setenv("UPLOAD_RETRY_BASE_DELAY", "30")
+    monkeypatch.setenv("UPLOAD_RETRY_MAX_DELAY", "3600")
+    monkeypatch.setenv("UPLOAD_RETRY_MAX_ATTEMPTS", "3")
+    instance = upload_retry_module.UploadRetryService()
+    instance.websocket_service = None
+    instance.notification_service = None
+    return instance
+
+
+@pytest.fixture
+def mongo(monkeypatch):
+    recorder = Recorder()
+    targets = [{"music_id": "m1", "user_id": "u1", "music_name": "Samba", "process_id": "p1"}]
+    record = {"targets": targets, "cache_key": "receita"}
+    monkeypatch.setattr(MongoPendingUpload, "complete", recorder.stub("complete", record))
+    monkeypatch.setattr(MongoPendingUpload, "reschedule", recorder.stub("reschedule"))
+    monkeypatch.setattr(MongoPendingUpload, "fail", recorder.stub("fail", record))
+    monkeypatch.setattr(MongoMusic, "set_upload_result", recorder.stub("set_upload_result", 1))
+    monkeypatch.setattr(upload_retry_module.generation_cache_service, "put", lambda *args: recorder.calls.append(("cache_put", args)))
+    return recorder
+
+
+def stage_file(tmp_path, name="Samba_p1.mp3"):
+    path = tmp_path / name
+    path.write_bytes(b"ID3" + b"\0" * 64)
+    return str(path)
+
+
+def storage_answers(monkeypatch, answer):
+    uploaded = []
+
+    async def upload(path, upload_name):
+        uploaded.append(upload_name)
+        if isinstance(answer, Exception):
+            raise answer
+        return f"{answer}/{upload_name}.mp3"
+
+    monkeypatch.setattr(upload_retry_module.storage_service, "upload", upload)
+    return uploaded
+
+
+def test_backoff_doubles_per_attempt_within_jitter_and_is_capped(service, monkeypatch):
+    monkeypatch.setattr(upload_retry_module.random, "uniform", lambda low, high: 1.0)
+    assert [service.backoff(attempts) for attempts in range(5)] == [30, 30, 60, 120, 240]
+    assert service.backoff(20) == 3600
+
+    monkeypatch.setattr(upload_retry_module.random, "uniform", lambda low, high: high)
+    assert service.backoff(3) == pytest.approx(120 * 1.2)
+    monkeypatch.setattr(upload_retry_module.random, "uniform", lambda low, high: low)
+    assert service.backoff(3) == pytest.approx(120 * 0.8)
+
+
+def test_successful_delivery_updates_the_musics_and_empties_the_staging(service, mongo, monkeypatch, tmp_path):
+    staged_path = stage_file(tmp_path)
+    stream_path = stage_file(tmp_path, "Samba_p1_stream.ogg")
+    uploaded = storage_answers(monkeypatch, "https://cdn.example.com")
+
+    asyncio.run(service._deliver({
+        "_id": "Samba_p1", "staged_path": staged_path, "attempts": 1, "renditions": {"stream": stream_path}
+    }))
+
+    assert uploaded == ["Samba_p1", "Samba_p1_stream"]
+    assert mongo.names() == ["complete", "set_upload_result", "cache_put"]
+    assert mongo.args("set_upload_result") == (
+        ["m1"], upload_retry_module.MUSIC_READY, "https://cdn.example.com/Samba_p1.mp3",
+        "https://cdn.example.com/Samba_p1_stream.mp3", None
+    )
+    assert mongo.args("cache_put")[0] == "receita"
+    assert not os.path.exists(staged_path) and not os.path.exists(stream_path)
+    assert service.delivered == 1
+
+
+def test_refused_delivery_is_rescheduled_with_backoff(service, mongo, monkeypatch, tmp_path):
+    staged_path = stage_file(tmp_path)
+    storage_answers(monkeypatch, Exception("nuvem fora do ar"))
+    monkeypatch.setattr(upload_retry_module.random, "uniform", lambda low, high: 1.0)
+
+    asyncio.run(service._deliver({"_id": "Samba_p1", "staged_path": staged_path, "attempts": 2}))
+
+    assert mongo.names() == ["reschedule"]
+    assert mongo.args("reschedule") == ("Samba_p1", 60, "nuvem fora do ar")
+    assert os.path.exists(staged_path)
+    assert service.retries == 1
+
+
+def test_placeholder_url_counts_as_a_refused_delivery(service, mongo, monkeypatch, tmp_path):
+    staged_path = stage_file(tmp_path)
+
+    async def upload(path, upload_name):
+        return upload_retry_module.PLACEHOLDER_AUDIO_URL
+
+    monkeypatch.setattr(upload_retry_module.storage_service, "upload", upload)
+
+    asyncio.run(service._deliver({"_id": "Samba_p1", "staged_path": staged_path, "attempts": 1}))
+
+    assert mongo.names() == ["reschedule"]
+
+
+def test_missing_file_is_rescheduled_instead_of_failed(service, mongo, monkeypatch, tmp_path):
+    uploaded = storage_answers(monkeypatch, "https://cdn.example.com")
+
+    asyncio.run(service._deliver({"_id": "Samba_p1", "staged_path": str(tmp_path / "sumiu.mp3"), "attempts": 1}))
+
+    assert uploaded == []
+    assert mongo.names() == ["reschedule"]
+
+
+def test_delivery_gives_up_after_max_attempts(service, mongo, monkeypatch, tmp_path):
+    staged_path = stage_file(tmp_path)
+    storage_answers(monkeypatch, Exception("nuvem fora do ar"))
+
+    asyncio.run(service._deliver({"_id": "Samba_p1", "staged_path": staged_path, "attempts": 3}))
+
+    assert mongo.names() == ["fail", "set_upload_result"]
+    assert mongo.args("set_upload_result") == (["m1"], upload_retry_module.MUSIC_UPLOAD_FAILED)
+    # O arquivo fica na despensa para recuperação manual.
+    assert os.path.exists(staged_path)
+    assert service.failed == 1
+
+
+def test_unregistered_upload_leaves_no_orphan_file(service, mongo, monkeypatch, tmp_path):
+    staged = upload_retry_module.StagedUpload(stage_file(tmp_path), "Samba_p1", {"preview": stage_file(tmp_path, "p.mp3")})
+    monkeypatch.setattr(MongoPendingUpload, "add_target", mongo.stub("add_target", None))
+
+    with pytest.raises(Exception, match="Samba_p1"):
+        asyncio.run(service.register(None, staged, {"_id": "5f0000000000000000000001", "userId": "u1"}, "p1"))
+
+    assert not os.path.exists(staged.path) and not os.path.exists(staged.renditions["preview"])
+    assert mongo.args("set_upload_result") == (["5f0000000000000000000001"], upload_retry_module.MUSIC_UPLOAD_FAILED)